@@ -4,10 +4,14 @@ Store Inspection Review System
 """
 from flask import Flask, render_template, jsonify, request, send_file, Response
 import os
+import time
 from io import BytesIO
 from werkzeug.utils import secure_filename
 from data_loader import DataLoader
+from item_store import ItemStore
+from json_cache import JsonResponseCache
 from review_manager_db import ReviewManager
+from review_stats import ReviewStats
 from csv_exporter import CSVExporter
 from database import init_db, load_whitelist_to_db, get_all_operators_from_db, get_operator_by_store_id
 
@@ -24,7 +28,10 @@ ALLOWED_EXTENSIONS = {'xlsx'}
 # 全局数据存储
 inspection_data = []
 data_loader = None
+item_store = ItemStore()
+items_json_cache = JsonResponseCache()
 review_manager = ReviewManager()
+review_stats = ReviewStats(review_manager)
 csv_exporter = CSVExporter()
 
 
@@ -33,6 +40,28 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def build_review_data(item_data: dict, data: dict) -> dict:
+    """
+    由检查项和提交的审核内容构建审核数据
+
+    Args:
+        item_data: 检查项字典
+        data: 请求中的审核内容（审核结果、问题描述）
+
+    Returns:
+        dict: 审核数据
+    """
+    return {
+        '门店名称': item_data['门店名称'],
+        '门店编号': item_data['门店编号'],
+        '所属区域': item_data['所属区域'],
+        '检查项名称': item_data['检查项名称'],
+        '标准图': item_data['标准图'],
+        '审核结果': data.get('审核结果', ''),
+        '问题描述': data.get('问题描述', '')
+    }
+
+
 @app.route('/')
 def index():
     """返回主页面"""
@@ -41,24 +70,53 @@ def index():
 
 @app.route('/api/items', methods=['GET'])
 def get_items():
-    """获取所有检查项数据"""
-    # 如果没有数据，返回空列表
-    if not inspection_data:
-        return jsonify([])
-    
-    # 获取筛选参数
+    """
+    获取检查项数据（按门店分页）
+
+    参数:
+        operator: 运营人员，默认"全部"
+        cursor: 分页游标（上一页返回的next_cursor），为空表示第一页
+        limit: 每页门店数，默认10，最大100
+        category: 检查项分类
+        reviewed: 1只返回已审核项，0只返回未审核项
+        all: 为1时返回全部检查项的列表（不分页，兼容旧版前端）
+    """
+    cycle_items = item_store
     operator = request.args.get('operator', '全部')
     
-    # 按门店编号排序
-    if operator and operator != '全部' and data_loader:
-        # 筛选指定运营人员的数据
-        filtered_data = data_loader.filter_by_operator(operator)
-        sorted_data = sorted(filtered_data, key=lambda x: int(x['门店编号']) if x['门店编号'].isdigit() else 0)
-    else:
-        # 返回所有数据
-        sorted_data = sorted(inspection_data, key=lambda x: int(x['门店编号']) if x['门店编号'].isdigit() else 0)
+    # 不分页：返回按门店编号排好序的完整列表
+    if request.args.get('all') == '1':
+        # 优先使用加载周期时生成的gzip缓存（带ETag，未变化时返回304）
+        cached = items_json_cache.get(operator or '全部')
+        if cached is None:
+            return jsonify(cycle_items.get_sorted(operator))
+        return cached.to_response()
     
-    return jsonify(sorted_data)
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit必须为整数'}), 400
+    
+    reviewed = request.args.get('reviewed')
+    reviewed = None if reviewed in (None, '') else reviewed == '1'
+    reviewed_ids = review_manager.get_reviewed_item_ids() if reviewed is not None else None
+    
+    try:
+        items, next_cursor = cycle_items.get_store_page(
+            operator=operator,
+            after_store=request.args.get('cursor') or None,
+            limit=limit,
+            category=request.args.get('category') or None,
+            reviewed=reviewed,
+            reviewed_ids=reviewed_ids
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': items,
+        'next_cursor': next_cursor
+    })
 
 
 @app.route('/api/operators', methods=['GET'])
@@ -86,29 +144,19 @@ def submit_review():
         item_id = data['item_id']
         
         # 查找对应的检查项数据
-        item_data = next((item for item in inspection_data if item['id'] == item_id), None)
+        item_data = item_store.get(item_id)
         
         if not item_data:
             return jsonify({'success': False, 'error': '检查项不存在'}), 404
         
         # 构建审核数据
-        review_data = {
-            '门店名称': item_data['门店名称'],
-            '门店编号': item_data['门店编号'],
-            '所属区域': item_data['所属区域'],
-            '检查项名称': item_data['检查项名称'],
-            '标准图': item_data['标准图'],
-            '审核结果': data.get('审核结果', ''),
-            '问题描述': data.get('问题描述', '')
-        }
-        
-        # 保存或更新审核结果
-        if review_manager.has_review(item_id):
-            success = review_manager.update_review(item_id, review_data)
-        else:
-            success = review_manager.save_review(item_id, review_data)
+        review_data = build_review_data(item_data, data)
+        
+        # 保存或更新审核结果（单条upsert）
+        success = review_manager.save_reviews_bulk({item_id: review_data})
         
         if success:
+            review_stats.invalidate()
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': '保存失败'}), 500
@@ -117,6 +165,42 @@ def submit_review():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/reviews/batch', methods=['POST'])
+def submit_reviews_batch():
+    """
+    批量提交审核结果（如整店"全部合格"）
+
+    请求体: {"reviews": [{"item_id": ..., "审核结果": ..., "问题描述": ...}, ...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('reviews'), list) or not data['reviews']:
+            return jsonify({'success': False, 'error': '缺少reviews'}), 400
+        
+        reviews = {}
+        missing = []
+        for entry in data['reviews']:
+            item_id = entry.get('item_id') if isinstance(entry, dict) else None
+            item_data = item_store.get(item_id) if item_id else None
+            if not item_data:
+                missing.append(item_id)
+                continue
+            reviews[item_id] = build_review_data(item_data, entry)
+        
+        if missing:
+            return jsonify({'success': False, 'error': '检查项不存在', 'missing': missing}), 404
+        
+        if review_manager.save_reviews_bulk(reviews):
+            review_stats.invalidate()
+            return jsonify({'success': True, 'count': len(reviews)})
+        else:
+            return jsonify({'success': False, 'error': '保存失败'}), 500
+            
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/reviews', methods=['GET'])
 def get_reviews():
     """获取所有审核结果"""
@@ -145,6 +229,7 @@ def update_problem():
             # 使用update_review方法更新到数据库
             success = review_manager.update_review(item_id, review)
             if success:
+                review_stats.invalidate()
                 return jsonify({'success': True})
             else:
                 return jsonify({'success': False, 'error': '更新失败'}), 500
@@ -159,14 +244,14 @@ def update_problem():
 def export_csv():
     """导出CSV文件"""
     try:
-        # 获取所有审核结果
-        reviews = review_manager.get_all_reviews()
-        
-        if not reviews:
+        if review_manager.get_review_count() == 0:
             return jsonify({'error': '暂无审核结果可导出'}), 400
         
-        # 生成CSV内容
-        csv_content = csv_exporter.export_reviews(reviews, inspection_data)
+        # 默认流式导出（服务端游标 + 生成器响应），stream=0 时一次性生成
+        if request.args.get('stream', '1') == '0':
+            csv_content = csv_exporter.export_reviews(review_manager.get_all_reviews(), inspection_data)
+        else:
+            csv_content = csv_exporter.stream_reviews(item_store)
         
         # 生成文件名（使用URL编码）
         from urllib.parse import quote
@@ -194,8 +279,9 @@ def export_csv():
 def get_stats():
     """获取审核统计信息（按门店统计）"""
     try:
+        cycle_items = item_store
         # 如果没有数据，返回0
-        if not inspection_data:
+        if not cycle_items:
             return jsonify({
                 'total': 0,
                 'reviewed': 0,
@@ -205,52 +291,8 @@ def get_stats():
         # 获取筛选参数
         operator = request.args.get('operator', '全部')
         
-        # 获取对应运营人员的检查项
-        if operator and operator != '全部' and data_loader:
-            filtered_items = data_loader.filter_by_operator(operator)
-        else:
-            filtered_items = inspection_data
-        
-        # 按门店分组统计
-        stores = {}
-        for item in filtered_items:
-            store_id = item['门店编号']
-            if store_id not in stores:
-                stores[store_id] = {
-                    'items': []
-                }
-            stores[store_id]['items'].append(item)
-        
-        # 统计完成的门店数
-        total_stores = len(stores)
-        completed_stores = 0
-        
-        for store_id, store_data in stores.items():
-            # 检查门店是否完成：所有检查项都已审核，且不合格的都有问题描述
-            all_completed = True
-            for item in store_data['items']:
-                review = review_manager.get_review(item['id'])
-                if not review:
-                    all_completed = False
-                    break
-                
-                # 如果是不合格，必须有问题描述
-                if review.get('审核结果') == '不合格':
-                    if not review.get('问题描述') or review.get('问题描述').strip() == '':
-                        all_completed = False
-                        break
-            
-            if all_completed:
-                completed_stores += 1
-        
-        # 计算百分比
-        percentage = round((completed_stores / total_stores * 100) if total_stores > 0 else 0, 1)
-        
-        return jsonify({
-            'total': total_stores,
-            'reviewed': completed_stores,
-            'percentage': percentage
-        })
+        # 一次查询加载审核状态，按运营人员缓存统计结果
+        return jsonify(review_stats.get_stats(cycle_items, operator))
         
     except Exception as e:
         print(f"获取统计信息失败: {e}")
@@ -270,24 +312,34 @@ def admin_reset():
         
         # 清空数据库中的审核记录
         review_manager.clear_all_reviews()
+        review_stats.invalidate()
         
         # 重新加载数据
-        global inspection_data, data_loader
         excel_file = '检查项记录.xlsx'
         whitelist_file = 'D:/pythonproject/Newyobo_operat_database/daily_data/whitelist/whitelist.xlsx'
         
-        data_loader = DataLoader(excel_file, whitelist_file)
-        inspection_data = data_loader.load_and_process()
+        start = time.perf_counter()
+        new_loader = DataLoader(excel_file, whitelist_file)
+        new_loader.load_and_process()
+        activate_cycle(new_loader)
+        load_seconds = time.perf_counter() - start
         
         # 自动标记无现场结果的检查项
-        auto_review_no_result_items()
+        start = time.perf_counter()
+        auto_reviewed = auto_review_no_result_items()
+        auto_review_seconds = time.perf_counter() - start
         
         print(f"[管理员操作] 已重置审核数据，重新加载 {len(inspection_data)} 条检查项")
         
         return jsonify({
             'success': True,
             'message': '已开始新周期',
-            'total_items': len(inspection_data)
+            'total_items': len(inspection_data),
+            'auto_reviewed': auto_reviewed,
+            'timings': {
+                'load_seconds': round(load_seconds, 3),
+                'auto_review_seconds': round(auto_review_seconds, 3)
+            }
         })
         
     except Exception as e:
@@ -324,23 +376,33 @@ def admin_upload():
         
         # 清空数据库中的审核记录
         review_manager.clear_all_reviews()
+        review_stats.invalidate()
         
         # 重新加载数据
-        global inspection_data, data_loader
         whitelist_file = 'D:/pythonproject/Newyobo_operat_database/daily_data/whitelist/whitelist.xlsx'
         
-        data_loader = DataLoader(target_path, whitelist_file)
-        inspection_data = data_loader.load_and_process()
+        start = time.perf_counter()
+        new_loader = DataLoader(target_path, whitelist_file)
+        new_loader.load_and_process()
+        activate_cycle(new_loader)
+        load_seconds = time.perf_counter() - start
         
         # 自动标记无现场结果的检查项
-        auto_review_no_result_items()
+        start = time.perf_counter()
+        auto_reviewed = auto_review_no_result_items()
+        auto_review_seconds = time.perf_counter() - start
         
         print(f"[管理员操作] 已加载新数据，共 {len(inspection_data)} 条检查项")
         
         return jsonify({
             'success': True,
             'message': '文件上传成功，已开始新周期',
-            'total_items': len(inspection_data)
+            'total_items': len(inspection_data),
+            'auto_reviewed': auto_reviewed,
+            'timings': {
+                'load_seconds': round(load_seconds, 3),
+                'auto_review_seconds': round(auto_review_seconds, 3)
+            }
         })
         
     except Exception as e:
@@ -362,30 +424,55 @@ def get_local_ip():
         return '127.0.0.1'
 
 
+def activate_cycle(loader: DataLoader):
+    """
+    切换当前周期数据
+
+    新周期的数据和索引在loader中完整构建后才替换全局引用，
+    请求处理期间读取到的始终是完整的一个周期。
+
+    Args:
+        loader: 已执行过load_and_process()的数据加载器
+    """
+    global inspection_data, data_loader, item_store, items_json_cache
+    
+    # 预先序列化并压缩各运营人员的完整检查项列表（/api/items?all=1）
+    json_cache = JsonResponseCache()
+    json_cache.put('全部', loader.item_store.get_sorted())
+    for operator in loader.item_store.get_operator_names():
+        json_cache.put(operator, loader.item_store.get_sorted(operator))
+    
+    items_json_cache = json_cache
+    item_store = loader.item_store
+    inspection_data = loader.data
+    data_loader = loader
+
+
 def auto_review_no_result_items():
-    """自动为无现场结果的检查项标记为不合格"""
-    count = 0
-    for item in inspection_data:
-        if item.get('无现场结果', False):
-            item_id = item['id']
-            # 检查是否已经有审核记录
-            if not review_manager.has_review(item_id):
-                review_data = {
-                    '门店名称': item['门店名称'],
-                    '门店编号': item['门店编号'],
-                    '所属区域': item['所属区域'],
-                    '检查项名称': item['检查项名称'],
-                    '标准图': item['标准图'],
-                    '审核结果': '不合格',
-                    '问题描述': '无现场结果'
-                }
-                review_manager.save_review(item_id, review_data)
-                count += 1
+    """
+    自动为无现场结果的检查项标记为不合格
+
+    一次查询取出已审核的检查项ID，在内存中算出需要标记的项，
+    再一次批量写入（ON CONFLICT DO NOTHING，不覆盖已有审核结果）
+
+    Returns:
+        int: 本次自动标记的检查项数量
+    """
+    reviewed_ids = review_manager.get_reviewed_item_ids()
+    auto_result = {'审核结果': '不合格', '问题描述': '无现场结果'}
+    reviews = {
+        item['id']: build_review_data(item, auto_result)
+        for item in inspection_data
+        if item.get('无现场结果', False) and item['id'] not in reviewed_ids
+    }
+    
+    if not reviews or not review_manager.save_reviews_bulk(reviews, overwrite=False):
+        return 0
     
-    if count > 0:
-        print(f"[自动审核] 已自动标记 {count} 个无现场结果的检查项为不合格")
+    review_stats.invalidate()
+    print(f"[自动审核] 已自动标记 {len(reviews)} 个无现场结果的检查项为不合格")
     
-    return count
+    return len(reviews)
 
 
 if __name__ == '__main__':
@@ -413,8 +500,9 @@ if __name__ == '__main__':
     if os.path.exists(excel_file):
         try:
             print("正在加载Excel数据...")
-            data_loader = DataLoader(excel_file, whitelist_file)
-            inspection_data = data_loader.load_and_process()
+            loader = DataLoader(excel_file, whitelist_file)
+            loader.load_and_process()
+            activate_cycle(loader)
             print(f"成功加载 {len(inspection_data)} 条检查项数据")
             
             # 自动标记无现场结果的检查项
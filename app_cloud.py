@@ -4,11 +4,17 @@ Store Inspection Review System - Cloud Server Version
 """
 from flask import Flask, render_template, jsonify, request, Response
 import os
+import time
+import threading
 import logging
 from logging.handlers import RotatingFileHandler
 from werkzeug.utils import secure_filename
 from data_loader import DataLoader
+from item_store import ItemStore
+from json_cache import JsonResponseCache
+from cycle_store import CycleStore
 from review_manager_db import ReviewManager
+from review_stats import ReviewStats
 from csv_exporter import CSVExporter
 from database import init_db, load_whitelist_to_db, get_all_operators_from_db
 
@@ -17,7 +23,7 @@ try:
     from config import (
         HOST, PORT, DEBUG, MAX_CONTENT_LENGTH, JSON_AS_ASCII,
         UPLOAD_FOLDER, EXCEL_FILE, WHITELIST_FILE, ADMIN_USERS,
-        LOG_LEVEL, LOG_FILE
+        LOG_LEVEL, LOG_FILE, CYCLE_STORE_DIR
     )
 except ImportError:
     # 如果没有config.py，使用默认配置
@@ -32,6 +38,7 @@ except ImportError:
     ADMIN_USERS = ['窦']
     LOG_LEVEL = 'INFO'
     LOG_FILE = 'logs/app.log'
+    CYCLE_STORE_DIR = '/dev/shm/inspection_cycle' if os.path.isdir('/dev/shm') else 'data/cycle'
 
 app = Flask(__name__)
 
@@ -61,10 +68,16 @@ if not DEBUG:
 # 允许的文件扩展名
 ALLOWED_EXTENSIONS = {'xlsx'}
 
-# 全局数据存储
+# 全局数据存储（当前worker中的周期数据，与cycle_store中的当前代同步）
 inspection_data = []
-data_loader = None
+cycle_operators = []
+cycle_generation = None
+item_store = ItemStore()
+items_json_cache = JsonResponseCache()
+cycle_store = CycleStore(CYCLE_STORE_DIR)
+cycle_sync_lock = threading.Lock()
 review_manager = ReviewManager()
+review_stats = ReviewStats(review_manager)
 csv_exporter = CSVExporter()
 
 
@@ -73,6 +86,28 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def build_review_data(item_data: dict, data: dict) -> dict:
+    """
+    由检查项和提交的审核内容构建审核数据
+
+    Args:
+        item_data: 检查项字典
+        data: 请求中的审核内容（审核结果、问题描述）
+
+    Returns:
+        dict: 审核数据
+    """
+    return {
+        '门店名称': item_data['门店名称'],
+        '门店编号': item_data['门店编号'],
+        '所属区域': item_data['所属区域'],
+        '检查项名称': item_data['检查项名称'],
+        '标准图': item_data['标准图'],
+        '审核结果': data.get('审核结果', ''),
+        '问题描述': data.get('问题描述', '')
+    }
+
+
 @app.route('/')
 def index():
     """返回主页面"""
@@ -81,19 +116,52 @@ def index():
 
 @app.route('/api/items', methods=['GET'])
 def get_items():
-    """获取所有检查项数据"""
-    if not inspection_data:
-        return jsonify([])
-    
+    """
+    获取检查项数据（按门店分页）
+
+    参数:
+        operator: 运营人员，默认"全部"
+        cursor: 分页游标（上一页返回的next_cursor），为空表示第一页
+        limit: 每页门店数，默认10，最大100
+        category: 检查项分类
+        reviewed: 1只返回已审核项，0只返回未审核项
+        all: 为1时返回全部检查项的列表（不分页，兼容旧版前端）
+    """
+    cycle_items = item_store
     operator = request.args.get('operator', '全部')
     
-    if operator and operator != '全部' and data_loader:
-        filtered_data = data_loader.filter_by_operator(operator)
-        sorted_data = sorted(filtered_data, key=lambda x: int(x['门店编号']) if x['门店编号'].isdigit() else 0)
-    else:
-        sorted_data = sorted(inspection_data, key=lambda x: int(x['门店编号']) if x['门店编号'].isdigit() else 0)
+    if request.args.get('all') == '1':
+        # 优先使用加载周期时生成的gzip缓存（带ETag，未变化时返回304）
+        cached = items_json_cache.get(operator or '全部')
+        if cached is None:
+            return jsonify(cycle_items.get_sorted(operator))
+        return cached.to_response()
     
-    return jsonify(sorted_data)
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'limit必须为整数'}), 400
+    
+    reviewed = request.args.get('reviewed')
+    reviewed = None if reviewed in (None, '') else reviewed == '1'
+    reviewed_ids = review_manager.get_reviewed_item_ids() if reviewed is not None else None
+    
+    try:
+        items, next_cursor = cycle_items.get_store_page(
+            operator=operator,
+            after_store=request.args.get('cursor') or None,
+            limit=limit,
+            category=request.args.get('category') or None,
+            reviewed=reviewed,
+            reviewed_ids=reviewed_ids
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'items': items,
+        'next_cursor': next_cursor
+    })
 
 
 @app.route('/api/operators', methods=['GET'])
@@ -101,8 +169,8 @@ def get_operators():
     """获取所有运营人员列表"""
     operators = get_all_operators_from_db()
     
-    if not operators and data_loader:
-        operators = data_loader.get_all_operators()
+    if not operators:
+        operators = cycle_operators
     
     return jsonify(operators)
 
@@ -117,27 +185,17 @@ def submit_review():
             return jsonify({'success': False, 'error': '缺少item_id'}), 400
         
         item_id = data['item_id']
-        item_data = next((item for item in inspection_data if item['id'] == item_id), None)
+        item_data = item_store.get(item_id)
         
         if not item_data:
             return jsonify({'success': False, 'error': '检查项不存在'}), 404
         
-        review_data = {
-            '门店名称': item_data['门店名称'],
-            '门店编号': item_data['门店编号'],
-            '所属区域': item_data['所属区域'],
-            '检查项名称': item_data['检查项名称'],
-            '标准图': item_data['标准图'],
-            '审核结果': data.get('审核结果', ''),
-            '问题描述': data.get('问题描述', '')
-        }
-        
-        if review_manager.has_review(item_id):
-            success = review_manager.update_review(item_id, review_data)
-        else:
-            success = review_manager.save_review(item_id, review_data)
+        review_data = build_review_data(item_data, data)
+        
+        success = review_manager.save_reviews_bulk({item_id: review_data})
         
         if success:
+            review_stats.invalidate()
             return jsonify({'success': True})
         else:
             return jsonify({'success': False, 'error': '保存失败'}), 500
@@ -147,6 +205,43 @@ def submit_review():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/reviews/batch', methods=['POST'])
+def submit_reviews_batch():
+    """
+    批量提交审核结果（如整店"全部合格"）
+
+    请求体: {"reviews": [{"item_id": ..., "审核结果": ..., "问题描述": ...}, ...]}
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('reviews'), list) or not data['reviews']:
+            return jsonify({'success': False, 'error': '缺少reviews'}), 400
+        
+        reviews = {}
+        missing = []
+        for entry in data['reviews']:
+            item_id = entry.get('item_id') if isinstance(entry, dict) else None
+            item_data = item_store.get(item_id) if item_id else None
+            if not item_data:
+                missing.append(item_id)
+                continue
+            reviews[item_id] = build_review_data(item_data, entry)
+        
+        if missing:
+            return jsonify({'success': False, 'error': '检查项不存在', 'missing': missing}), 404
+        
+        if review_manager.save_reviews_bulk(reviews):
+            review_stats.invalidate()
+            return jsonify({'success': True, 'count': len(reviews)})
+        else:
+            return jsonify({'success': False, 'error': '保存失败'}), 500
+            
+    except Exception as e:
+        app.logger.error(f'批量提交审核失败: {e}')
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @app.route('/api/reviews', methods=['GET'])
 def get_reviews():
     """获取所有审核结果"""
@@ -172,6 +267,7 @@ def update_problem():
             review['问题描述'] = problem_note
             success = review_manager.update_review(item_id, review)
             if success:
+                review_stats.invalidate()
                 return jsonify({'success': True})
             else:
                 return jsonify({'success': False, 'error': '更新失败'}), 500
@@ -187,12 +283,13 @@ def update_problem():
 def export_csv():
     """导出CSV文件"""
     try:
-        reviews = review_manager.get_all_reviews()
-        
-        if not reviews:
+        if review_manager.get_review_count() == 0:
             return jsonify({'error': '暂无审核结果可导出'}), 400
         
-        csv_content = csv_exporter.export_reviews(reviews, inspection_data)
+        if request.args.get('stream', '1') == '0':
+            csv_content = csv_exporter.export_reviews(review_manager.get_all_reviews(), inspection_data)
+        else:
+            csv_content = csv_exporter.stream_reviews(item_store)
         
         from urllib.parse import quote
         filename = csv_exporter.generate_filename()
@@ -218,7 +315,8 @@ def export_csv():
 def get_stats():
     """获取审核统计信息（按门店统计）"""
     try:
-        if not inspection_data:
+        cycle_items = item_store
+        if not cycle_items:
             return jsonify({
                 'total': 0,
                 'reviewed': 0,
@@ -227,44 +325,7 @@ def get_stats():
         
         operator = request.args.get('operator', '全部')
         
-        if operator and operator != '全部' and data_loader:
-            filtered_items = data_loader.filter_by_operator(operator)
-        else:
-            filtered_items = inspection_data
-        
-        stores = {}
-        for item in filtered_items:
-            store_id = item['门店编号']
-            if store_id not in stores:
-                stores[store_id] = {'items': []}
-            stores[store_id]['items'].append(item)
-        
-        total_stores = len(stores)
-        completed_stores = 0
-        
-        for store_id, store_data in stores.items():
-            all_completed = True
-            for item in store_data['items']:
-                review = review_manager.get_review(item['id'])
-                if not review:
-                    all_completed = False
-                    break
-                
-                if review.get('审核结果') == '不合格':
-                    if not review.get('问题描述') or review.get('问题描述').strip() == '':
-                        all_completed = False
-                        break
-            
-            if all_completed:
-                completed_stores += 1
-        
-        percentage = round((completed_stores / total_stores * 100) if total_stores > 0 else 0, 1)
-        
-        return jsonify({
-            'total': total_stores,
-            'reviewed': completed_stores,
-            'percentage': percentage
-        })
+        return jsonify(review_stats.get_stats(cycle_items, operator))
         
     except Exception as e:
         app.logger.error(f'获取统计信息失败: {e}')
@@ -282,20 +343,29 @@ def admin_reset():
             return jsonify({'success': False, 'error': '权限不足'}), 403
         
         review_manager.clear_all_reviews()
+        review_stats.invalidate()
         
-        global inspection_data, data_loader
-        
-        data_loader = DataLoader(EXCEL_FILE, WHITELIST_FILE)
-        inspection_data = data_loader.load_and_process()
+        start = time.perf_counter()
+        new_loader = DataLoader(EXCEL_FILE, WHITELIST_FILE)
+        new_loader.load_and_process()
+        activate_cycle(new_loader)
+        load_seconds = time.perf_counter() - start
         
-        auto_review_no_result_items()
+        start = time.perf_counter()
+        auto_reviewed = auto_review_no_result_items()
+        auto_review_seconds = time.perf_counter() - start
         
         app.logger.info(f'[管理员操作] {operator} 重置审核数据，重新加载 {len(inspection_data)} 条检查项')
         
         return jsonify({
             'success': True,
             'message': '已开始新周期',
-            'total_items': len(inspection_data)
+            'total_items': len(inspection_data),
+            'auto_reviewed': auto_reviewed,
+            'timings': {
+                'load_seconds': round(load_seconds, 3),
+                'auto_review_seconds': round(auto_review_seconds, 3)
+            }
         })
         
     except Exception as e:
@@ -328,20 +398,29 @@ def admin_upload():
         app.logger.info(f'[管理员操作] {operator} 上传新文件: {file.filename}')
         
         review_manager.clear_all_reviews()
+        review_stats.invalidate()
         
-        global inspection_data, data_loader
+        start = time.perf_counter()
+        new_loader = DataLoader(target_path, WHITELIST_FILE)
+        new_loader.load_and_process()
+        activate_cycle(new_loader)
+        load_seconds = time.perf_counter() - start
         
-        data_loader = DataLoader(target_path, WHITELIST_FILE)
-        inspection_data = data_loader.load_and_process()
-        
-        auto_review_no_result_items()
+        start = time.perf_counter()
+        auto_reviewed = auto_review_no_result_items()
+        auto_review_seconds = time.perf_counter() - start
         
         app.logger.info(f'[管理员操作] 已加载新数据，共 {len(inspection_data)} 条检查项')
         
         return jsonify({
             'success': True,
             'message': '文件上传成功，已开始新周期',
-            'total_items': len(inspection_data)
+            'total_items': len(inspection_data),
+            'auto_reviewed': auto_reviewed,
+            'timings': {
+                'load_seconds': round(load_seconds, 3),
+                'auto_review_seconds': round(auto_review_seconds, 3)
+            }
         })
         
     except Exception as e:
@@ -362,29 +441,115 @@ def get_local_ip():
         return '127.0.0.1'
 
 
+def activate_cycle(loader: DataLoader):
+    """
+    切换当前周期数据
+
+    周期数据写入共享快照（cycle_store）后再在本worker中生效，
+    其他worker在下一个请求时通过sync_cycle()加载同一份快照。
+
+    Args:
+        loader: 已执行过load_and_process()的数据加载器
+    """
+    operators = loader.get_all_operators()
+    new_item_store, json_cache = prepare_cycle(loader.data, loader.item_store)
+    with cycle_sync_lock:
+        generation = cycle_store.publish({'items': loader.data, 'operators': operators})
+        apply_cycle(loader.data, operators, generation, new_item_store, json_cache)
+
+
+def prepare_cycle(items: list, new_item_store: ItemStore = None):
+    """
+    构建一个周期的检查项索引和响应缓存（不持有cycle_sync_lock，不影响其他请求）
+
+    Args:
+        items: 检查项列表
+        new_item_store: 已建立的检查项索引，为None时根据items建立
+
+    Returns:
+        Tuple[ItemStore, JsonResponseCache]: 检查项索引、各运营人员的gzip响应缓存
+    """
+    if new_item_store is None:
+        new_item_store = ItemStore(items)
+    
+    # 预先序列化并压缩各运营人员的完整检查项列表（/api/items?all=1）
+    json_cache = JsonResponseCache()
+    json_cache.put('全部', new_item_store.get_sorted())
+    for operator in new_item_store.get_operator_names():
+        json_cache.put(operator, new_item_store.get_sorted(operator))
+    return new_item_store, json_cache
+
+
+def apply_cycle(items: list, operators: list, generation: str,
+                new_item_store: ItemStore, json_cache: JsonResponseCache):
+    """
+    在本worker中生效一个周期（调用方持有cycle_sync_lock）
+
+    索引和响应缓存由prepare_cycle()预先构建，这里只替换全局引用，
+    请求处理期间读取到的始终是完整的一个周期。
+
+    Args:
+        items: 检查项列表
+        operators: 运营人员列表（白名单）
+        generation: 周期快照代号
+        new_item_store: prepare_cycle()建立的检查项索引
+        json_cache: prepare_cycle()生成的响应缓存
+    """
+    global inspection_data, cycle_operators, cycle_generation, item_store, items_json_cache
+    
+    items_json_cache = json_cache
+    item_store = new_item_store
+    inspection_data = items
+    cycle_operators = operators
+    cycle_generation = generation
+
+
+@app.before_request
+def sync_cycle():
+    """检查共享快照的当前代（一次stat），其他worker切换了周期时加载新快照"""
+    generation = cycle_store.current_generation()
+    if generation is None or generation == cycle_generation:
+        return
+    
+    # 在锁外读取快照并构建索引、缓存，锁内只做引用替换
+    snapshot = cycle_store.load(generation)
+    if snapshot is None:
+        return
+    new_item_store, json_cache = prepare_cycle(snapshot['items'])
+    
+    with cycle_sync_lock:
+        # 其他线程已生效该代，或构建期间又发布了更新的周期（下一个请求再加载）
+        if generation == cycle_generation or cycle_store.current_generation() != generation:
+            return
+        apply_cycle(snapshot['items'], snapshot['operators'], generation, new_item_store, json_cache)
+        app.logger.info(f'[周期同步] 已加载周期快照 {generation}，共 {len(inspection_data)} 条检查项')
+
+
 def auto_review_no_result_items():
-    """自动为无现场结果的检查项标记为不合格"""
-    count = 0
-    for item in inspection_data:
-        if item.get('无现场结果', False):
-            item_id = item['id']
-            if not review_manager.has_review(item_id):
-                review_data = {
-                    '门店名称': item['门店名称'],
-                    '门店编号': item['门店编号'],
-                    '所属区域': item['所属区域'],
-                    '检查项名称': item['检查项名称'],
-                    '标准图': item['标准图'],
-                    '审核结果': '不合格',
-                    '问题描述': '无现场结果'
-                }
-                review_manager.save_review(item_id, review_data)
-                count += 1
+    """
+    自动为无现场结果的检查项标记为不合格
+
+    一次查询取出已审核的检查项ID，在内存中算出需要标记的项，
+    再一次批量写入（ON CONFLICT DO NOTHING，不覆盖已有审核结果）
+
+    Returns:
+        int: 本次自动标记的检查项数量
+    """
+    reviewed_ids = review_manager.get_reviewed_item_ids()
+    auto_result = {'审核结果': '不合格', '问题描述': '无现场结果'}
+    reviews = {
+        item['id']: build_review_data(item, auto_result)
+        for item in inspection_data
+        if item.get('无现场结果', False) and item['id'] not in reviewed_ids
+    }
+    
+    if not reviews or not review_manager.save_reviews_bulk(reviews, overwrite=False):
+        return 0
     
-    if count > 0:
-        app.logger.info(f'[自动审核] 已自动标记 {count} 个无现场结果的检查项为不合格')
+    review_stats.invalidate()
+    app.logger.info(f'[自动审核] 已自动标记 {len(reviews)} 个无现场结果的检查项为不合格')
     
-    return count
+    return len(reviews)
 
 
 if __name__ == '__main__':
@@ -408,13 +573,14 @@ if __name__ == '__main__':
     if os.path.exists(EXCEL_FILE):
         try:
             print("正在加载Excel数据...")
-            data_loader = DataLoader(EXCEL_FILE, WHITELIST_FILE)
-            inspection_data = data_loader.load_and_process()
+            loader = DataLoader(EXCEL_FILE, WHITELIST_FILE)
+            loader.load_and_process()
+            activate_cycle(loader)
             print(f"成功加载 {len(inspection_data)} 条检查项数据")
             
             auto_review_no_result_items()
             
-            operators = data_loader.get_all_operators()
+            operators = cycle_operators
             if operators:
                 print(f"运营人员列表: {', '.join(operators)}")
             
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+设备异常导出性能测试
+Benchmark: /api/equipment/export with multi-day history columns
+
+默认构造2,000门店 × 10天（2,000条设备、40,000条上午/下午快照、10,000条处理记录），
+按equipment_config中的实际配置（ENABLE_MULTI_DAY_CHRONIC）导出，以多次计时的中位数判断是否超时。
+
+用法:
+  python3 benchmarks/bench_export_equipment.py                 # 默认2000门店 × 10天
+  python3 benchmarks/bench_export_equipment.py --stores 5000 --budget 2
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WAR_ZONES = ['华东', '华南', '华北', '西南']
+ACTIONS = ['已恢复', '未恢复']
+
+
+def seed(session, stores: int, days: int):
+    """构造模拟数据：每个门店一台离线POS，每天上午/下午快照和处理记录"""
+    from shared.database_models import EquipmentStatus, EquipmentStatusSnapshot, EquipmentProcessing
+
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    equipment, snapshots, processing = [], [], []
+    for i in range(stores):
+        store_id = f'B{i:05d}'
+        equipment.append({
+            'store_id': store_id, 'store_name': f'牛约堡-测试门店{i}', 'war_zone': WAR_ZONES[i % len(WAR_ZONES)],
+            'regional_manager': f'经理{i % 50}', 'equipment_type': 'POS', 'equipment_id': f'P{i}',
+            'equipment_name': f'收银机{i}', 'status': '离线', 'is_open_at_data_time': 1
+        })
+        for day in range(days):
+            day_start = today_start - timedelta(days=day)
+            for period, hour in (('AM', 10), ('PM', 17)):
+                snapshots.append({
+                    'snapshot_date': day_start + timedelta(hours=hour), 'snapshot_period': period,
+                    'store_id': store_id, 'equipment_type': 'POS', 'has_abnormal': int((i + day) % 3 != 0)
+                })
+            if (i + day) % 2 == 0:
+                processing.append({
+                    'store_id': store_id, 'equipment_type': 'POS', 'action': ACTIONS[(i + day) % 4 // 2],
+                    'reason': '网络故障，已联系运维处理' if (i + day) % 4 else None,
+                    'processed_at': day_start + timedelta(hours=11)
+                })
+
+    session.execute(EquipmentStatus.__table__.insert(), equipment)
+    session.execute(EquipmentStatusSnapshot.__table__.insert(), snapshots)
+    session.execute(EquipmentProcessing.__table__.insert(), processing)
+    session.commit()
+    return len(equipment), len(snapshots), len(processing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='设备异常导出性能测试')
+    parser.add_argument('--stores', type=int, default=2000, help='门店数')
+    parser.add_argument('--days', type=int, default=10, help='历史天数')
+    parser.add_argument('--budget', type=float, default=1.0, help='导出耗时中位数上限（秒）')
+    parser.add_argument('--repeat', type=int, default=5, help='计时次数（另有一次预热）')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{tmp_dir}/bench_equipment.db'
+
+    from equipment_config import ENABLE_MULTI_DAY_CHRONIC
+    import viewer.app_viewer as app_module
+
+    session = app_module.SessionFactory()
+    print(f"构造 {args.stores} 门店 × {args.days} 天模拟数据...")
+    equipment_rows, snapshot_rows, processing_rows = seed(session, args.stores, args.days)
+    print(f"设备 {equipment_rows} 条，快照 {snapshot_rows} 条，处理记录 {processing_rows} 条")
+    print(f"多日经常出问题判断: {'开启' if ENABLE_MULTI_DAY_CHRONIC else '关闭'}（equipment_config.ENABLE_MULTI_DAY_CHRONIC）")
+
+    client = app_module.app.test_client()
+    url = f'/api/equipment/export?history_days={args.days}'
+    response = client.get(url)
+    if response.status_code != 200:
+        print(f"❌ 导出失败: {response.status_code} {response.get_data()[:200]!r}")
+        sys.exit(1)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        size = len(client.get(url).get_data())
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median = timings[len(timings) // 2]
+
+    print(f"导出耗时: 中位数 {median:.2f}s，最快 {timings[0]:.2f}s，最慢 {timings[-1]:.2f}s（{size / 1024:.0f} KB）")
+    if median > args.budget:
+        print(f"❌ 中位数超过 {args.budget:.1f}s")
+        sys.exit(1)
+    print(f"✓ 中位数在 {args.budget:.1f}s 以内")
+
+
+if __name__ == '__main__':
+    main()
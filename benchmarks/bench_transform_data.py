@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+DataLoader.transform_data 性能对比
+Benchmark: row-by-row vs columnar transform
+
+用法:
+  python3 benchmarks/bench_transform_data.py            # 默认10万行
+  python3 benchmarks/bench_transform_data.py --rows 50000
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_loader import DataLoader
+
+
+ITEM_NAMES = ['门店餐桌区', '门店厨房', '门店卫生间', '门头', '吧台', '仓库', '冷库', '收银台']
+
+
+def build_sheet(rows: int) -> pd.DataFrame:
+    """构造模拟的检查项记录表（各种现场结果格式混合）"""
+    records = []
+    for i in range(rows):
+        store_id = i // len(ITEM_NAMES) + 1
+        kind = i % 10
+        if kind < 6:
+            result = f'["https://example.com/{i}.jpg"]'
+        elif kind == 6:
+            result = f'["https://example.com/{i}.jpg"],https://example.com/{i}_extra.jpg'
+        elif kind == 7:
+            result = f'["<img src=\\"https://example.com/{i}.jpg\\" />"]'
+        elif kind == 8:
+            result = f'https://example.com/{i}.jpg'
+        else:
+            result = None
+        records.append({
+            '检查项名称': ITEM_NAMES[i % len(ITEM_NAMES)],
+            '门店名称': f'牛约堡-测试门店{store_id}',
+            '门店编号': store_id,
+            '所属区域': '牛约堡/上海战区/上海/上海',
+            '检查项分类': '周清',
+            '现场结果': result,
+        })
+    return pd.DataFrame(records)
+
+
+def time_transform(df: pd.DataFrame, vectorized: bool):
+    """执行一次转换，返回(耗时秒数, 结果)"""
+    loader = DataLoader('benchmark.xlsx')
+    loader.df = df
+    start = time.perf_counter()
+    data = loader.transform_data(vectorized=vectorized)
+    return time.perf_counter() - start, data
+
+
+def main():
+    parser = argparse.ArgumentParser(description='transform_data 性能对比')
+    parser.add_argument('--rows', type=int, default=100_000, help='模拟数据行数')
+    args = parser.parse_args()
+
+    print(f"构造 {args.rows} 行模拟数据...")
+    df = build_sheet(args.rows)
+
+    row_seconds, row_data = time_transform(df, vectorized=False)
+    column_seconds, column_data = time_transform(df, vectorized=True)
+
+    if row_data != column_data:
+        print("❌ 两种转换方式的输出不一致")
+        sys.exit(1)
+
+    print(f"逐行转换(iterrows): {row_seconds:.2f}s")
+    print(f"按列转换:           {column_seconds:.2f}s")
+    print(f"加速比:             {row_seconds / column_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@ Business Hours Parsing Utility
 """
 import re
 from datetime import datetime, date, timedelta
+from functools import lru_cache
+import numpy as np
 
 
 # 星期映射
@@ -20,6 +22,9 @@ WEEKDAY_MAP = {
 }
 WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
 
+# 一天的分钟数（营业时间按分钟判断）
+MINUTES_PER_DAY = 1440
+
 
 def parse_business_hours(hours_str: str) -> dict:
     """
@@ -60,6 +65,34 @@ def parse_business_hours(hours_str: str) -> dict:
     return result
 
 
+@lru_cache(maxsize=4096)
+def compile_business_hours(hours_str: str) -> np.ndarray:
+    """
+    把营业时间字符串编译为 7×1440 的营业位图（按营业时间字符串缓存，每种字符串只解析一次）
+
+    位图[weekday, minute] 为 True 表示该分钟营业：
+      - 当天的时间段 [start, end) 营业，24:00 结尾即到当天结束
+      - 00:00-X 跨午夜延续段（前一天 24:00 的延续）同样是当天的 [0, X)
+      - 解析失败或为空时全部为 True（保守策略，不误过滤）
+
+    Args:
+        hours_str: 营业时间字符串
+
+    Returns:
+        np.ndarray: 只读的 (7, 1440) 布尔数组
+    """
+    parsed = parse_business_hours(hours_str)
+    if not any(parsed.values()):
+        bitmap = np.ones((7, MINUTES_PER_DAY), dtype=bool)
+    else:
+        bitmap = np.zeros((7, MINUTES_PER_DAY), dtype=bool)
+        for weekday, ranges in parsed.items():
+            for start_min, end_min in ranges:
+                bitmap[weekday, start_min:end_min] = True
+    bitmap.flags.writeable = False
+    return bitmap
+
+
 def is_open_at(hours_str: str, check_dt: datetime) -> bool:
     """
     判断门店在指定时间点是否处于营业状态
@@ -75,44 +108,33 @@ def is_open_at(hours_str: str, check_dt: datetime) -> bool:
     Returns:
         bool: True=营业中，False=未营业
     """
-    parsed = parse_business_hours(hours_str)
-    if not any(parsed.values()):
-        # 解析失败或为空，默认认为营业（保守策略，不误过滤）
-        return True
+    return bool(compile_business_hours(hours_str)[check_dt.weekday(), check_dt.hour * 60 + check_dt.minute])
+
+
+def is_open_at_batch(hours_strings, check_dt: datetime) -> np.ndarray:
+    """
+    批量判断多个门店在同一时间点是否营业（相同的营业时间字符串只查一次位图）
 
-    weekday = check_dt.weekday()  # 0=周一
+    Args:
+        hours_strings: 营业时间字符串序列（None、NaN等非字符串按营业时间未知处理，视为营业）
+        check_dt: 要检查的时间点
+
+    Returns:
+        np.ndarray: 与hours_strings顺序一致的布尔数组
+    """
+    weekday = check_dt.weekday()
     check_min = check_dt.hour * 60 + check_dt.minute
 
-    # 1. 检查当天的时间段（排除 00:00 开头的跨午夜延续段）
-    for start_min, end_min in parsed[weekday]:
-        if start_min == 0 and end_min <= 240:
-            # 这是跨午夜延续段（前一天的），跳过，在步骤2处理
-            continue
-        if start_min <= check_min < end_min:
-            return True
-        # 24:00 结尾特殊处理：end_min == 1440 表示到当天结束
-        if end_min == 1440 and start_min <= check_min:
-            return True
-
-    # 2. 检查前一天是否有跨午夜延续到今天的时间段
-    prev_weekday = (weekday - 1) % 7
-    for start_min, end_min in parsed[prev_weekday]:
-        if end_min == 1440:
-            # 前一天到 24:00，今天 00:00 开始检查当天是否有延续段
-            # 找今天 00:00 开头的延续段
-            pass
-        # 前一天有 24:00 结尾，今天的 00:00-X 段是延续
-        # 实际上延续段已经在今天的 parsed[weekday] 里以 00:00-X 形式存在
-        # 所以这里只需要检查今天 00:00 开头的段
-    
-    # 检查今天 00:00 开头的跨午夜延续段（来自前一天 24:00 的延续）
-    for start_min, end_min in parsed[weekday]:
-        if start_min == 0 and end_min <= 240:
-            # 这是跨午夜延续段，check_min 在 [0, end_min) 内则营业
-            if check_min < end_min:
-                return True
-
-    return False
+    codes = {}
+    indexes = np.fromiter(
+        (codes.setdefault(hours if isinstance(hours, str) else '', len(codes)) for hours in hours_strings),
+        dtype=np.intp
+    )
+    open_flags = np.fromiter(
+        (compile_business_hours(hours)[weekday, check_min] for hours in codes),
+        dtype=bool, count=len(codes)
+    )
+    return open_flags[indexes]
 
 
 def get_open_status_description(hours_str: str, check_dt: datetime) -> str:
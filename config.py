@@ -31,6 +31,12 @@ WHITELIST_FILE = os.getenv(
     str(BASE_DIR / 'data' / 'whitelist.xlsx')  # 使用项目内的data目录
 )
 
+# 多worker共享的周期数据快照目录（/dev/shm为内存文件系统）
+CYCLE_STORE_DIR = os.getenv(
+    'CYCLE_STORE_DIR',
+    '/dev/shm/inspection_cycle' if os.path.isdir('/dev/shm') else str(BASE_DIR / 'data' / 'cycle')
+)
+
 # Flask配置
 MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB
 JSON_AS_ASCII = False  # 支持中文
@@ -4,9 +4,29 @@ CSV Exporter Module
 """
 import csv
 from io import StringIO
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from datetime import datetime
-from database import get_session, StoreWhitelist
+from sqlalchemy import select
+from database import get_session, Review, StoreWhitelist
+from shared.database_models import get_data_version
+
+
+# CSV列（增加战区、省份、城市）
+CSV_FIELDNAMES = [
+    '门店名称',
+    '门店编号',
+    '战区',
+    '省份',
+    '城市',
+    '所属区域',
+    '检查项名称',
+    '检查项分类',
+    '负责运营',
+    '标准图',
+    '审核结果',
+    '问题描述',
+    '审核时间'
+]
 
 
 class CSVExporter:
@@ -15,6 +35,7 @@ class CSVExporter:
     def __init__(self):
         """初始化CSV导出器"""
         self._whitelist_cache = None
+        self._whitelist_version = None
     
     def export_reviews(self, reviews: List[Dict], original_data: List[Dict]) -> str:
         """
@@ -39,13 +60,93 @@ class CSVExporter:
         # 添加UTF-8 BOM以支持Excel正确打开中文
         return '\ufeff' + csv_content
     
+    def stream_reviews(self, item_store, batch_size: int = 1000) -> Iterator[str]:
+        """
+        流式导出审核结果为CSV（用于Flask生成器响应）
+        
+        审核记录与store_whitelist在SQL中LEFT JOIN，通过服务端游标按批读取，
+        每批生成一段CSV文本后立即产出，内存占用与数据量无关。
+        第一段为UTF-8 BOM和表头，在查询结果返回之前即可发送。
+        与export_reviews一致，只导出当前周期中存在的检查项，
+        门店名称、检查项分类、负责运营等字段取自当前周期数据。
+        
+        Args:
+            item_store: 当前周期的检查项索引（ItemStore）
+            batch_size: 每批读取的行数
+            
+        Yields:
+            str: CSV文本片段
+        """
+        output = StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        
+        # UTF-8 BOM + 表头，支持Excel正确打开中文
+        writer.writerow(CSV_FIELDNAMES)
+        yield '\ufeff' + output.getvalue()
+        
+        stmt = (
+            select(
+                Review.item_id,
+                Review.store_id,
+                Review.review_result,
+                Review.problem_note,
+                Review.review_time,
+                StoreWhitelist.war_zone,
+                StoreWhitelist.province,
+                StoreWhitelist.city
+            )
+            .outerjoin(StoreWhitelist, StoreWhitelist.store_id == Review.store_id)
+            .order_by(Review.store_id, Review.item_id)
+            .execution_options(stream_results=True, yield_per=batch_size)
+        )
+        
+        session = get_session()
+        try:
+            for rows in session.execute(stmt).partitions():
+                output.seek(0)
+                output.truncate(0)
+                
+                for row in rows:
+                    item = item_store.get(row.item_id)
+                    if item is None:
+                        continue
+                    
+                    writer.writerow([
+                        item.get('门店名称', ''),
+                        item.get('门店编号', ''),
+                        row.war_zone or '',
+                        row.province or '',
+                        row.city or '',
+                        item.get('所属区域', ''),
+                        item.get('检查项名称', ''),
+                        item.get('检查项分类', ''),
+                        item.get('负责运营', ''),
+                        item.get('标准图', ''),
+                        row.review_result,
+                        row.problem_note or '',
+                        row.review_time.strftime('%Y-%m-%d %H:%M:%S') if row.review_time else ''
+                    ])
+                
+                chunk = output.getvalue()
+                if chunk:
+                    yield chunk
+        finally:
+            session.close()
+    
     def _load_whitelist_cache(self):
-        """从数据库加载白名单数据到缓存"""
-        if self._whitelist_cache is not None:
-            return
+        """
+        从数据库加载白名单数据到缓存
         
+        每次调用先查询白名单版本号（主键查询），版本未变化时沿用缓存；
+        白名单重新导入后版本号递增，各进程在下一次导出时自动重新加载。
+        """
         session = get_session()
         try:
+            version = get_data_version(session, StoreWhitelist.__tablename__)
+            if (self._whitelist_cache is not None and version is not None
+                    and version == self._whitelist_version):
+                return
+            
             stores = session.query(StoreWhitelist).all()
             self._whitelist_cache = {
                 store.store_id: {
@@ -55,6 +156,7 @@ class CSVExporter:
                 }
                 for store in stores
             }
+            self._whitelist_version = version
         finally:
             session.close()
     
@@ -138,25 +240,8 @@ class CSVExporter:
         # 使用StringIO作为内存中的文件对象
         output = StringIO()
         
-        # 定义CSV列（增加战区、省份、城市）
-        fieldnames = [
-            '门店名称',
-            '门店编号',
-            '战区',
-            '省份',
-            '城市',
-            '所属区域',
-            '检查项名称',
-            '检查项分类',
-            '负责运营',
-            '标准图',
-            '审核结果',
-            '问题描述',
-            '审核时间'
-        ]
-        
         # 创建CSV写入器
-        writer = csv.DictWriter(output, fieldnames=fieldnames, lineterminator='\n')
+        writer = csv.DictWriter(output, fieldnames=CSV_FIELDNAMES, lineterminator='\n')
         
         # 写入表头
         writer.writeheader()
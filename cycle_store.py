@@ -0,0 +1,140 @@
+"""
+跨进程共享的审核周期数据模块
+Shared Cycle Snapshot Store Module (multi-worker)
+"""
+import os
+import glob
+import mmap
+import pickle
+import stat
+import time
+from typing import Any, Optional, Tuple
+
+
+class CycleStore:
+    """
+    审核周期数据快照（默认放在/dev/shm，内存文件系统）
+
+    上传/重置周期的worker调用publish()写入一份pickle快照并更新"当前代"指针文件；
+    其他worker每个请求调用current_generation()（一次stat，O(1)），
+    发现代号变化后再用load()读取新快照。
+    文件均先写临时文件再os.replace()，读取方不会看到写了一半的文件。
+
+    /dev/shm所有用户可写，快照又是pickle格式：目录以0o700创建，
+    读取前检查目录和快照文件属于当前用户、且组和其他用户不可写，否则拒绝反序列化。
+    """
+
+    # 保留的历史快照数（正在读取旧快照的worker不会因文件被删除而失败）
+    KEEP_SNAPSHOTS = 2
+
+    def __init__(self, directory: str, name: str = 'cycle'):
+        """
+        初始化快照存储
+
+        Args:
+            directory: 快照目录（各worker需要相同）
+            name: 快照名称前缀
+        """
+        self.directory = directory
+        self.name = name
+        self._pointer_path = os.path.join(directory, f'{name}.current')
+        self._pointer_key: Optional[Tuple[int, int]] = None
+        self._generation: Optional[str] = None
+
+    def publish(self, snapshot: Any) -> str:
+        """
+        写入新的周期快照并设为当前代
+
+        Args:
+            snapshot: 可pickle的周期数据
+
+        Returns:
+            str: 新的代号
+        """
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._check_owned(os.stat(self.directory), self.directory)
+        generation = f'{time.time_ns()}-{os.getpid()}'
+
+        path = self._snapshot_path(generation)
+        self._write_atomic(path, pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+        self._write_atomic(self._pointer_path, generation.encode('ascii'))
+
+        self._remove_old_snapshots()
+        return generation
+
+    def current_generation(self) -> Optional[str]:
+        """
+        获取当前代号（指针文件未变化时只做一次stat）
+
+        Returns:
+            Optional[str]: 当前代号，尚未发布过快照时返回None
+        """
+        try:
+            st = os.stat(self._pointer_path)
+        except FileNotFoundError:
+            return None
+
+        key = (st.st_ino, st.st_mtime_ns)
+        if key != self._pointer_key:
+            try:
+                with open(self._pointer_path, 'rb') as f:
+                    self._generation = f.read().decode('ascii').strip()
+            except FileNotFoundError:
+                return self._generation
+            self._pointer_key = key
+        return self._generation
+
+    def load(self, generation: str) -> Optional[Any]:
+        """
+        读取指定代的快照（内存映射后反序列化，不额外复制文件内容）
+
+        Args:
+            generation: 代号
+
+        Returns:
+            Optional[Any]: 周期数据，快照不存在（已被清理）时返回None
+
+        Raises:
+            PermissionError: 快照目录或文件不属于当前用户，或组和其他用户可写
+        """
+        try:
+            self._check_owned(os.stat(self.directory), self.directory)
+            with open(self._snapshot_path(generation), 'rb') as f:
+                self._check_owned(os.fstat(f.fileno()), f.name)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return pickle.loads(mm)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _check_owned(st: os.stat_result, path: str):
+        """检查路径属于当前用户，且组和其他用户不可写"""
+        if st.st_uid != os.geteuid() or stat.S_IMODE(st.st_mode) & 0o022:
+            raise PermissionError(
+                f'快照路径不属于当前用户或权限过宽（uid={st.st_uid}, mode={oct(stat.S_IMODE(st.st_mode))}）: {path}'
+            )
+
+    def _snapshot_path(self, generation: str) -> str:
+        return os.path.join(self.directory, f'{self.name}-{generation}.pkl')
+
+    def _write_atomic(self, path: str, data: bytes):
+        """先写临时文件再原子替换"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove_old_snapshots(self):
+        """删除较旧的快照文件"""
+        prefix_length = len(self.name) + 1
+        # 按代号中的时间戳排序（文件mtime精度不足以区分快速连续的发布）
+        snapshots = sorted(
+            glob.glob(os.path.join(self.directory, f'{self.name}-*.pkl')),
+            key=lambda path: int(os.path.basename(path)[prefix_length:].split('-')[0])
+        )
+        for path in snapshots[:-self.KEEP_SNAPSHOTS]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -2,9 +2,16 @@
 数据加载模块
 Data Loader Module
 """
+import json
+import re
 import pandas as pd
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from whitelist_loader import WhitelistLoader
+from item_store import ItemStore
+
+
+# 从<img>标签中提取src属性
+IMG_SRC_PATTERN = re.compile(r'src="([^"]+)"')
 
 
 class DataLoader:
@@ -30,6 +37,7 @@ class DataLoader:
         self.whitelist_path = whitelist_path
         self.df: Optional[pd.DataFrame] = None
         self.data: List[Dict] = []
+        self.item_store: ItemStore = ItemStore()
         self.whitelist_loader: Optional[WhitelistLoader] = None
         
         # 如果提供了白名单路径，加载白名单
@@ -78,17 +86,38 @@ class DataLoader:
         
         return True
     
-    def transform_data(self) -> List[Dict]:
+    def transform_data(self, vectorized: bool = True) -> List[Dict]:
         """
         将DataFrame转换为字典列表，并为每个检查项生成唯一ID
         
+        Args:
+            vectorized: 是否使用按列批量转换（默认True）；False时逐行转换，
+                两种方式输出完全一致
+        
         Returns:
             List[Dict]: 转换后的数据列表
         """
         if self.df is None:
             raise ValueError("数据未加载，请先调用load_excel()")
         
-        self.data = []
+        if vectorized:
+            self.data = self._transform_columns()
+        else:
+            self.data = self._transform_rows()
+        
+        # 建立检查项索引（按ID、门店编号、负责运营）
+        self.item_store = ItemStore(self.data)
+        
+        return self.data
+    
+    def _transform_rows(self) -> List[Dict]:
+        """
+        逐行转换DataFrame（iterrows）
+        
+        Returns:
+            List[Dict]: 转换后的数据列表
+        """
+        data = []
         
         for _, row in self.df.iterrows():
             # 生成唯一ID: 门店编号_检查项名称
@@ -99,52 +128,8 @@ class DataLoader:
             # 从"现场结果"列获取图片链接
             image_url = ''
             has_result = False
-            
-            # 尝试从"现场结果"列获取图片链接
             if '现场结果' in self.df.columns and pd.notna(row['现场结果']):
-                try:
-                    import json
-                    result_data = str(row['现场结果']).strip()
-                    
-                    # 处理可能的格式：JSON数组后面跟着额外的URL
-                    # 例如：["url1"],url2 这种情况
-                    if result_data.startswith('[') and '],' in result_data:
-                        # 只取JSON数组部分
-                        json_end = result_data.index('],') + 1
-                        result_data = result_data[:json_end]
-                    
-                    # 解析JSON数组
-                    urls = json.loads(result_data)
-                    if isinstance(urls, list) and len(urls) > 0:
-                        # 取第一个URL，并检查是否是HTML标签
-                        first_url = urls[0]
-                        if isinstance(first_url, str):
-                            # 检查是否是HTML标签
-                            if first_url.strip().startswith('<img'):
-                                # 提取src属性
-                                import re
-                                match = re.search(r'src="([^"]+)"', first_url)
-                                if match:
-                                    image_url = match.group(1)
-                                    has_result = True
-                            else:
-                                # 直接使用URL
-                                image_url = first_url
-                                has_result = True
-                except (json.JSONDecodeError, ValueError) as e:
-                    # 如果解析失败，尝试直接使用字符串
-                    result_str = str(row['现场结果']).strip()
-                    if result_str and result_str != 'nan':
-                        # 检查是否是HTML标签
-                        if result_str.startswith('<img'):
-                            import re
-                            match = re.search(r'src="([^"]+)"', result_str)
-                            if match:
-                                image_url = match.group(1)
-                                has_result = True
-                        else:
-                            image_url = result_str
-                            has_result = True
+                image_url, has_result = self._parse_result_cell(row['现场结果'])
             
             # 构建数据项
             item = {
@@ -168,9 +153,183 @@ class DataLoader:
             else:
                 item['负责运营'] = '未分配'
             
-            self.data.append(item)
+            data.append(item)
         
-        return self.data
+        return data
+    
+    def _transform_columns(self) -> List[Dict]:
+        """
+        按列批量转换DataFrame，输出与_transform_rows()一致
+        
+        Returns:
+            List[Dict]: 转换后的数据列表
+        """
+        df = self.df
+        row_count = len(df)
+        
+        # 门店编号、检查项名称等文本列整列转换
+        store_ids = self._store_id_column(df['门店编号'])
+        item_names = self._text_column(df['检查项名称'])
+        unique_ids = (
+            store_ids.where(df['门店编号'].notna(), 'unknown') + '_' +
+            item_names.where(df['检查项名称'].notna(), 'unknown')
+        ).tolist()
+        store_ids = store_ids.tolist()
+        item_names = item_names.tolist()
+        store_names = self._text_column(df['门店名称']).tolist()
+        areas = self._text_column(df['所属区域']).tolist()
+        
+        if '现场结果' in df.columns:
+            image_urls, has_results = self._parse_result_column(df['现场结果'])
+        else:
+            image_urls, has_results = [''] * row_count, [False] * row_count
+        
+        categories = self._text_column(df['检查项分类']).tolist() if '检查项分类' in df.columns else None
+        
+        if self.whitelist_loader:
+            operator_mapping = self.whitelist_loader.get_operator_mapping()
+            operators = [operator_mapping.get(store_id, '未分配') for store_id in store_ids]
+        else:
+            operators = ['未分配'] * row_count
+        
+        data = []
+        for i in range(row_count):
+            item = {
+                'id': unique_ids[i],
+                '检查项名称': item_names[i],
+                '门店名称': store_names[i],
+                '门店编号': store_ids[i],
+                '所属区域': areas[i],
+                '标准图': image_urls[i],
+                '无现场结果': not has_results[i]
+            }
+            if categories is not None:
+                item['检查项分类'] = categories[i]
+            item['负责运营'] = operators[i]
+            data.append(item)
+        
+        return data
+    
+    @staticmethod
+    def _text_column(column: pd.Series) -> pd.Series:
+        """将一列转换为字符串，空值为空字符串（等价于逐行 str(value)）"""
+        return column.astype(object).map(str, na_action='ignore').where(column.notna(), '')
+    
+    @staticmethod
+    def _store_id_column(column: pd.Series) -> pd.Series:
+        """将门店编号列转换为字符串，空值为空字符串（等价于逐行 str(int(value))）"""
+        notna = column.notna()
+        if pd.api.types.is_numeric_dtype(column):
+            ids = column[notna].astype('int64').astype(str).astype(object)
+        else:
+            ids = column[notna].map(lambda value: str(int(value))).astype(object)
+        return ids.reindex(column.index, fill_value='')
+    
+    def _parse_result_column(self, column: pd.Series) -> Tuple[List[str], List[bool]]:
+        """
+        批量解析"现场结果"列
+        
+        以'['开头的单元格拼接成一个JSON数组一次解码；拼接解码失败或
+        元素个数对不上时，退回逐个单元格解析。
+        
+        Args:
+            column: "现场结果"列
+            
+        Returns:
+            Tuple[List[str], List[bool]]: (图片URL列表, 是否有现场结果列表)
+        """
+        row_count = len(column)
+        image_urls = [''] * row_count
+        has_results = [False] * row_count
+        
+        notna = column.notna().tolist()
+        texts = self._text_column(column).str.strip().tolist()
+        
+        json_positions = []
+        json_texts = []
+        for i, text in enumerate(texts):
+            if not notna[i]:
+                continue
+            if text.startswith('['):
+                # 处理可能的格式：JSON数组后面跟着额外的URL，只取JSON数组部分
+                json_end = text.find('],')
+                json_positions.append(i)
+                json_texts.append(text[:json_end + 1] if json_end >= 0 else text)
+            else:
+                image_urls[i], has_results[i] = self._parse_result_cell(column.iat[i])
+        
+        decoded = None
+        if json_texts:
+            try:
+                decoded = json.loads('[' + ','.join(json_texts) + ']')
+            except ValueError:
+                decoded = None
+            if decoded is not None and len(decoded) != len(json_texts):
+                decoded = None
+        
+        for index, i in enumerate(json_positions):
+            if decoded is not None:
+                image_urls[i], has_results[i] = self._first_result_url(decoded[index])
+            else:
+                image_urls[i], has_results[i] = self._parse_result_cell(column.iat[i])
+        
+        return image_urls, has_results
+    
+    def _parse_result_cell(self, value) -> Tuple[str, bool]:
+        """
+        解析单个"现场结果"单元格
+        
+        Args:
+            value: 单元格值（JSON数组、<img>标签或URL）
+            
+        Returns:
+            Tuple[str, bool]: (图片URL, 是否有现场结果)
+        """
+        result_data = str(value).strip()
+        
+        # 处理可能的格式：JSON数组后面跟着额外的URL
+        # 例如：["url1"],url2 这种情况
+        if result_data.startswith('[') and '],' in result_data:
+            # 只取JSON数组部分
+            json_end = result_data.index('],') + 1
+            result_data = result_data[:json_end]
+        
+        try:
+            urls = json.loads(result_data)
+        except ValueError:
+            # 如果解析失败，尝试直接使用字符串
+            return self._parse_result_text(str(value).strip())
+        
+        return self._first_result_url(urls)
+    
+    @staticmethod
+    def _first_result_url(urls) -> Tuple[str, bool]:
+        """从解析后的JSON数组中取第一个图片URL"""
+        if isinstance(urls, list) and len(urls) > 0:
+            first_url = urls[0]
+            if isinstance(first_url, str):
+                # 检查是否是HTML标签
+                if first_url.strip().startswith('<img'):
+                    match = IMG_SRC_PATTERN.search(first_url)
+                    if match:
+                        return match.group(1), True
+                else:
+                    # 直接使用URL
+                    return first_url, True
+        return '', False
+    
+    @staticmethod
+    def _parse_result_text(result_str: str) -> Tuple[str, bool]:
+        """将非JSON的"现场结果"文本解析为图片URL"""
+        if result_str and result_str != 'nan':
+            # 检查是否是HTML标签
+            if result_str.startswith('<img'):
+                match = IMG_SRC_PATTERN.search(result_str)
+                if match:
+                    return match.group(1), True
+            else:
+                return result_str, True
+        return '', False
     
     def load_and_process(self) -> List[Dict]:
         """
@@ -213,7 +372,4 @@ class DataLoader:
         Returns:
             List[Dict]: 筛选后的数据列表
         """
-        if operator == "全部" or not operator:
-            return self.data
-        
-        return [item for item in self.data if item.get('负责运营') == operator]
+        return self.item_store.get_by_operator(operator)
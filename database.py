@@ -7,6 +7,7 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from datetime import datetime
 import os
+from shared.database_models import DataVersion, bump_data_version
 
 # 数据库连接URL
 DATABASE_URL = os.getenv(
@@ -119,9 +120,11 @@ def init_db():
     """初始化数据库，创建所有表"""
     # 只创建当前项目定义的表，不影响其他表
     Base.metadata.create_all(engine)
+    DataVersion.__table__.create(engine, checkfirst=True)
     print("✓ 数据库表初始化完成")
     print(f"  - 表名: {Review.__tablename__}")
     print(f"  - 表名: {StoreWhitelist.__tablename__}")
+    print(f"  - 表名: {DataVersion.__tablename__}")
 
 
 def load_whitelist_to_db(whitelist_file: str) -> int:
@@ -165,6 +168,9 @@ def load_whitelist_to_db(whitelist_file: str) -> int:
             session.add(store)
             count += 1
         
+        # 白名单版本号+1，各进程的白名单缓存据此重新加载
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        
         session.commit()
         print(f"✓ 白名单加载完成，共 {count} 条门店数据")
         return count
@@ -0,0 +1,179 @@
+"""
+设备异常看板状态
+Equipment Dashboard State (precomputed per import)
+"""
+from datetime import date, datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from shared.database_models import (
+    EquipmentStatus, EquipmentProcessing, EquipmentDashboardState,
+    get_data_version, get_data_stamp, set_data_version, advisory_xact_lock
+)
+from equipment_utils import calculate_chronic_stats, get_latest_suppressions
+
+
+# 处理状态
+STATUS_PENDING = 'pending'
+STATUS_RECOVERED = 'recovered'
+STATUS_NOT_RECOVERED = 'not_recovered'
+
+# 看板状态生成标记（data_versions中的一行）：version=生成时的设备数据版本号，updated_at=生成时间；
+# 同时用作重新生成时的咨询锁名称
+DASHBOARD_STATE_MARKER = EquipmentDashboardState.__tablename__
+
+
+def _processing_statuses(session: Session, store_ids: list = None) -> dict:
+    """
+    根据今天的处理记录计算门店处理状态（任一设备"未恢复"即为未恢复）
+
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表，为None时查询所有门店
+
+    Returns:
+        dict: {store_id: recovered/not_recovered}，没有处理记录的门店不在其中
+    """
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    query = session.query(EquipmentProcessing.store_id, EquipmentProcessing.action)\
+        .filter(EquipmentProcessing.processed_at >= today_start)
+    if store_ids is not None:
+        query = query.filter(EquipmentProcessing.store_id.in_(store_ids))
+
+    statuses = {}
+    for store_id, action in query.all():
+        if action == '未恢复':
+            statuses[store_id] = STATUS_NOT_RECOVERED
+        else:
+            statuses.setdefault(store_id, STATUS_RECOVERED)
+    return statuses
+
+
+def _chronic_columns(info: dict) -> dict:
+    return {
+        'is_chronic': 1 if info.get('is_chronic') else 0,
+        'chronic_reason': info.get('chronic_reason'),
+        'abnormal_count_5days': info.get('abnormal_count_5days', 0),
+        'abnormal_count_10days': info.get('abnormal_count_10days', 0)
+    }
+
+
+def build_dashboard_state(session: Session, generation: int = None) -> int:
+    """
+    重新生成设备异常看板状态，并记录生成标记（不提交，随调用方事务提交）
+
+    营业时间内有异常设备的门店各一行：处理状态、经常出问题、POS暂时不提示截止日期。
+    数据量与门店数成正比，查询次数固定。生成前加事务级咨询锁，多个进程不会同时删除、写入。
+
+    Args:
+        session: 数据库会话
+        generation: 设备数据版本号，为None时读取当前版本号
+
+    Returns:
+        int: 门店数
+    """
+    advisory_xact_lock(session, DASHBOARD_STATE_MARKER)
+    if generation is None:
+        generation = get_data_version(session, EquipmentStatus.__tablename__) or 0
+
+    stores = session.query(
+        EquipmentStatus.store_id,
+        func.max(EquipmentStatus.store_name),
+        func.max(EquipmentStatus.war_zone),
+        func.max(EquipmentStatus.regional_manager)
+    ).filter(EquipmentStatus.is_open_at_data_time == 1)\
+        .group_by(EquipmentStatus.store_id)\
+        .all()
+    store_ids = [row[0] for row in stores]
+
+    suppressions = get_latest_suppressions(session, None, 'POS')
+    statuses = _processing_statuses(session)
+    chronic_stats = calculate_chronic_stats(session, store_ids)
+    built_at = datetime.now()
+
+    session.query(EquipmentDashboardState).delete(synchronize_session=False)
+    rows = []
+    for store_id, store_name, war_zone, regional_manager in stores:
+        suppressed_until, _ = suppressions.get((store_id, 'POS'), (None, None))
+        rows.append({
+            'store_id': store_id,
+            'store_name': store_name,
+            'war_zone': war_zone,
+            'regional_manager': regional_manager,
+            'processing_status': statuses.get(store_id, STATUS_PENDING),
+            'suppressed_until': suppressed_until,
+            'generation': generation,
+            'built_at': built_at,
+            **_chronic_columns(chronic_stats.get(store_id, {}))
+        })
+    if rows:
+        session.execute(EquipmentDashboardState.__table__.insert(), rows)
+    set_data_version(session, DASHBOARD_STATE_MARKER, generation, built_at)
+    return len(rows)
+
+
+def dashboard_state_is_current(session: Session) -> bool:
+    """
+    看板状态是否为当前设备数据、今天生成的（只读，根据生成标记判断）
+
+    Args:
+        session: 数据库会话
+
+    Returns:
+        bool: 是否为最新
+    """
+    generation = get_data_version(session, EquipmentStatus.__tablename__)
+    marker = get_data_stamp(session, DASHBOARD_STATE_MARKER)
+    if generation is None or marker is None or marker[1] is None:
+        return False
+    built_generation, built_at = marker
+    return built_generation == generation and built_at.date() == date.today()
+
+
+def ensure_dashboard_state(session: Session) -> bool:
+    """
+    确认看板状态为最新，否则重新生成并提交（rebuild_equipment_dashboard.py定时任务调用）
+
+    导入流程每次导入后已生成看板状态；定时任务在跨天后、或导入未能生成时重新生成。
+    加锁后再判断一次，与同时进行的导入不会重复生成。
+
+    Args:
+        session: 数据库会话
+
+    Returns:
+        bool: 是否重新生成
+    """
+    if dashboard_state_is_current(session):
+        return False
+
+    advisory_xact_lock(session, DASHBOARD_STATE_MARKER)
+    if dashboard_state_is_current(session):
+        # 等锁期间其他进程已重新生成，结束事务释放锁
+        session.rollback()
+        return False
+
+    build_dashboard_state(session)
+    session.commit()
+    return True
+
+
+def refresh_store_state(session: Session, store_id: str) -> bool:
+    """
+    处理设备异常后更新单个门店的看板状态（不提交，随处理记录在同一事务中提交）
+
+    Args:
+        session: 数据库会话
+        store_id: 门店ID
+
+    Returns:
+        bool: 门店是否在看板中
+    """
+    state = session.query(EquipmentDashboardState).filter_by(store_id=store_id).first()
+    if state is None:
+        return False
+
+    suppressed_until, _ = get_latest_suppressions(session, [store_id], 'POS').get((store_id, 'POS'), (None, None))
+    state.processing_status = _processing_statuses(session, [store_id]).get(store_id, STATUS_PENDING)
+    state.suppressed_until = suppressed_until
+    for column, value in _chronic_columns(calculate_chronic_stats(session, [store_id]).get(store_id, {})).items():
+        setattr(state, column, value)
+    return True
@@ -0,0 +1,725 @@
+"""
+设备异常数据导入流程
+Equipment Import Pipeline (transactional, callable in-process)
+
+用法:
+    pipeline = EquipmentImportPipeline(session, operating_store_file, pos_file=pos_file, stb_file=stb_file)
+    result = pipeline.run()
+
+各阶段（输入 → 输出）：
+    load_operating_stores()          → OperatingStores
+    load_whitelist()                 → {store_id: 门店信息}
+    import_pos(operating, whitelist) → DeviceImportResult
+    import_stb(operating, whitelist) → DeviceImportResult
+    record_import(pos, stb)          → 导入记录数
+    create_snapshot()                → SnapshotResult
+    auto_recover(snapshot)           → 自动标记已恢复的门店数
+    build_dashboard()                → 看板门店数
+
+run() 先获取导入咨询锁（同时发起的导入依次执行），然后在一个事务中执行全部阶段，最后统一提交：
+收银设备、机顶盒、导入日志任一阶段失败则全部回滚；
+快照、自动恢复检测、看板状态各自在保存点（SAVEPOINT）中执行，失败只回滚该阶段。
+"""
+import json
+import os
+import re
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+import pandas as pd
+from sqlalchemy.orm import Session
+from shared.database_models import (
+    bump_data_version, bulk_insert, advisory_xact_lock,
+    EquipmentStatus, EquipmentStatusSnapshot, EquipmentProcessing, StoreWhitelist, EquipmentImportLog
+)
+from business_hours_utils import is_open_at_batch
+from equipment_dashboard import build_dashboard_state
+from equipment_config import (
+    PERMANENTLY_EXCLUDED_STORES,
+    SNAPSHOT_RETENTION_DAYS,
+    PROCESSING_RETENTION_DAYS,
+    AM_PM_BOUNDARY_HOUR,
+    AUTO_CLEANUP_OLD_SNAPSHOTS
+)
+
+
+# 导入流程的咨询锁名称（CLI、定时任务、上传接口的导入依次执行）
+IMPORT_LOCK_NAME = 'equipment_import'
+
+
+def extract_data_time(filename: str) -> Optional[str]:
+    """从文件名提取时间信息，格式：20260306_1131 -> 2026年3月6日 11:31"""
+    match = re.search(r'(\d{8})_(\d{4})', filename)
+    if match:
+        date_str = match.group(1)  # 20260306
+        time_str = match.group(2)  # 1131
+        year = date_str[0:4]
+        month = date_str[4:6].lstrip('0')
+        day = date_str[6:8].lstrip('0')
+        hour = time_str[0:2]
+        minute = time_str[2:4]
+        return f"{year}年{month}月{day}日 {hour}:{minute}"
+    return None
+
+
+def extract_data_datetime(filename: str) -> Optional[datetime]:
+    """从文件名提取 datetime 对象，用于营业时间判断"""
+    match = re.search(r'(\d{8})_(\d{4})', filename)
+    if match:
+        date_str = match.group(1)
+        time_str = match.group(2)
+        return datetime.strptime(date_str + time_str, '%Y%m%d%H%M')
+    return None
+
+
+def period_of(data_datetime: datetime) -> str:
+    """数据时间所属时段（AM/PM）"""
+    return 'AM' if data_datetime.hour < AM_PM_BOUNDARY_HOUR else 'PM'
+
+
+def write_import_status(path, status: dict):
+    """
+    写入导入任务状态文件（JSON，先写临时文件再原子替换，查询状态时不会读到写了一半的文件）
+
+    Args:
+        path: 状态文件路径
+        status: 任务状态，包含status字段（running/success/failed）
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def read_import_status(path) -> Optional[dict]:
+    """
+    读取导入任务状态文件
+
+    Returns:
+        Optional[dict]: 任务状态，文件不存在时返回None
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def clear_equipment_data(session: Session, equipment_type: str) -> Tuple[int, int]:
+    """
+    清空某类设备的异常记录和处理记录（不提交，与导入流程共用导入锁）
+
+    Args:
+        session: 数据库会话
+        equipment_type: 设备类型（POS/机顶盒）
+
+    Returns:
+        tuple: (删除的设备记录数, 删除的处理记录数)
+    """
+    advisory_xact_lock(session, IMPORT_LOCK_NAME)
+    deleted_processing = session.query(EquipmentProcessing)\
+        .filter(EquipmentProcessing.equipment_type == equipment_type)\
+        .delete(synchronize_session=False)
+    deleted_equipment = session.query(EquipmentStatus)\
+        .filter(EquipmentStatus.equipment_type == equipment_type)\
+        .delete(synchronize_session=False)
+    return deleted_equipment, deleted_processing
+
+
+@dataclass
+class OperatingStores:
+    """在营门店及营业时间"""
+    store_ids: Set[str]
+    business_hours: Dict[str, str]  # store_id -> 营业时间字符串
+
+    def open_flags(self, store_ids, data_datetime: Optional[datetime]) -> Dict[str, int]:
+        """
+        判断门店在数据时间点是否营业（一次批量判断，无营业时间数据或数据时间时保守认为营业）
+
+        Returns:
+            dict: {store_id: 1营业/0未营业}
+        """
+        store_ids = list(store_ids)
+        if data_datetime is None:
+            return dict.fromkeys(store_ids, 1)
+        is_open = is_open_at_batch([self.business_hours.get(store_id, '') for store_id in store_ids], data_datetime)
+        return dict(zip(store_ids, is_open.astype(int).tolist()))
+
+
+@dataclass
+class DeviceImportResult:
+    """收银设备/机顶盒导入结果"""
+    abnormal_count: int           # 异常门店数（收银设备）/ 异常设备数（机顶盒）
+    skip_not_operating: int = 0   # 跳过非营业中
+    skip_no_whitelist: int = 0    # 跳过不在whitelist
+    skip_not_open: int = 0        # 未在营业时间内（已记录但不计入异常）
+
+
+@dataclass
+class SnapshotResult:
+    """POS快照结果（自动恢复检测的输入）"""
+    snapshot_date: datetime
+    snapshot_period: str
+    previous_offline_store_ids: Set[str]  # 覆盖前同一时段的离线门店
+    current_offline_store_ids: Set[str]   # 本次导入的离线门店（仅营业中的）
+    snapshot_count: int
+
+
+@dataclass
+class EquipmentImportResult:
+    """设备异常导入结果"""
+    success: bool
+    pos: Optional[DeviceImportResult] = None
+    stb: Optional[DeviceImportResult] = None
+    step_timings: List[Tuple[str, float]] = field(default_factory=list)  # [(步骤名, 秒)]
+    failed_steps: List[str] = field(default_factory=list)  # 可选阶段中失败（已回滚）的步骤
+    error_message: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """转换为接口返回、任务状态文件使用的字典"""
+        return {
+            'success': self.success,
+            'pos_count': self.pos.abnormal_count if self.pos else None,
+            'stb_count': self.stb.abnormal_count if self.stb else None,
+            'failed_steps': self.failed_steps,
+            'step_timings': {name: round(elapsed, 3) for name, elapsed in self.step_timings},
+            'error_message': self.error_message
+        }
+
+
+def _column_as_str(df: pd.DataFrame, column: str) -> pd.Series:
+    """按列取字符串值（与str(row.get(column, ''))一致）"""
+    if column not in df.columns:
+        return pd.Series('', index=df.index)
+    return df[column].map(str)
+
+
+class EquipmentImportPipeline:
+    """设备异常数据导入流程，各阶段可单独调用（单独计时），run() 在一个事务中执行全部阶段"""
+
+    def __init__(self, session: Session, operating_store_file, pos_file=None, stb_file=None):
+        """
+        初始化导入流程
+
+        Args:
+            session: 数据库会话
+            operating_store_file: 在营门店Excel文件
+            pos_file: 收银设备Excel文件（为None时不导入POS）
+            stb_file: 机顶盒Excel文件（为None时不导入机顶盒）
+        """
+        self.session = session
+        self.operating_store_file = Path(operating_store_file)
+        self.pos_file = Path(pos_file) if pos_file else None
+        self.stb_file = Path(stb_file) if stb_file else None
+
+        self.pos_data_time = extract_data_time(self.pos_file.name) if self.pos_file else None
+        self.pos_data_datetime = extract_data_datetime(self.pos_file.name) if self.pos_file else None
+        self.stb_data_time = extract_data_time(self.stb_file.name) if self.stb_file else None
+        self.stb_data_datetime = extract_data_datetime(self.stb_file.name) if self.stb_file else None
+
+        # 快照时间、时段用文件名里的数据时间（而非系统当前时间）
+        self.snapshot_date = self.pos_data_datetime or datetime.now()
+        self.snapshot_period = period_of(self.snapshot_date)
+        file_date = self.snapshot_date.date()
+        self.file_day_start = datetime.combine(file_date, datetime.min.time())
+        self.file_day_end = datetime.combine(file_date, datetime.max.time())
+
+        self.step_timings = []
+
+    # ==================== 阶段 ====================
+
+    def load_operating_stores(self) -> OperatingStores:
+        """读取在营门店列表（I列和Q列都是"营业中"才算在营）"""
+        print("📖 读取在营门店列表...")
+        df_operating = pd.read_excel(self.operating_store_file, sheet_name='营业门店')
+
+        # C列(索引2)=门店ID，J列(索引9)=营业时间，I列(索引8)=营业状态，Q列(索引16)=营业状态.1
+        operating_ids = df_operating.iloc[:, 2].map(str).str.strip()
+        status_i = df_operating.iloc[:, 8].map(str).str.strip()
+        status_q = df_operating.iloc[:, 16].map(str).str.strip()
+        business_hours = df_operating.iloc[:, 9].map(str).str.strip()
+
+        is_operating = (status_i == '营业中') & (status_q == '营业中')
+        has_business_hours = is_operating & (business_hours != '') & (business_hours != 'nan')
+        operating = OperatingStores(
+            store_ids=set(operating_ids[is_operating]),
+            business_hours=dict(zip(operating_ids[has_business_hours], business_hours[has_business_hours]))
+        )
+
+        print(f"✅ 找到 {len(operating.store_ids)} 家营业中门店")
+        print(f"   其中有营业时间数据: {len(operating.business_hours)} 家")
+        return operating
+
+    def load_whitelist(self) -> Dict[str, dict]:
+        """读取whitelist: {store_id: {store_name, war_zone, regional_manager}}"""
+        print("📖 读取whitelist...")
+        whitelist = {}
+        for record in self.session.query(StoreWhitelist).all():
+            whitelist[record.store_id] = {
+                'store_name': record.store_name,
+                'war_zone': record.war_zone,
+                'regional_manager': record.regional_manager
+            }
+        print(f"✅ 加载 {len(whitelist)} 条whitelist记录")
+        return whitelist
+
+    def import_pos(self, operating: OperatingStores, whitelist: Dict[str, dict]) -> DeviceImportResult:
+        """
+        导入收银设备离线记录（不提交）
+
+        同一时段首次导入：替换POS设备数据（保留处理记录），并记录"在营且在线"的门店快照；
+        同一时段重复导入：OR 合并（已恢复的移除，从未在线的新离线门店追加）。
+        """
+        print("📥 处理收银设备数据...")
+        session = self.session
+        df_pos = pd.read_excel(self.pos_file, header=1)
+
+        # 筛选离线设备
+        df_offline_pos = df_pos[df_pos['状态'] == '离线']
+        print(f"   找到 {len(df_offline_pos)} 台离线收银设备")
+
+        # 使用组织机构代码匹配门店ID
+        selected, skip_not_operating, skip_no_whitelist = self._select_offline_devices(
+            df_offline_pos, '组织机构代码', self.pos_data_datetime, operating, whitelist
+        )
+        equipment_ids = _column_as_str(selected, '设备编号')
+        equipment_names = _column_as_str(selected, '设备名称')
+        current_offline_store_ids = set(selected['store_id'])
+
+        # 检查同一时段是否已有快照（即是否为重复导入）
+        is_same_period_reimport = self._period_snapshots().count() > 0
+
+        if is_same_period_reimport:
+            # ── OR 合并逻辑：同一时段重复导入 ──
+            print(f"   🔁 检测到同一时段（{'上午' if self.snapshot_period == 'AM' else '下午'}）重复导入，启用 OR 合并逻辑")
+
+            # 读取本时段"已确认正常"的门店（has_abnormal=0，曾经在营且在线）
+            confirmed_ok_store_ids = set(
+                sid for (sid,) in self._period_snapshots(EquipmentStatusSnapshot.store_id)
+                .filter(EquipmentStatusSnapshot.has_abnormal == 0)
+                .distinct().all()
+            )
+
+            # 已在异常列表且 is_open_at_data_time==1 的门店（真正的异常门店）
+            existing_open_store_ids = self._current_pos_offline_store_ids()
+
+            # 上次离线、本次在营且在线 → 从异常列表移除，并记入"已确认正常"
+            open_flags = operating.open_flags(existing_open_store_ids - current_offline_store_ids, self.pos_data_datetime)
+            recovered_store_ids = {store_id for store_id, is_open in open_flags.items() if is_open}
+
+            if recovered_store_ids:
+                session.query(EquipmentStatus)\
+                    .filter(EquipmentStatus.equipment_type == 'POS')\
+                    .filter(EquipmentStatus.store_id.in_(recovered_store_ids))\
+                    .delete(synchronize_session=False)
+                # 记入"已确认正常"快照（has_abnormal=0），防止后续导入再次加入
+                bulk_insert(session, EquipmentStatusSnapshot, self._snapshot_rows(recovered_store_ids, 0))
+                print(f"   ✅ OR逻辑：移除已恢复门店 {len(recovered_store_ids)} 家（本次在营且在线）")
+
+            # 本次新出现的离线门店 → 仅当该门店未曾"已确认正常"时才新增
+            # 条件：不在已确认正常集合 + 不在现有"真正异常"列表 + 本次在营(is_open==1)
+            open_offline_store_ids = set(selected.loc[selected['is_open'] == 1, 'store_id'])
+            new_offline_store_ids = (open_offline_store_ids - existing_open_store_ids) - confirmed_ok_store_ids
+
+            if new_offline_store_ids:
+                # 如果这些门店已有 is_open=0 的旧记录，先删掉
+                session.query(EquipmentStatus)\
+                    .filter(EquipmentStatus.equipment_type == 'POS')\
+                    .filter(EquipmentStatus.store_id.in_(new_offline_store_ids))\
+                    .filter(EquipmentStatus.is_open_at_data_time == 0)\
+                    .delete(synchronize_session=False)
+                is_new = selected['store_id'].isin(new_offline_store_ids)
+                bulk_insert(session, EquipmentStatus, self._equipment_rows(
+                    selected[is_new], 'POS', equipment_ids[is_new], equipment_names[is_new], whitelist,
+                    operating, is_open=1
+                ))
+                print(f"   ➕ OR逻辑：新增本次新离线门店 {len(new_offline_store_ids)} 家（在营且从未在线）")
+
+            # 统计最终异常门店数（重新查库）
+            pos_count = len(self._current_pos_offline_store_ids())
+        else:
+            # ── 首次导入：替换POS设备数据（保留处理记录），同时记录"在营且在线"的门店到快照 ──
+            deleted_pos = session.query(EquipmentStatus)\
+                .filter(EquipmentStatus.equipment_type == 'POS')\
+                .delete(synchronize_session=False)
+            print(f"   清空旧POS设备数据: {deleted_pos} 条（保留处理记录）")
+
+            bulk_insert(session, EquipmentStatus, self._equipment_rows(
+                selected, 'POS', equipment_ids, equipment_names, whitelist, operating
+            ))
+            pos_count = selected.loc[selected['is_open'] == 1, 'store_id'].nunique()
+
+            # 记录"在营且在线"的门店（has_abnormal=0），供后续重复导入的 OR 逻辑使用
+            # 即：在营门店中，不在本次离线列表里，非永久免查，在whitelist中，且在营业时间内的门店
+            candidate_store_ids = {
+                store_id for store_id in operating.store_ids - current_offline_store_ids
+                if store_id not in PERMANENTLY_EXCLUDED_STORES and store_id in whitelist
+            }
+            open_flags = operating.open_flags(candidate_store_ids, self.pos_data_datetime)
+            confirmed_ok_store_ids = [store_id for store_id, is_open in open_flags.items() if is_open]
+            confirmed_ok_count = bulk_insert(session, EquipmentStatusSnapshot, self._snapshot_rows(confirmed_ok_store_ids, 0))
+            if confirmed_ok_count > 0:
+                print(f"   📝 记录在营且在线门店: {confirmed_ok_count} 家（供后续重复导入 OR 逻辑使用）")
+
+        result = DeviceImportResult(
+            abnormal_count=pos_count,
+            skip_not_operating=skip_not_operating,
+            skip_no_whitelist=skip_no_whitelist,
+            skip_not_open=int((selected['is_open'] == 0).sum())
+        )
+        print(f"   导入/合并后异常门店: {result.abnormal_count} 条记录")
+        self._print_skipped(result)
+        return result
+
+    def import_stb(self, operating: OperatingStores, whitelist: Dict[str, dict]) -> DeviceImportResult:
+        """导入机顶盒离线记录，替换机顶盒设备数据（保留处理记录，不提交）"""
+        print("📥 处理机顶盒数据...")
+        df_stb = pd.read_excel(self.stb_file)
+
+        # 筛选离线设备
+        df_offline_stb = df_stb[df_stb['状态'] == '离线']
+        print(f"   找到 {len(df_offline_stb)} 台离线机顶盒")
+
+        # 未在营业时间内的也写入DB，标记 is_open_at_data_time=0
+        selected, skip_not_operating, skip_no_whitelist = self._select_offline_devices(
+            df_offline_stb, '设备编码', self.stb_data_datetime, operating, whitelist
+        )
+
+        deleted_stb = self.session.query(EquipmentStatus)\
+            .filter(EquipmentStatus.equipment_type == '机顶盒')\
+            .delete(synchronize_session=False)
+        print(f"   清空旧机顶盒设备数据: {deleted_stb} 条（保留处理记录）")
+        bulk_insert(self.session, EquipmentStatus, self._equipment_rows(
+            selected, '机顶盒', selected['store_id'], _column_as_str(selected, '名称'), whitelist, operating
+        ))
+
+        result = DeviceImportResult(
+            abnormal_count=int((selected['is_open'] == 1).sum()),
+            skip_not_operating=skip_not_operating,
+            skip_no_whitelist=skip_no_whitelist,
+            skip_not_open=int((selected['is_open'] == 0).sum())
+        )
+        print(f"   导入异常门店: {result.abnormal_count} 条记录")
+        self._print_skipped(result)
+        return result
+
+    def record_import(self, pos: Optional[DeviceImportResult], stb: Optional[DeviceImportResult]) -> int:
+        """
+        记录导入日志并更新数据版本号（不提交）
+
+        Returns:
+            int: 总计导入记录数
+        """
+        print("💾 保存数据...")
+        total_imported = (pos.abnormal_count if pos else 0) + (stb.abnormal_count if stb else 0)
+
+        import_type = 'POS' if not self.stb_file else ('机顶盒' if not self.pos_file else '全部')
+        file_name = (self.pos_file.name if self.pos_file else '') + ('; ' + self.stb_file.name if self.stb_file else '')
+        self.session.add(EquipmentImportLog(
+            import_type=import_type,
+            file_name=file_name,
+            data_time=self.pos_data_time or self.stb_data_time,
+            import_time=datetime.now()
+        ))
+        # 数据版本号变化后，展示系统会重新生成看板状态（即使本次生成看板状态失败）
+        bump_data_version(self.session, EquipmentStatus.__tablename__)
+        self.session.flush()
+        print(f"   总计导入: {total_imported} 条记录")
+        return total_imported
+
+    def create_snapshot(self) -> SnapshotResult:
+        """覆盖本时段的POS异常快照（保留"已确认正常"记录），清理过期快照（不提交）"""
+        print("📸 创建POS异常快照...")
+        session = self.session
+        print(f"   文件数据时间: {self.snapshot_date.strftime('%Y-%m-%d %H:%M')} → 时段: {self.snapshot_period} ({'上午' if self.snapshot_period == 'AM' else '下午'})")
+
+        # ── 步骤A：在覆盖快照前，先记录上一次同时段的离线门店 ──
+        previous_offline_store_ids = set(
+            sid for (sid,) in self._period_snapshots(EquipmentStatusSnapshot.store_id)
+            .filter(EquipmentStatusSnapshot.has_abnormal == 1)
+            .distinct().all()
+        )
+
+        # ── 步骤B：当前这次导入的离线门店（仅营业中的） ──
+        current_offline_store_ids = self._current_pos_offline_store_ids()
+
+        # ── 步骤C：覆盖异常快照（只删 has_abnormal=1，保留 has_abnormal=0 的"已确认正常"记录）──
+        deleted_snapshots = self._period_snapshots()\
+            .filter(EquipmentStatusSnapshot.has_abnormal == 1)\
+            .delete(synchronize_session=False)
+        if deleted_snapshots > 0:
+            print(f"   🔄 覆盖旧快照: 删除 {deleted_snapshots} 条")
+
+        snapshot_count = bulk_insert(session, EquipmentStatusSnapshot, self._snapshot_rows(current_offline_store_ids, 1))
+        print(f"   ✅ 创建 {snapshot_count} 条快照记录")
+
+        # 清理旧快照
+        if AUTO_CLEANUP_OLD_SNAPSHOTS:
+            cutoff_date = date.today() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+            deleted_count = session.query(EquipmentStatusSnapshot)\
+                .filter(EquipmentStatusSnapshot.snapshot_date < cutoff_date)\
+                .delete(synchronize_session=False)
+            if deleted_count > 0:
+                print(f"   🗑️  清理 {deleted_count} 条过期快照（保留最近{SNAPSHOT_RETENTION_DAYS}天）")
+
+        return SnapshotResult(
+            snapshot_date=self.snapshot_date,
+            snapshot_period=self.snapshot_period,
+            previous_offline_store_ids=previous_offline_store_ids,
+            current_offline_store_ids=current_offline_store_ids,
+            snapshot_count=snapshot_count
+        )
+
+    def auto_recover(self, snapshot: SnapshotResult) -> int:
+        """
+        更新POS处理记录（不提交）
+
+        上午：清空今天的处理记录重建；下午：保留上午处理记录，上午已恢复、下午仍离线的标记为当日反复。
+        同一时段多次导入时，上次离线、这次在线的门店自动标记已恢复。
+
+        Returns:
+            int: 自动标记已恢复的门店数
+        """
+        print("📝 更新POS处理记录...")
+        session = self.session
+        today_start = datetime.combine(date.today(), datetime.min.time())
+        recovered_store_ids = snapshot.previous_offline_store_ids - snapshot.current_offline_store_ids
+
+        if snapshot.snapshot_period == 'AM':
+            # ── 上午：全量清空重建 ──
+            deleted_processing = session.query(EquipmentProcessing)\
+                .filter(EquipmentProcessing.processed_at >= today_start)\
+                .delete(synchronize_session=False)
+            if deleted_processing > 0:
+                print(f"   🔄 清空今天处理记录: {deleted_processing} 条（上午全量重置）")
+
+            auto_recover_count = bulk_insert(session, EquipmentProcessing, self._processing_rows(
+                recovered_store_ids, '已恢复', '设备已上线（自动检测）'
+            ))
+            if auto_recover_count > 0:
+                print(f"   ✅ 自动标记已恢复: {auto_recover_count} 家门店（设备重新上线）")
+
+        else:
+            # ── 下午：保留上午处理记录，检测当日反复 ──
+            pm_boundary = datetime.combine(
+                snapshot.snapshot_date.date(), datetime.min.time().replace(hour=AM_PM_BOUNDARY_HOUR)
+            )
+            am_processing = session.query(EquipmentProcessing)\
+                .filter(EquipmentProcessing.processed_at >= today_start)\
+                .filter(EquipmentProcessing.processed_at < pm_boundary)
+
+            # 获取上午标记为"已恢复"的门店
+            am_recovered_stores = set(
+                sid for (sid,) in am_processing.with_entities(EquipmentProcessing.store_id)
+                .filter(EquipmentProcessing.equipment_type == 'POS')
+                .filter(EquipmentProcessing.action == '已恢复')
+                .distinct().all()
+            )
+
+            # 上午已恢复 + 下午仍离线 = 当日反复（写入下午的处理记录，自动标记）
+            repeat_count = bulk_insert(session, EquipmentProcessing, self._processing_rows(
+                am_recovered_stores & snapshot.current_offline_store_ids, '未恢复', '当日反复（上午已恢复，下午再次离线）'
+            ))
+            if repeat_count > 0:
+                print(f"   ⚠️  当日反复: {repeat_count} 家门店（上午已恢复，下午再次离线）")
+
+            already_processed_stores = set(
+                sid for (sid,) in session.query(EquipmentProcessing.store_id)
+                .filter(EquipmentProcessing.processed_at >= today_start)
+                .filter(EquipmentProcessing.equipment_type == 'POS')
+                .distinct().all()
+            )
+            auto_recover_count = bulk_insert(session, EquipmentProcessing, self._processing_rows(
+                recovered_store_ids - already_processed_stores, '已恢复', '设备已上线（自动检测）'
+            ))
+            if auto_recover_count > 0:
+                print(f"   ✅ 自动标记已恢复: {auto_recover_count} 家门店（设备重新上线）")
+
+            # 打印上午处理记录统计
+            am_records = am_processing.count()
+            if am_records > 0:
+                recovered_am = am_processing.filter(EquipmentProcessing.action == '已恢复').count()
+                print(f"   📋 上午处理记录: {am_records} 条（已恢复: {recovered_am} 条）")
+
+        # 清理旧处理记录（超过保留天数的）
+        processing_cutoff_datetime = datetime.now() - timedelta(days=PROCESSING_RETENTION_DAYS)
+        deleted_processing = session.query(EquipmentProcessing)\
+            .filter(EquipmentProcessing.processed_at < processing_cutoff_datetime)\
+            .delete(synchronize_session=False)
+        if deleted_processing > 0:
+            print(f"   🗑️  清理 {deleted_processing} 条过期处理记录（保留最近{PROCESSING_RETENTION_DAYS}天）")
+
+        return auto_recover_count
+
+    def build_dashboard(self) -> int:
+        """生成设备异常看板状态（展示系统搜索直接读取，不提交）"""
+        print("📊 生成设备异常看板状态...")
+        dashboard_count = build_dashboard_state(self.session)
+        print(f"   ✅ 看板状态: {dashboard_count} 家门店")
+        return dashboard_count
+
+    # ==================== 执行 ====================
+
+    def run(self) -> EquipmentImportResult:
+        """
+        在一个事务中执行全部阶段，最后统一提交
+
+        收银设备、机顶盒、导入日志任一阶段失败则全部回滚（不留下导入一半的数据）；
+        快照、自动恢复检测、看板状态各自在保存点中执行，失败只回滚该阶段并继续。
+
+        Returns:
+            EquipmentImportResult: 导入结果
+        """
+        result = EquipmentImportResult(success=False, step_timings=self.step_timings)
+        try:
+            # 首次导入/重复导入的判断、处理记录重建都基于读到的数据，重叠执行会重复写入；
+            # 事务级锁在提交或回滚时释放，后执行的导入能读到先执行的导入结果
+            if advisory_xact_lock(self.session, IMPORT_LOCK_NAME):
+                print("🔒 已获取导入锁")
+            operating = self.timed('在营门店', self.load_operating_stores)
+            whitelist = self.timed('whitelist', self.load_whitelist)
+            if self.pos_file:
+                result.pos = self.timed('收银设备', self.import_pos, operating, whitelist)
+            if self.stb_file:
+                result.stb = self.timed('机顶盒', self.import_stb, operating, whitelist)
+            self.timed('导入日志', self.record_import, result.pos, result.stb)
+
+            if self.pos_file:
+                snapshot = self._run_optional('快照', self.create_snapshot, result)
+                if snapshot is not None:
+                    self._run_optional('处理记录', self.auto_recover, result, snapshot)
+            self._run_optional('看板状态', self.build_dashboard, result)
+
+            # 提交失败（如连接断开、约束冲突）同样回滚并返回失败结果
+            self.session.commit()
+        except Exception as e:
+            print(f"❌ 导入失败，已回滚: {e}")
+            traceback.print_exc()
+            self.session.rollback()
+            result.error_message = str(e)
+            return result
+
+        result.success = True
+        return result
+
+    def timed(self, name: str, stage, *args):
+        """执行一个阶段并记录、打印耗时"""
+        started_at = time.perf_counter()
+        output = stage(*args)
+        elapsed = time.perf_counter() - started_at
+        self.step_timings.append((name, elapsed))
+        print(f"   ⏱️  {name}耗时: {elapsed:.2f}s")
+        print()
+        return output
+
+    def _run_optional(self, name: str, stage, result: EquipmentImportResult, *args):
+        """在保存点中执行可选阶段，失败时只回滚该阶段，返回None"""
+        savepoint = self.session.begin_nested()
+        try:
+            output = self.timed(name, stage, *args)
+            savepoint.commit()
+            return output
+        except Exception as e:
+            print(f"⚠️  {name}失败（已回滚该步骤）: {e}")
+            traceback.print_exc()
+            savepoint.rollback()
+            result.failed_steps.append(name)
+            return None
+
+    # ==================== 辅助 ====================
+
+    def _period_snapshots(self, *entities):
+        """本次POS数据所属日期、时段的快照查询"""
+        query = self.session.query(*entities) if entities else self.session.query(EquipmentStatusSnapshot)
+        return query\
+            .filter(EquipmentStatusSnapshot.snapshot_date >= self.file_day_start)\
+            .filter(EquipmentStatusSnapshot.snapshot_date <= self.file_day_end)\
+            .filter(EquipmentStatusSnapshot.snapshot_period == self.snapshot_period)
+
+    def _current_pos_offline_store_ids(self) -> Set[str]:
+        """当前异常列表中营业时间内离线的POS门店"""
+        return set(
+            sid for (sid,) in self.session.query(EquipmentStatus.store_id)
+            .filter(EquipmentStatus.equipment_type == 'POS')
+            .filter(EquipmentStatus.is_open_at_data_time == 1)
+            .distinct().all()
+        )
+
+    @staticmethod
+    def _select_offline_devices(df_offline: pd.DataFrame, store_column: str, data_datetime: Optional[datetime],
+                                operating: OperatingStores, whitelist: Dict[str, dict]):
+        """
+        筛选离线设备：只保留在营、非永久免查、在whitelist中的门店，并标记数据时间点是否营业
+
+        Returns:
+            tuple: (筛选后的DataFrame（增加store_id、is_open列）, 跳过非营业中数, 跳过不在whitelist数)
+        """
+        store_ids = df_offline[store_column].map(str)
+        is_operating = store_ids.isin(operating.store_ids)
+        is_excluded = store_ids.isin(PERMANENTLY_EXCLUDED_STORES)  # 永久免查门店（倒闭/长期停业）
+        in_whitelist = store_ids.isin(list(whitelist))
+        keep = is_operating & ~is_excluded & in_whitelist
+
+        selected = df_offline[keep].copy()
+        selected['store_id'] = store_ids[keep]
+        selected['is_open'] = selected['store_id'].map(operating.open_flags(selected['store_id'].unique(), data_datetime))
+        return selected, int((~is_operating).sum()), int((is_operating & ~is_excluded & ~in_whitelist).sum())
+
+    @staticmethod
+    def _equipment_rows(selected: pd.DataFrame, equipment_type: str, equipment_ids, equipment_names,
+                        whitelist: Dict[str, dict], operating: OperatingStores, is_open: int = None) -> list:
+        """生成设备异常记录行（is_open为None时取selected的is_open列）"""
+        import_time = datetime.now()
+        rows = []
+        for store_id, equipment_id, equipment_name, store_is_open in zip(
+            selected['store_id'], equipment_ids, equipment_names, selected['is_open']
+        ):
+            info = whitelist[store_id]
+            rows.append({
+                'store_id': store_id,
+                'store_name': info['store_name'],
+                'war_zone': info['war_zone'],
+                'regional_manager': info['regional_manager'],
+                'equipment_type': equipment_type,
+                'equipment_id': equipment_id,
+                'equipment_name': equipment_name,
+                'status': '离线',
+                'business_hours': operating.business_hours.get(store_id, ''),
+                'is_open_at_data_time': int(store_is_open if is_open is None else is_open),
+                'import_time': import_time
+            })
+        return rows
+
+    def _snapshot_rows(self, store_ids, has_abnormal: int) -> list:
+        """生成本时段的POS快照记录行"""
+        created_at = datetime.now()
+        return [{
+            'snapshot_date': self.snapshot_date,
+            'snapshot_period': self.snapshot_period,
+            'store_id': store_id,
+            'equipment_type': 'POS',
+            'has_abnormal': has_abnormal,
+            'created_at': created_at
+        } for store_id in store_ids]
+
+    @staticmethod
+    def _processing_rows(store_ids, action: str, reason: str) -> list:
+        """生成POS自动处理记录行"""
+        processed_at = datetime.now()
+        return [{
+            'store_id': store_id,
+            'equipment_type': 'POS',
+            'action': action,
+            'reason': reason,
+            'processed_at': processed_at
+        } for store_id in store_ids]
+
+    @staticmethod
+    def _print_skipped(result: DeviceImportResult):
+        print(f"   跳过非营业中: {result.skip_not_operating}")
+        print(f"   跳过不在whitelist: {result.skip_no_whitelist}")
+        if result.skip_not_open > 0:
+            print(f"   未在营业时间内（已记录但不计入异常）: {result.skip_not_open}")
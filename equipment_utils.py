@@ -3,11 +3,17 @@
 Equipment Monitoring Utility Functions
 """
 from datetime import date, timedelta, datetime
+import pandas as pd
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from shared.database_models import EquipmentStatusSnapshot, EquipmentProcessing
 from equipment_config import CHRONIC_RULES, SNAPSHOT_RETENTION_DAYS, ENABLE_MULTI_DAY_CHRONIC, ENABLE_UNPROCESSED_CHECK, ENABLE_SAME_DAY_REPEAT_CHECK
 
 
+# 未及时处理日期的回溯天数
+UNPROCESSED_LOOKBACK_DAYS = 10
+
+
 def get_abnormal_count(session: Session, store_id: str, equipment_type: str, days: int, exclude_today: bool = True) -> int:
     """
     获取最近N天内的异常次数
@@ -150,7 +156,7 @@ def is_chronic_store(session: Session, store_id: str, equipment_type: str) -> tu
     
     # 情况2：上午有异常 + 下午有异常 + 没有处理 = 未及时处理
     if ENABLE_UNPROCESSED_CHECK and am_abnormal and pm_abnormal and not today_processing:
-        unprocessed_dates = get_unprocessed_dates(session, store_id, equipment_type, days=10)
+        unprocessed_dates = get_unprocessed_dates(session, store_id, equipment_type, days=UNPROCESSED_LOOKBACK_DAYS)
         return True, "多次出问题（未及时处理）", {'unprocessed': 1, 'unprocessed_dates': unprocessed_dates}
     
     # 情况3：上午有异常 + 标记"未恢复"但没填预计恢复时间 + 下午又有异常
@@ -212,9 +218,280 @@ def should_suppress(session: Session, store_id: str, equipment_type: str) -> boo
     return False  # 需要提示
 
 
+def get_latest_suppressions(session: Session, store_ids: list = None, equipment_type: str = None) -> dict:
+    """
+    批量查询每个（门店, 设备类型）最新的有暂时不提示日期的处理记录（与should_suppress()取同一条）
+    
+    一次查询：PostgreSQL使用DISTINCT ON，其他数据库使用row_number()。
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表，为None时查询所有门店
+        equipment_type: 设备类型，为None时查询所有设备类型
+        
+    Returns:
+        dict: {(store_id, equipment_type): (暂时不提示截止日期, 预计恢复日期)}
+    """
+    if store_ids is not None and not store_ids:
+        return {}
+    
+    columns = (
+        EquipmentProcessing.store_id,
+        EquipmentProcessing.equipment_type,
+        EquipmentProcessing.suppressed_until,
+        EquipmentProcessing.expected_recovery_date
+    )
+    
+    def apply_filters(query):
+        query = query.filter(EquipmentProcessing.suppressed_until.isnot(None))
+        if store_ids is not None:
+            query = query.filter(EquipmentProcessing.store_id.in_(store_ids))
+        if equipment_type is not None:
+            query = query.filter(EquipmentProcessing.equipment_type == equipment_type)
+        return query
+    
+    if session.get_bind().dialect.name == 'postgresql':
+        rows = apply_filters(session.query(*columns))\
+            .distinct(EquipmentProcessing.store_id, EquipmentProcessing.equipment_type)\
+            .order_by(EquipmentProcessing.store_id, EquipmentProcessing.equipment_type,
+                      EquipmentProcessing.processed_at.desc())\
+            .all()
+    else:
+        ranked = apply_filters(session.query(
+            *columns,
+            func.row_number().over(
+                partition_by=(EquipmentProcessing.store_id, EquipmentProcessing.equipment_type),
+                order_by=EquipmentProcessing.processed_at.desc()
+            ).label('rn')
+        )).subquery()
+        rows = session.query(
+            ranked.c.store_id, ranked.c.equipment_type, ranked.c.suppressed_until, ranked.c.expected_recovery_date
+        ).filter(ranked.c.rn == 1).all()
+    
+    return {
+        (store_id, row_equipment_type): (suppressed_until, expected_recovery_date)
+        for store_id, row_equipment_type, suppressed_until, expected_recovery_date in rows
+    }
+
+
+def is_suppressed_until(suppressed_until, today: date = None) -> bool:
+    """
+    判断暂时不提示截止日期是否还未过期（截止日期当天仍不提示）
+    
+    Args:
+        suppressed_until: 暂时不提示截止日期
+        today: 当前日期，默认今天
+        
+    Returns:
+        bool: True=暂时不提示
+    """
+    if suppressed_until is None:
+        return False
+    suppressed_date = suppressed_until.date() if hasattr(suppressed_until, 'date') else suppressed_until
+    return suppressed_date >= (today or date.today())
+
+
+def get_active_suppressions(session: Session, store_ids: list = None, equipment_type: str = None) -> dict:
+    """
+    批量查询在预计恢复期内（暂时不提示）的门店设备，判断规则与should_suppress()相同
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表，为None时查询所有门店
+        equipment_type: 设备类型，为None时查询所有设备类型
+        
+    Returns:
+        dict: {(store_id, equipment_type): 预计恢复日期（可能为None）}，只包含暂时不提示的门店设备
+    """
+    today = date.today()
+    return {
+        key: expected_recovery_date
+        for key, (suppressed_until, expected_recovery_date) in get_latest_suppressions(session, store_ids, equipment_type).items()
+        if is_suppressed_until(suppressed_until, today)
+    }
+
+
+def get_suppressed_store_ids(session: Session, store_ids: list, equipment_type: str) -> set:
+    """
+    批量判断应该暂时不提示的门店（等价于对每个门店调用should_suppress()）
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表
+        equipment_type: 设备类型
+        
+    Returns:
+        set: 暂时不提示的门店ID
+    """
+    return {store_id for store_id, _ in get_active_suppressions(session, store_ids, equipment_type)}
+
+
+def load_chronic_history(session: Session, store_ids: list, equipment_type: str = 'POS') -> tuple:
+    """
+    查询门店回溯窗口内的异常快照和处理记录（经常出问题判定用，两次查询）
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表
+        equipment_type: 设备类型（POS/机顶盒）
+        
+    Returns:
+        tuple: (异常快照DataFrame[store_id, snapshot_date, snapshot_period],
+                处理记录DataFrame[store_id, action, processed_at])
+    """
+    window_days = max([rule['days'] for rule in CHRONIC_RULES] + [UNPROCESSED_LOOKBACK_DAYS])
+    window_start = datetime.combine(date.today() - timedelta(days=window_days), datetime.min.time())
+    
+    # 按表的列查询（不经过ORM实体加载，行数多时明显更快）
+    snapshot_table = EquipmentStatusSnapshot.__table__
+    processing_table = EquipmentProcessing.__table__
+    
+    # 查询1：回溯窗口内的异常快照
+    snapshots = pd.DataFrame(
+        session.execute(
+            select(snapshot_table.c.store_id, snapshot_table.c.snapshot_date, snapshot_table.c.snapshot_period)
+            .where(snapshot_table.c.store_id.in_(store_ids))
+            .where(snapshot_table.c.equipment_type == equipment_type)
+            .where(snapshot_table.c.snapshot_date >= window_start)
+            .where(snapshot_table.c.has_abnormal == 1)
+        ).all(),
+        columns=['store_id', 'snapshot_date', 'snapshot_period']
+    )
+    snapshots['snapshot_date'] = pd.to_datetime(snapshots['snapshot_date'])
+    
+    # 查询2：回溯窗口内的处理记录
+    processing = pd.DataFrame(
+        session.execute(
+            select(processing_table.c.store_id, processing_table.c.action, processing_table.c.processed_at)
+            .where(processing_table.c.store_id.in_(store_ids))
+            .where(processing_table.c.equipment_type == equipment_type)
+            .where(processing_table.c.processed_at >= window_start)
+            .order_by(processing_table.c.id)
+        ).all(),
+        columns=['store_id', 'action', 'processed_at']
+    )
+    processing['processed_at'] = pd.to_datetime(processing['processed_at'])
+    
+    return snapshots, processing
+
+
+def evaluate_chronic_stores(session: Session, store_ids: list, equipment_type: str = 'POS', history: tuple = None) -> dict:
+    """
+    批量判断门店是否经常出问题（结果与逐个调用is_chronic_store()相同）
+    
+    两次查询取出所有门店回溯窗口内的异常快照和处理记录（见load_chronic_history），
+    在内存中按门店分组计算当天上午/下午异常、当天处理记录和各时间窗口的异常次数。
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店ID列表
+        equipment_type: 设备类型（POS/机顶盒）
+        history: 已查询的load_chronic_history()结果，为None时查询
+        
+    Returns:
+        dict: {store_id: (是否经常出问题, 触发原因描述, 异常次数字典)}
+    """
+    # 只对POS启用历史追踪
+    if equipment_type != 'POS' or not store_ids:
+        return {store_id: (False, None, {}) for store_id in store_ids}
+    
+    today = date.today()
+    today_start = datetime.combine(today, datetime.min.time())
+    today_end = datetime.combine(today, datetime.max.time())
+    snapshots, processing = history if history is not None else load_chronic_history(session, store_ids, equipment_type)
+    
+    # 今天上午/下午有异常的门店
+    today_snapshots = snapshots[
+        (snapshots['snapshot_date'] >= today_start) & (snapshots['snapshot_date'] <= today_end)
+    ]
+    am_stores = set(today_snapshots.loc[today_snapshots['snapshot_period'] == 'AM', 'store_id'])
+    pm_stores = set(today_snapshots.loc[today_snapshots['snapshot_period'] == 'PM', 'store_id'])
+    
+    # 今天的处理记录（每个门店取第一条，与is_chronic_store的first()一致）
+    today_processing = processing[processing['processed_at'] >= today_start].drop_duplicates('store_id')
+    today_actions = dict(zip(today_processing['store_id'], today_processing['action']))
+    
+    # 各时间窗口的异常次数（排除今天）
+    window_counts = {}
+    if ENABLE_MULTI_DAY_CHRONIC:
+        before_today = snapshots[snapshots['snapshot_date'] < today_start]
+        for rule in CHRONIC_RULES:
+            cutoff = datetime.combine(today - timedelta(days=rule['days']), datetime.min.time())
+            window_counts[rule['days']] = before_today[before_today['snapshot_date'] >= cutoff]\
+                .groupby('store_id').size().to_dict()
+    
+    # 上午、下午都有异常但没有处理记录的日期
+    unprocessed_by_store = {}
+    if ENABLE_UNPROCESSED_CHECK:
+        unprocessed_by_store = _group_unprocessed_dates(snapshots, processing, today - timedelta(days=UNPROCESSED_LOOKBACK_DAYS))
+    
+    results = {}
+    for store_id in store_ids:
+        am_abnormal = store_id in am_stores
+        pm_abnormal = store_id in pm_stores
+        has_processing = store_id in today_actions
+        
+        # 情况1：上午有异常 + 标记"已恢复" + 下午又有异常 = 当天反复
+        if ENABLE_SAME_DAY_REPEAT_CHECK and am_abnormal and pm_abnormal and has_processing and today_actions[store_id] == '已恢复':
+            results[store_id] = (True, "当日反复", {'today_repeat': 1})
+            continue
+        
+        # 情况2：上午有异常 + 下午有异常 + 没有处理 = 未及时处理
+        if ENABLE_UNPROCESSED_CHECK and am_abnormal and pm_abnormal and not has_processing:
+            unprocessed_dates = unprocessed_by_store.get(store_id, [])
+            results[store_id] = (True, "多次出问题（未及时处理）", {'unprocessed': 1, 'unprocessed_dates': unprocessed_dates})
+            continue
+        
+        if not ENABLE_MULTI_DAY_CHRONIC:
+            results[store_id] = (False, None, {})
+            continue
+        
+        abnormal_counts = {
+            f"{rule['days']}days": window_counts[rule['days']].get(store_id, 0)
+            for rule in CHRONIC_RULES
+        }
+        results[store_id] = (False, None, abnormal_counts)
+        for rule in CHRONIC_RULES:
+            count = abnormal_counts[f"{rule['days']}days"]
+            if count >= rule['threshold']:
+                results[store_id] = (True, f"多次出问题（{rule['days']}天{count}次）", abnormal_counts)
+                break
+    
+    return results
+
+
+def _group_unprocessed_dates(snapshots: pd.DataFrame, processing: pd.DataFrame, cutoff_date: date) -> dict:
+    """
+    按门店计算未处理日期（与get_unprocessed_dates相同的规则）
+    
+    Args:
+        snapshots: 异常快照（store_id、snapshot_date、snapshot_period）
+        processing: 处理记录（store_id、processed_at）
+        cutoff_date: 起始日期
+        
+    Returns:
+        dict: {store_id: ['03-09', '03-08']}，最新的在前
+    """
+    cutoff = datetime.combine(cutoff_date, datetime.min.time())
+    recent = snapshots[snapshots['snapshot_date'] >= cutoff]
+    days = recent['snapshot_date'].dt.date
+    is_am = recent['snapshot_period'] == 'AM'
+    is_pm = recent['snapshot_period'] == 'PM'
+    both_abnormal = set(zip(recent.loc[is_am, 'store_id'], days[is_am])) & \
+        set(zip(recent.loc[is_pm, 'store_id'], days[is_pm]))
+    
+    processed = processing[processing['processed_at'] >= cutoff]
+    processed_days = set(zip(processed['store_id'], processed['processed_at'].dt.date))
+    
+    unprocessed_by_store = {}
+    for store_id, day in sorted(both_abnormal - processed_days, key=lambda key: key[1], reverse=True):
+        unprocessed_by_store.setdefault(store_id, []).append(day.strftime('%m-%d'))
+    return unprocessed_by_store
+
+
 def calculate_chronic_stats(session: Session, store_ids: list) -> dict:
     """
-    批量计算门店的经常出问题统计
+    批量计算门店的经常出问题统计（两次查询，见evaluate_chronic_stores）
     
     Args:
         session: 数据库会话
@@ -225,9 +502,8 @@ def calculate_chronic_stats(session: Session, store_ids: list) -> dict:
     """
     stats = {}
     
-    for store_id in store_ids:
-        # 只对POS计算
-        is_chronic, reason, counts = is_chronic_store(session, store_id, 'POS')
+    # 只对POS计算
+    for store_id, (is_chronic, reason, counts) in evaluate_chronic_stores(session, store_ids, 'POS').items():
         stats[store_id] = {
             'is_chronic': is_chronic,
             'chronic_reason': reason,
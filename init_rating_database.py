@@ -1,6 +1,10 @@
 """
 门店评级功能数据库初始化脚本
 Initialize Database for Store Rating Feature
+
+用法:
+  python3 init_rating_database.py                     # 建表、回填当前评级、加载运营数据
+  python3 init_rating_database.py --backfill-ratings  # 只回填门店当前评级（部署store_current_rating后执行一次）
 """
 import sys
 import os
@@ -14,7 +18,9 @@ if str(current_dir) not in sys.path:
 from shared.database_models import (
     create_db_engine,
     init_viewer_db,
+    rebuild_current_ratings,
     StoreRating,
+    StoreCurrentRating,
     StoreOperationData
 )
 from viewer.data_importer import DataImporter
@@ -43,6 +49,7 @@ def init_rating_tables():
     print("\n✅ 数据库表创建完成！")
     print("\n新增表：")
     print(f"  - {StoreRating.__tablename__} (门店评级表)")
+    print(f"  - {StoreCurrentRating.__tablename__} (门店当前评级表)")
     print(f"  - {StoreOperationData.__tablename__} (门店运营数据表)")
     
     return engine
@@ -78,13 +85,38 @@ def load_operation_data(engine, excel_file: str = 'store_rank/whitelist.xlsx'):
         session.close()
 
 
+def backfill_current_ratings(engine):
+    """根据评级历史回填门店当前评级（可重复执行）"""
+    print("\n🔄 回填门店当前评级...")
+    
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    
+    try:
+        count = rebuild_current_ratings(session)
+        session.commit()
+        print(f"✅ 当前评级回填完成，共 {count} 个门店")
+    
+    except Exception as e:
+        session.rollback()
+        print(f"❌ 回填当前评级时发生错误: {str(e)}")
+    
+    finally:
+        session.close()
+
+
 if __name__ == '__main__':
     try:
         # 初始化数据库表
         engine = init_rating_tables()
         
-        # 加载运营数据
-        load_operation_data(engine)
+        # 回填当前评级
+        backfill_current_ratings(engine)
+        
+        # 仅回填时不重新加载运营数据：python init_rating_database.py --backfill-ratings
+        if '--backfill-ratings' not in sys.argv:
+            # 加载运营数据
+            load_operation_data(engine)
         
         print("\n" + "=" * 60)
         print("✅ 门店评级功能数据库初始化完成！")
@@ -0,0 +1,211 @@
+"""
+检查项内存索引模块
+Inspection Item Store Module
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+
+def store_sort_key(item: Dict) -> int:
+    """按门店编号数值排序，非数字编号排在最前"""
+    store_id = item.get('门店编号', '')
+    return int(store_id) if store_id.isdigit() else 0
+
+
+class ItemStore:
+    """
+    检查项内存存储，按检查项ID、门店编号、负责运营建立索引
+
+    建立索引时按门店编号排好序，请求中不再重复排序。
+    """
+
+    def __init__(self, items: Optional[List[Dict]] = None):
+        """
+        初始化检查项存储并建立索引
+
+        Args:
+            items: 检查项字典列表（DataLoader.transform_data() 的输出）
+        """
+        self.items: List[Dict] = items if items is not None else []
+        self._by_id: Dict[str, Dict] = {}
+        self._by_store: Dict[str, List[Dict]] = {}
+        self._by_operator: Dict[str, List[Dict]] = {}
+
+        for item in self.items:
+            self._by_id[item['id']] = item
+            self._by_store.setdefault(item.get('门店编号', ''), []).append(item)
+            self._by_operator.setdefault(item.get('负责运营', '未分配'), []).append(item)
+        
+        # 排序结果（稳定排序，先排序再按运营拆分与分别排序结果相同）
+        self._sorted_items: List[Dict] = sorted(self.items, key=store_sort_key)
+        self._sorted_by_operator: Dict[str, List[Dict]] = {}
+        for item in self._sorted_items:
+            self._sorted_by_operator.setdefault(item.get('负责运营', '未分配'), []).append(item)
+        
+        # 分页用的门店顺序，按运营人员首次访问时生成
+        self._store_orders: Dict[str, Tuple[List[str], Dict[str, int], Dict[str, List[Dict]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items)
+
+    def get(self, item_id: str) -> Optional[Dict]:
+        """
+        按检查项ID获取检查项
+
+        Args:
+            item_id: 检查项唯一标识符（门店编号_检查项名称）
+
+        Returns:
+            Optional[Dict]: 检查项字典，不存在时返回None
+        """
+        return self._by_id.get(item_id)
+
+    def get_by_store(self, store_id: str) -> List[Dict]:
+        """
+        获取指定门店的所有检查项
+
+        Args:
+            store_id: 门店编号
+
+        Returns:
+            List[Dict]: 检查项列表
+        """
+        return self._by_store.get(store_id, [])
+
+    def get_by_operator(self, operator: str) -> List[Dict]:
+        """
+        获取指定运营人员负责的所有检查项
+
+        Args:
+            operator: 运营人员姓名，"全部"或空表示不筛选
+
+        Returns:
+            List[Dict]: 检查项列表
+        """
+        if operator == "全部" or not operator:
+            return self.items
+        return self._by_operator.get(operator, [])
+
+    def get_store_groups(self, operator: str = "全部") -> Dict[str, List[Dict]]:
+        """
+        按门店分组获取检查项
+
+        Args:
+            operator: 运营人员姓名，"全部"或空表示所有门店
+
+        Returns:
+            Dict[str, List[Dict]]: {门店编号: 检查项列表}
+        """
+        if operator == "全部" or not operator:
+            return self._by_store
+
+        groups: Dict[str, List[Dict]] = {}
+        for item in self._by_operator.get(operator, []):
+            groups.setdefault(item.get('门店编号', ''), []).append(item)
+        return groups
+
+    def get_operator_names(self) -> List[str]:
+        """
+        获取本周期检查项中出现的所有负责运营
+
+        Returns:
+            List[str]: 运营人员姓名列表
+        """
+        return list(self._by_operator)
+
+    def get_sorted(self, operator: str = "全部") -> List[Dict]:
+        """
+        获取按门店编号排序的检查项（排序在建立索引时完成）
+
+        Args:
+            operator: 运营人员姓名，"全部"或空表示不筛选
+
+        Returns:
+            List[Dict]: 检查项列表
+        """
+        if operator == "全部" or not operator:
+            return self._sorted_items
+        return self._sorted_by_operator.get(operator, [])
+
+    def get_store_page(
+        self,
+        operator: str = "全部",
+        after_store: Optional[str] = None,
+        limit: int = 10,
+        category: Optional[str] = None,
+        reviewed: Optional[bool] = None,
+        reviewed_ids: Optional[Set[str]] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        按门店分页获取检查项（游标为上一页最后一个门店编号）
+
+        每页包含limit个门店的全部匹配检查项，没有匹配项的门店跳过。
+
+        Args:
+            operator: 运营人员姓名，"全部"或空表示所有门店
+            after_store: 游标，从该门店之后开始；None表示第一页
+            limit: 每页门店数
+            category: 检查项分类，None表示不筛选
+            reviewed: True只返回已审核项，False只返回未审核项，None不筛选
+            reviewed_ids: 已审核的检查项ID集合（reviewed不为None时需要）
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (检查项列表, 下一页游标)，没有下一页时游标为None
+
+        Raises:
+            ValueError: 游标门店不在当前列表中（例如已切换周期）
+        """
+        store_ids, positions, groups = self._get_store_order(operator)
+        
+        start = 0
+        if after_store is not None:
+            if after_store not in positions:
+                raise ValueError(f'无效的分页游标: {after_store}')
+            start = positions[after_store] + 1
+        
+        reviewed_ids = reviewed_ids or set()
+        page_items: List[Dict] = []
+        page_stores = 0
+        last_store = None
+        
+        for store_id in store_ids[start:]:
+            items = [
+                item for item in groups[store_id]
+                if (category is None or item.get('检查项分类') == category)
+                and (reviewed is None or (item['id'] in reviewed_ids) == reviewed)
+            ]
+            if not items:
+                continue
+            
+            # 已凑满一页，且后面还有匹配的门店
+            if page_stores == limit:
+                return page_items, last_store
+            
+            page_items.extend(items)
+            page_stores += 1
+            last_store = store_id
+        
+        return page_items, None
+
+    def _get_store_order(self, operator: str) -> Tuple[List[str], Dict[str, int], Dict[str, List[Dict]]]:
+        """
+        获取运营人员的门店顺序
+
+        Args:
+            operator: 运营人员姓名
+
+        Returns:
+            Tuple: (门店编号列表, {门店编号: 位置}, {门店编号: 排序后的检查项列表})
+        """
+        key = operator if operator and operator != "全部" else "全部"
+        order = self._store_orders.get(key)
+        if order is None:
+            groups: Dict[str, List[Dict]] = {}
+            for item in self.get_sorted(key):
+                groups.setdefault(item.get('门店编号', ''), []).append(item)
+            store_ids = list(groups)
+            order = (store_ids, {store_id: i for i, store_id in enumerate(store_ids)}, groups)
+            self._store_orders[key] = order
+        return order
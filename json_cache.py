@@ -0,0 +1,103 @@
+"""
+JSON响应缓存模块
+Serialized JSON Response Cache Module
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import Any, Dict, Optional
+from flask import Response, request
+
+
+class CachedJson:
+    """一份已序列化并gzip压缩的JSON响应体"""
+
+    def __init__(self, data: Any, compresslevel: int = 6):
+        """
+        序列化并压缩数据
+
+        Args:
+            data: 可JSON序列化的数据
+            compresslevel: gzip压缩级别
+        """
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha1(raw).hexdigest()
+
+        # mtime=0 保证相同内容压缩结果一致
+        self.gzip_body = gzip.compress(raw, compresslevel=compresslevel, mtime=0)
+        self.etag = digest
+        self.gzip_etag = f'{digest}-gz'
+        self.raw_size = len(raw)
+
+    def to_response(self) -> Response:
+        """
+        根据当前请求生成响应
+
+        If-None-Match命中时返回304（不读取响应体）；
+        客户端支持gzip时直接发送压缩内容，否则解压后发送。
+
+        Returns:
+            Response: Flask响应
+        """
+        use_gzip = request.accept_encodings['gzip'] > 0
+        etag = self.gzip_etag if use_gzip else self.etag
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif use_gzip:
+            response = Response(self.gzip_body, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(self.gzip_body), mimetype='application/json')
+
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        # 允许浏览器保存，但每次使用前必须用ETag向服务器确认
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class JsonResponseCache:
+    """按键缓存的JSON响应（整体替换，读取无锁）"""
+
+    def __init__(self, compresslevel: int = 6):
+        """
+        初始化缓存
+
+        Args:
+            compresslevel: gzip压缩级别
+        """
+        self.compresslevel = compresslevel
+        self._entries: Dict[str, CachedJson] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, data: Any) -> CachedJson:
+        """
+        序列化数据并存入缓存
+
+        Args:
+            key: 缓存键
+            data: 可JSON序列化的数据
+
+        Returns:
+            CachedJson: 缓存条目
+        """
+        entry = CachedJson(data, self.compresslevel)
+        with self._lock:
+            entries = dict(self._entries)
+            entries[key] = entry
+            self._entries = entries
+        return entry
+
+    def get(self, key: str) -> Optional[CachedJson]:
+        """
+        获取缓存条目
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            Optional[CachedJson]: 缓存条目，不存在时返回None
+        """
+        return self._entries.get(key)
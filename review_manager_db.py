@@ -2,10 +2,26 @@
 审核数据管理器模块（数据库版本）
 Review Manager Module (Database Version)
 """
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from datetime import datetime
 from database import get_session, Review
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+# 批量写入时每批的行数
+BULK_BATCH_SIZE = 500
+
+
+def _upsert_insert(session):
+    """
+    按当前数据库方言选择支持ON CONFLICT的insert构造器
+
+    生产环境为PostgreSQL，SQLite仅用于本地测试
+    """
+    if session.get_bind().dialect.name == 'sqlite':
+        return sqlite.insert
+    return postgresql.insert
 
 
 class ReviewManager:
@@ -67,6 +83,69 @@ class ReviewManager:
         finally:
             session.close()
     
+    def save_reviews_bulk(self, reviews: Dict[str, Dict], overwrite: bool = True) -> bool:
+        """
+        批量保存审核结果（INSERT ... ON CONFLICT (item_id) DO UPDATE / DO NOTHING）
+        
+        不需要先查询是否存在，每批一条语句、整体一次提交。
+        与save_review不同，已存在的记录会被review_data整体覆盖，
+        未提供的字段写入空字符串。
+        
+        Args:
+            reviews: {item_id: review_data}，review_data格式同save_review
+            overwrite: 是否覆盖已存在的记录，False时保留原记录（DO NOTHING）
+            
+        Returns:
+            bool: 保存是否成功
+        """
+        if not reviews:
+            return True
+        
+        now = datetime.now()
+        rows = [
+            {
+                'item_id': item_id,
+                'store_name': review_data.get('门店名称', ''),
+                'store_id': review_data.get('门店编号', ''),
+                'area': review_data.get('所属区域', ''),
+                'item_name': review_data.get('检查项名称', ''),
+                'image_url': review_data.get('标准图', ''),
+                'review_result': review_data.get('审核结果', ''),
+                'problem_note': review_data.get('问题描述', ''),
+                'review_time': now
+            }
+            for item_id, review_data in reviews.items()
+        ]
+        
+        try:
+            session = get_session()
+            
+            stmt = _upsert_insert(session)(Review)
+            if overwrite:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Review.item_id],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in rows[0] if column != 'item_id'
+                    }
+                )
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=[Review.item_id])
+            
+            # 传入参数列表时按executemany方式批量执行
+            for start in range(0, len(rows), BULK_BATCH_SIZE):
+                session.execute(stmt, rows[start:start + BULK_BATCH_SIZE])
+            
+            session.commit()
+            return True
+            
+        except SQLAlchemyError as e:
+            print(f"批量保存审核结果失败: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+    
     def update_review(self, item_id: str, review_data: Dict) -> bool:
         """
         更新现有审核结果
@@ -123,6 +202,44 @@ class ReviewManager:
         finally:
             session.close()
     
+    def get_review_statuses(self) -> Dict[str, Dict]:
+        """
+        一次查询获取所有检查项的审核结果和问题描述（用于统计）
+        
+        Returns:
+            Dict[str, Dict]: {item_id: {'审核结果': ..., '问题描述': ...}}
+        """
+        try:
+            session = get_session()
+            rows = session.query(Review.item_id, Review.review_result, Review.problem_note).all()
+            return {
+                item_id: {'审核结果': review_result, '问题描述': problem_note or ''}
+                for item_id, review_result, problem_note in rows
+            }
+            
+        except SQLAlchemyError as e:
+            print(f"获取审核状态失败: {e}")
+            return {}
+        finally:
+            session.close()
+    
+    def get_reviewed_item_ids(self) -> Set[str]:
+        """
+        一次查询获取所有已有审核结果的检查项ID
+        
+        Returns:
+            Set[str]: 检查项ID集合
+        """
+        try:
+            session = get_session()
+            return {item_id for (item_id,) in session.query(Review.item_id)}
+            
+        except SQLAlchemyError as e:
+            print(f"获取已审核检查项失败: {e}")
+            return set()
+        finally:
+            session.close()
+    
     def has_review(self, item_id: str) -> bool:
         """
         检查指定检查项是否已有审核结果
@@ -0,0 +1,114 @@
+"""
+审核完成度统计模块
+Review Completion Statistics Module
+"""
+import threading
+import time
+from typing import Dict, Optional, Set
+from item_store import ItemStore
+
+
+class ReviewStats:
+    """
+    门店审核完成度统计
+
+    一次查询加载全部审核状态，在内存中计算每个门店是否完成，
+    按运营人员缓存统计结果。提交审核/更新问题描述后调用invalidate()。
+    多worker部署时其他进程的写入不会通知到本进程，缓存最多保留ttl_seconds秒。
+    """
+
+    def __init__(self, review_manager, ttl_seconds: float = 10):
+        """
+        初始化统计器
+
+        Args:
+            review_manager: 审核管理器（需提供get_review_statuses()）
+            ttl_seconds: 缓存有效期（秒）
+        """
+        self.review_manager = review_manager
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._item_store: Optional[ItemStore] = None
+        self._completed_stores: Optional[Set[str]] = None
+        self._loaded_at = 0.0
+        self._stats_by_operator: Dict[str, Dict] = {}
+
+    def invalidate(self):
+        """清空缓存（审核结果变更后调用）"""
+        with self._lock:
+            self._completed_stores = None
+            self._stats_by_operator = {}
+
+    def get_stats(self, item_store: ItemStore, operator: str = '全部') -> Dict:
+        """
+        获取门店审核完成度统计
+
+        门店完成条件：所有检查项都已审核，且不合格的都有问题描述
+
+        Args:
+            item_store: 当前周期的检查项索引
+            operator: 运营人员姓名，"全部"或空表示所有门店
+
+        Returns:
+            Dict: {'total': 门店数, 'reviewed': 已完成门店数, 'percentage': 完成百分比}
+        """
+        operator = operator or '全部'
+
+        with self._lock:
+            expired = time.monotonic() - self._loaded_at > self.ttl_seconds
+            if item_store is not self._item_store or expired:
+                self._item_store = item_store
+                self._completed_stores = None
+                self._stats_by_operator = {}
+
+            cached = self._stats_by_operator.get(operator)
+            if cached is not None:
+                return cached
+
+            if self._completed_stores is None:
+                self._completed_stores = self._compute_completed_stores(item_store)
+                self._loaded_at = time.monotonic()
+
+            stores = item_store.get_store_groups(operator)
+            total_stores = len(stores)
+            completed_stores = sum(1 for store_id in stores if store_id in self._completed_stores)
+            percentage = round((completed_stores / total_stores * 100) if total_stores > 0 else 0, 1)
+
+            stats = {
+                'total': total_stores,
+                'reviewed': completed_stores,
+                'percentage': percentage
+            }
+            self._stats_by_operator[operator] = stats
+            return stats
+
+    def _compute_completed_stores(self, item_store: ItemStore) -> Set[str]:
+        """
+        计算已完成审核的门店集合
+
+        Args:
+            item_store: 当前周期的检查项索引
+
+        Returns:
+            Set[str]: 已完成的门店编号集合
+        """
+        statuses = self.review_manager.get_review_statuses()
+
+        completed = set()
+        for store_id, items in item_store.get_store_groups().items():
+            all_completed = True
+            for item in items:
+                review = statuses.get(item['id'])
+                if not review:
+                    all_completed = False
+                    break
+
+                # 如果是不合格，必须有问题描述
+                if review.get('审核结果') == '不合格' and not (review.get('问题描述') or '').strip():
+                    all_completed = False
+                    break
+
+            if all_completed:
+                completed.add(store_id)
+
+        return completed
@@ -2,10 +2,13 @@
 共用数据库模型
 Shared Database Models for Review System and Viewer System
 """
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Integer, Float, Index
+from sqlalchemy import create_engine, Column, String, Text, DateTime, Integer, Float, Index, text, func, select
 from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session
+from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
+import io
 import os
+import zlib
 
 # 创建基类
 Base = declarative_base()
@@ -199,6 +202,53 @@ class StoreRating(Base):
         }
 
 
+class StoreCurrentRating(Base):
+    """门店当前评级（store_ratings中每个门店最新一条的投影，提交评级时同一事务更新）"""
+    __tablename__ = 'store_current_rating'
+    
+    store_id = Column(String(50), primary_key=True, comment='门店ID')
+    rating = Column(String(1), nullable=False, comment='评级：A/B/C')
+    rated_at = Column(DateTime, comment='评级时间')
+    rated_by = Column(String(100), comment='评级人（可选）')
+    rating_id = Column(Integer, comment='对应store_ratings记录ID')
+    
+    __table_args__ = (
+        {'comment': '门店当前评级'}
+    )
+
+
+def rebuild_current_ratings(session) -> int:
+    """
+    根据评级历史重建门店当前评级（不提交，随调用方事务提交）
+    
+    Args:
+        session: 数据库会话
+        
+    Returns:
+        int: 有评级的门店数
+    """
+    StoreCurrentRating.__table__.create(session.get_bind(), checkfirst=True)
+    
+    ranked = session.query(
+        StoreRating.id,
+        func.row_number().over(
+            partition_by=StoreRating.store_id,
+            order_by=(StoreRating.rated_at.desc(), StoreRating.id.desc())
+        ).label('rn')
+    ).subquery()
+    latest = select(
+        StoreRating.store_id, StoreRating.rating, StoreRating.rated_at, StoreRating.rated_by, StoreRating.id
+    ).join(ranked, StoreRating.id == ranked.c.id).where(ranked.c.rn == 1)
+    
+    session.query(StoreCurrentRating).delete(synchronize_session=False)
+    result = session.execute(
+        StoreCurrentRating.__table__.insert().from_select(
+            ['store_id', 'rating', 'rated_at', 'rated_by', 'rating_id'], latest
+        )
+    )
+    return result.rowcount
+
+
 class StoreOperationData(Base):
     """门店运营数据模型"""
     __tablename__ = 'store_operation_data'
@@ -382,6 +432,40 @@ class EquipmentStatusSnapshot(Base):
         }
 
 
+class EquipmentDashboardState(Base):
+    """设备异常看板状态（每次设备数据导入后预先计算，处理设备异常时更新单个门店）"""
+    __tablename__ = 'equipment_dashboard_state'
+    
+    # 门店信息（营业时间内有异常设备的门店）
+    store_id = Column(String(50), primary_key=True, comment='门店ID')
+    store_name = Column(String(255), comment='门店名称')
+    war_zone = Column(String(50), comment='战区')
+    regional_manager = Column(String(50), comment='区域经理')
+    
+    # 处理状态：pending=待处理，recovered=已恢复，not_recovered=未恢复
+    processing_status = Column(String(20), nullable=False, default='pending', comment='今日处理状态')
+    
+    # 经常出问题
+    is_chronic = Column(Integer, default=0, comment='是否经常出问题：1=是，0=否')
+    chronic_reason = Column(String(100), comment='触发原因')
+    abnormal_count_5days = Column(Integer, default=0, comment='最近5天异常次数')
+    abnormal_count_10days = Column(Integer, default=0, comment='最近10天异常次数')
+    
+    # POS暂时不提示截止日期（该日期及之前不显示）
+    suppressed_until = Column(DateTime, comment='暂时不提示截止日期')
+    
+    # 生成信息
+    generation = Column(Integer, nullable=False, comment='生成时的设备数据版本号')
+    built_at = Column(DateTime, default=datetime.now, comment='生成时间')
+    
+    __table_args__ = (
+        Index('idx_dashboard_war_zone', 'war_zone'),
+        Index('idx_dashboard_regional_manager', 'regional_manager'),
+        Index('idx_dashboard_processing_status', 'processing_status'),
+        {'comment': '设备异常看板状态'}
+    )
+
+
 class PromoParticipation(Base):
     """活动参与度模型"""
     __tablename__ = 'promo_participation'
@@ -450,6 +534,220 @@ class PromoImportLog(Base):
     )
 
 
+class DataVersion(Base):
+    """数据版本戳（数据整体替换时递增，用于各进程缓存失效检查）"""
+    __tablename__ = 'data_versions'
+    
+    name = Column(String(50), primary_key=True, comment='数据名称（通常为表名）')
+    version = Column(Integer, nullable=False, default=0, comment='版本号')
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+    
+    __table_args__ = (
+        {'comment': '数据版本戳'}
+    )
+
+
+def bump_data_version(session, name: str):
+    """
+    递增数据版本号（不提交，随调用方的数据修改在同一事务中提交）
+    
+    Args:
+        session: 数据库会话
+        name: 数据名称，如'store_whitelist'
+    """
+    # 已部署的库可能还没有版本表（导入脚本不一定执行过init_viewer_db）；
+    # 在会话当前连接上检查/建表，不经引擎另取连接提交（SQLite上会连带提交调用方未完成的事务）
+    DataVersion.__table__.create(session.connection(), checkfirst=True)
+    
+    updated = session.query(DataVersion).filter_by(name=name).update(
+        {DataVersion.version: DataVersion.version + 1, DataVersion.updated_at: datetime.now()},
+        synchronize_session=False
+    )
+    if not updated:
+        session.add(DataVersion(name=name, version=1, updated_at=datetime.now()))
+
+
+def get_data_version(session, name: str):
+    """
+    获取数据版本号
+    
+    Args:
+        session: 数据库会话
+        name: 数据名称
+        
+    Returns:
+        Optional[int]: 版本号，从未更新过为0；版本表不可用时返回None（调用方应视为已变化）
+    """
+    # 在保存点中查询：版本表不可用时只回滚保存点，不丢弃调用方事务中未提交的修改
+    try:
+        with session.begin_nested():
+            version = session.query(DataVersion.version).filter_by(name=name).scalar()
+        return version or 0
+    except SQLAlchemyError as e:
+        print(f"获取数据版本失败: {e}")
+        return None
+
+
+def get_data_stamp(session, name: str):
+    """
+    获取数据版本戳（版本号 + 更新时间，用于进程内缓存的失效检查）
+    
+    Args:
+        session: 数据库会话
+        name: 数据名称
+        
+    Returns:
+        Optional[Tuple[int, Optional[datetime]]]: (版本号, 更新时间)，从未更新过为(0, None)；
+        版本表不可用时返回None（调用方应视为已变化）
+    """
+    try:
+        with session.begin_nested():
+            row = session.query(DataVersion.version, DataVersion.updated_at).filter_by(name=name).first()
+        return (row.version, row.updated_at) if row else (0, None)
+    except SQLAlchemyError as e:
+        print(f"获取数据版本失败: {e}")
+        return None
+
+
+def set_data_version(session, name: str, version: int, updated_at: datetime = None):
+    """
+    设置数据版本号（不提交），用于记录派生数据（如看板状态）生成时对应的源数据版本
+    
+    Args:
+        session: 数据库会话
+        name: 数据名称
+        version: 版本号
+        updated_at: 生成时间，为None时取当前时间
+    """
+    updated_at = updated_at or datetime.now()
+    updated = session.query(DataVersion).filter_by(name=name).update(
+        {DataVersion.version: version, DataVersion.updated_at: updated_at},
+        synchronize_session=False
+    )
+    if not updated:
+        session.add(DataVersion(name=name, version=version, updated_at=updated_at))
+
+
+def advisory_xact_lock(session, name: str) -> bool:
+    """
+    获取事务级咨询锁（PostgreSQL pg_advisory_xact_lock，提交或回滚时自动释放）
+    
+    多个进程（gunicorn worker、导入脚本）重新生成同一份数据前加锁，避免同时删除、写入。
+    其他数据库（SQLite写入时整库加锁）不加锁。
+    
+    Args:
+        session: 数据库会话
+        name: 锁名称
+        
+    Returns:
+        bool: 是否加锁
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        return False
+    session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': zlib.crc32(name.encode('utf-8'))})
+    return True
+
+
+class FilterOptionsSnapshot(Base):
+    """筛选选项快照（每次导入白名单时生成）"""
+    __tablename__ = 'filter_options_snapshot'
+    
+    name = Column(String(50), primary_key=True, comment='快照名称')
+    version = Column(Integer, nullable=False, comment='生成时的数据版本号')
+    options = Column(Text, nullable=False, comment='筛选选项JSON')
+    created_at = Column(DateTime, default=datetime.now, comment='生成时间')
+    
+    __table_args__ = (
+        {'comment': '筛选选项快照'}
+    )
+
+
+def _copy_text_value(value) -> str:
+    """转换为COPY文本格式的字段值（NULL为\\N，转义反斜杠、制表符和换行）"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def bulk_insert(session, model, rows: list) -> int:
+    """
+    批量写入多行（不提交，随调用方事务提交）
+    
+    PostgreSQL使用COPY FROM STDIN，其他数据库使用一次executemany。
+    COPY不会执行SQLAlchemy的Python端默认值，rows中缺少的列按模型默认值补齐（每批取一次）。
+    
+    Args:
+        session: 数据库会话
+        model: 模型类
+        rows: 行字典列表，每行的键相同
+        
+    Returns:
+        int: 写入行数
+    """
+    if not rows:
+        return 0
+    
+    table = model.__table__
+    if session.get_bind().dialect.name != 'postgresql':
+        session.execute(table.insert(), rows)
+        return len(rows)
+    
+    columns = list(rows[0].keys())
+    defaults = {}
+    for column in table.columns:
+        default = column.default
+        if column.name in columns or default is None or not (default.is_scalar or default.is_callable):
+            continue
+        defaults[column.name] = default.arg if default.is_scalar else default.arg(None)
+    
+    buffer = io.StringIO()
+    for row in rows:
+        values = [row[name] for name in columns] + list(defaults.values())
+        buffer.write('\t'.join(_copy_text_value(value) for value in values))
+        buffer.write('\n')
+    buffer.seek(0)
+    
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns + list(defaults))}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+# 门店名称三元组索引（PostgreSQL pg_trgm，支持 LIKE '%关键词%' 走索引）
+STORE_NAME_TRGM_INDEX = 'idx_whitelist_store_name_trgm'
+
+
+def create_store_name_trgm_index(engine) -> bool:
+    """
+    为白名单门店名称创建pg_trgm GIN索引（非PostgreSQL数据库跳过）
+    
+    Args:
+        engine: SQLAlchemy引擎
+        
+    Returns:
+        bool: 是否已创建（或已存在）
+    """
+    if engine.dialect.name != 'postgresql':
+        return False
+    
+    try:
+        with engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            conn.execute(text(
+                f'CREATE INDEX IF NOT EXISTS {STORE_NAME_TRGM_INDEX} '
+                f'ON {StoreWhitelist.__tablename__} USING gin (store_name gin_trgm_ops)'
+            ))
+        return True
+    except SQLAlchemyError as e:
+        # 没有创建扩展的权限时仍可使用，只是门店名称搜索为顺序扫描
+        print(f"创建门店名称三元组索引失败: {e}")
+        return False
+
+
 def init_viewer_db(engine):
     """
     初始化展示系统数据库表
@@ -462,9 +760,15 @@ def init_viewer_db(engine):
     print(f"  - 表名: {StoreWhitelist.__tablename__}")
     print(f"  - 表名: {ViewerReviewResult.__tablename__}")
     print(f"  - 表名: {StoreRating.__tablename__}")
+    print(f"  - 表名: {StoreCurrentRating.__tablename__}")
     print(f"  - 表名: {StoreOperationData.__tablename__}")
     print(f"  - 表名: {EquipmentStatus.__tablename__}")
     print(f"  - 表名: {EquipmentProcessing.__tablename__}")
     print(f"  - 表名: {EquipmentStatusSnapshot.__tablename__}")
+    print(f"  - 表名: {EquipmentDashboardState.__tablename__}")
     print(f"  - 表名: {PromoParticipation.__tablename__}")
     print(f"  - 表名: {PromoImportLog.__tablename__}")
+    print(f"  - 表名: {DataVersion.__tablename__}")
+    print(f"  - 表名: {FilterOptionsSnapshot.__tablename__}")
+    if create_store_name_trgm_index(engine):
+        print(f"  - 索引: {STORE_NAME_TRGM_INDEX}")
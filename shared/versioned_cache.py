@@ -0,0 +1,56 @@
+"""
+按数据版本失效的进程内缓存
+Versioned In-Process Cache
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+from shared.database_models import get_data_stamp
+
+
+class VersionedCache:
+    """
+    进程内缓存，任一依赖数据的版本戳（data_versions表）变化时失效
+
+    每次读取按依赖数据各查询一次版本戳（主键查询），适合缓存代价较高的统计结果，
+    例如搜索结果总数。数据导入时需调用bump_data_version()。
+    """
+
+    def __init__(self, *names: str, max_entries: int = 256):
+        """
+        初始化缓存
+
+        Args:
+            names: 缓存值依赖的数据名称（与bump_data_version使用的名称一致，通常为表名）
+            max_entries: 最大缓存条目数，超过时清空
+        """
+        self.names = names
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[Any, Any]] = {}
+
+    def get_or_compute(self, session, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        获取缓存值，版本变化或不存在时计算
+
+        Args:
+            session: 数据库会话
+            key: 缓存键（如筛选条件元组）
+            compute: 计算函数
+
+        Returns:
+            Any: 缓存值
+        """
+        stamp = tuple(get_data_stamp(session, name) for name in self.names)
+        if None in stamp:
+            return compute()
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        value = compute()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {}
+            self._entries[key] = (stamp, value)
+        return value
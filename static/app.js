@@ -328,9 +328,10 @@ async function loadOperators() {
  */
 async function loadItems() {
     try {
-        let url = '/api/items';
+        // all=1: 一次获取全部检查项（接口默认按门店分页）
+        let url = '/api/items?all=1';
         if (currentOperator && currentOperator !== '全部') {
-            url += `?operator=${encodeURIComponent(currentOperator)}`;
+            url += `&operator=${encodeURIComponent(currentOperator)}`;
         }
         
         const response = await fetch(url);
@@ -497,8 +498,9 @@ function renderPendingItems() {
     // 渲染这些门店的检查项
     displayStoreIds.forEach(storeId => {
         const items = storeGroups[storeId];
-        items.forEach(item => {
-            const card = createItemCard(item);
+        items.forEach((item, index) => {
+            // 每个门店的第一张卡片显示"整店合格"按钮
+            const card = createItemCard(item, index === 0);
             container.appendChild(card);
         });
     });
@@ -722,7 +724,7 @@ async function saveProblemNoteAndRefresh(itemId, problemNote, closeAfterSave = f
 /**
  * 创建检查项卡片
  */
-function createItemCard(item) {
+function createItemCard(item, showStoreActions = false) {
     const card = document.createElement('div');
     card.className = 'item-card';
     card.dataset.itemId = item.id;
@@ -745,6 +747,10 @@ function createItemCard(item) {
                     <span>|</span>
                     <span>区域: ${escapeHtml(item['所属区域'])}</span>
                     <span class="operator-badge">👤 ${escapeHtml(operator)}</span>
+                    ${showStoreActions ?
+                        '<button class="store-pass-btn">✓ 整店合格</button>' :
+                        ''
+                    }
                 </div>
             </div>
             <div class="item-name">📋 ${escapeHtml(item['检查项名称'])}</div>
@@ -777,6 +783,12 @@ function createItemCard(item) {
         </div>
     `;
     
+    // 门店编号从data属性读取，不拼接进onclick字符串
+    const storePassBtn = card.querySelector('.store-pass-btn');
+    if (storePassBtn) {
+        storePassBtn.addEventListener('click', () => submitStoreReviews(card.dataset.storeId, '合格'));
+    }
+    
     // 使用JavaScript直接设置img的src属性，避免HTML转义问题
     if (imageUrl) {
         const imageContainer = card.querySelector('.image-container');
@@ -995,6 +1007,65 @@ async function submitReview(itemId, result) {
     }
 }
 
+/**
+ * 批量提交门店内所有未审核检查项（一次请求）
+ */
+async function submitStoreReviews(storeId, result) {
+    const pendingItems = allItems.filter(item =>
+        item['门店编号'] === storeId && !reviews[item.id]
+    );
+    
+    if (pendingItems.length === 0) {
+        showToast('该门店没有待审核的检查项', 'success');
+        return;
+    }
+    
+    if (!confirm(`确定将门店 ${storeId} 的 ${pendingItems.length} 个待审核项全部标记为"${result}"吗？`)) {
+        return;
+    }
+    
+    try {
+        const response = await fetch('/api/reviews/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                reviews: pendingItems.map(item => ({
+                    item_id: item.id,
+                    '审核结果': result
+                }))
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (data.success) {
+            const reviewTime = new Date().toLocaleString('zh-CN');
+            pendingItems.forEach(item => {
+                reviews[item.id] = {
+                    item_id: item.id,
+                    '审核结果': result,
+                    '问题描述': '',
+                    '审核时间': reviewTime
+                };
+                updateCardReviewStatus(item.id, result);
+            });
+            
+            updateReviewCount();
+            checkStoreCompletion(storeId);
+            
+            showToast(`✓ 已批量审核 ${data.count} 项: ${result}`, 'success');
+        } else {
+            showToast('❌ 批量审核失败: ' + (data.error || '未知错误'), 'error');
+        }
+        
+    } catch (error) {
+        console.error('批量提交审核失败:', error);
+        showToast('❌ 提交失败，请重试', 'error');
+    }
+}
+
 /**
  * 保存问题描述
  */
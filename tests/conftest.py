@@ -0,0 +1,11 @@
+"""
+测试公共配置：展示系统模块在导入时即连接数据库，未指定DATABASE_URL时使用临时SQLite库
+Shared Test Configuration
+"""
+import os
+import tempfile
+
+os.environ.setdefault(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='viewer_tests_'), 'viewer.db')}"
+)
@@ -26,6 +26,21 @@ def test_api_items_route(client):
     assert response.is_json
 
 
+def test_api_items_paginated(client):
+    """测试检查项API默认按门店分页"""
+    response = client.get('/api/items?limit=2')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert 'items' in data and 'next_cursor' in data
+    assert len({item['门店编号'] for item in data['items']}) <= 2
+
+
+def test_api_items_invalid_cursor(client):
+    """测试无效的分页游标"""
+    response = client.get('/api/items?cursor=nonexistent-store')
+    assert response.status_code == 400
+
+
 def test_api_reviews_route(client):
     """测试获取审核结果API"""
     response = client.get('/api/reviews')
@@ -36,7 +51,7 @@ def test_api_reviews_route(client):
 def test_api_review_post(client):
     """测试提交审核结果API"""
     # 首先获取一个有效的item_id
-    items_response = client.get('/api/items')
+    items_response = client.get('/api/items?all=1')
     items = items_response.get_json()
     
     if items and len(items) > 0:
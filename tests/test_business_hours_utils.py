@@ -0,0 +1,58 @@
+"""
+营业时间解析工具测试
+Business Hours Utility Tests
+"""
+from datetime import datetime, timedelta
+import numpy as np
+from hypothesis import given, strategies as st, settings
+from business_hours_utils import WEEKDAY_NAMES, compile_business_hours, is_open_at, is_open_at_batch
+
+
+# 2026-03-02 是周一
+MONDAY = datetime(2026, 3, 2)
+LATE_NIGHT = '[周一:00:00-02:30,08:30-24:00],[周二:00:00-02:30,08:30-24:00]'
+
+
+def test_is_open_at_ranges_and_cross_midnight():
+    """测试普通时间段、24:00结尾、00:00开头的跨午夜延续段"""
+    assert is_open_at('[周一:08:30-23:00]', MONDAY.replace(hour=8, minute=30))
+    assert not is_open_at('[周一:08:30-23:00]', MONDAY.replace(hour=23))
+    assert not is_open_at('[周一:08:30-23:00]', MONDAY.replace(hour=8, minute=29))
+    assert is_open_at(LATE_NIGHT, MONDAY.replace(hour=23, minute=59))
+    assert is_open_at(LATE_NIGHT, MONDAY + timedelta(days=1, hours=2, minutes=29))
+    assert not is_open_at(LATE_NIGHT, MONDAY + timedelta(days=1, hours=2, minutes=30))
+    # 周三没有营业时间
+    assert not is_open_at(LATE_NIGHT, MONDAY + timedelta(days=2, hours=12))
+
+
+def test_unknown_hours_treated_as_open():
+    """测试解析失败或为空时视为营业"""
+    for hours in ('', 'nan', '全天营业'):
+        assert is_open_at(hours, MONDAY)
+    assert is_open_at_batch([None, float('nan'), ''], MONDAY).tolist() == [True, True, True]
+
+
+def test_compiled_bitmap_cached_and_read_only():
+    """测试同一营业时间字符串只编译一次，缓存的位图不可修改"""
+    bitmap = compile_business_hours(LATE_NIGHT)
+    assert compile_business_hours(LATE_NIGHT) is bitmap
+    assert bitmap.shape == (7, 1440)
+    assert not bitmap.flags.writeable
+
+
+time_ranges = st.tuples(st.integers(0, 1500), st.integers(0, 1600)).map(
+    lambda r: f'{r[0] // 60:02d}:{r[0] % 60:02d}-{r[1] // 60:02d}:{r[1] % 60:02d}'
+)
+hours_strings = st.dictionaries(
+    st.sampled_from(WEEKDAY_NAMES), st.lists(time_ranges, min_size=1, max_size=3), max_size=7
+).map(lambda days: ','.join(f'[{day}:{",".join(ranges)}]' for day, ranges in days.items()))
+
+
+@given(st.lists(hours_strings, min_size=1, max_size=20), st.integers(0, 7 * 1440 - 1))
+@settings(max_examples=100)
+def test_batch_matches_is_open_at(hours_list, minute):
+    """测试批量判断与逐个判断结果一致"""
+    check_dt = MONDAY + timedelta(minutes=minute)
+    result = is_open_at_batch(hours_list, check_dt)
+    assert result.dtype == np.bool_
+    assert result.tolist() == [is_open_at(hours, check_dt) for hours in hours_list]
@@ -5,9 +5,14 @@ CSV Exporter Tests
 import pytest
 import csv
 from io import StringIO
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
 from hypothesis import given, strategies as st, settings
 from csv_exporter import CSVExporter
-from database import get_session, StoreWhitelist, Base, engine
+from database import get_session, Review, StoreWhitelist, Base, engine
+from item_store import ItemStore
+from shared.database_models import DataVersion, bump_data_version, get_data_version, get_data_stamp
+from review_manager_db import ReviewManager
 
 
 class TestCSVExporter:
@@ -393,3 +398,149 @@ class TestCSVExporterFieldCompleteness:
             
         finally:
             session.close()
+
+
+class TestCSVExporterStreaming:
+    """流式导出测试"""
+    
+    STORE_IDS = ['S9001', 'S9002']
+    
+    def setup_method(self):
+        """写入白名单和审核记录"""
+        Base.metadata.create_all(engine)
+        self.teardown_method()
+        
+        session = get_session()
+        try:
+            session.add(StoreWhitelist(store_id='S9001', war_zone='上海战区', province='上海', city='上海'))
+            session.commit()
+        finally:
+            session.close()
+        
+        self.original_data = [
+            {
+                'id': f'{store_id}_{item_name}',
+                '门店名称': f'测试门店{store_id}',
+                '门店编号': store_id,
+                '所属区域': '测试区域',
+                '检查项名称': item_name,
+                '检查项分类': '周清',
+                '负责运营': '张三',
+                '标准图': 'http://test.com/img.jpg'
+            }
+            for store_id in self.STORE_IDS
+            for item_name in ('门店厨房', '门店餐桌区')
+        ]
+        
+        ReviewManager().save_reviews_bulk({
+            item['id']: {
+                '门店名称': item['门店名称'],
+                '门店编号': item['门店编号'],
+                '检查项名称': item['检查项名称'],
+                '审核结果': '不合格',
+                '问题描述': '地面油污, "需清洁"'
+            }
+            for item in self.original_data[:3]
+        })
+    
+    def teardown_method(self):
+        """清理测试数据"""
+        session = get_session()
+        try:
+            session.query(StoreWhitelist).filter(StoreWhitelist.store_id.in_(self.STORE_IDS)).delete()
+            session.query(Review).filter(Review.store_id.in_(self.STORE_IDS)).delete()
+            session.commit()
+        finally:
+            session.close()
+    
+    def test_stream_matches_in_memory_export(self):
+        """测试流式导出与一次性导出内容一致（含BOM、表头和转义）"""
+        exporter = CSVExporter()
+        item_store = ItemStore(self.original_data)
+        
+        streamed = ''.join(exporter.stream_reviews(item_store, batch_size=2))
+        reviews = [r for r in ReviewManager().get_all_reviews() if r['门店编号'] in self.STORE_IDS]
+        expected = exporter.export_reviews(reviews, self.original_data)
+        
+        assert streamed == expected
+        rows = list(csv.DictReader(StringIO(streamed.lstrip('\ufeff'))))
+        assert [row['战区'] for row in rows] == ['上海战区', '上海战区', '']
+    
+    def test_stream_skips_items_outside_cycle(self):
+        """测试不在当前周期中的审核记录不导出"""
+        exporter = CSVExporter()
+        chunks = list(exporter.stream_reviews(ItemStore(self.original_data[:1])))
+        
+        assert chunks[0].startswith('\ufeff门店名称,')
+        rows = list(csv.DictReader(StringIO(''.join(chunks).lstrip('\ufeff'))))
+        assert len(rows) == 1
+
+
+class TestWhitelistCacheVersion:
+    """白名单缓存版本失效测试"""
+    
+    STORE_ID = 'S9003'
+    
+    def setup_method(self):
+        """创建表并写入一条白名单"""
+        Base.metadata.create_all(engine)
+        DataVersion.__table__.create(engine, checkfirst=True)
+        self.teardown_method()
+        
+        session = get_session()
+        try:
+            session.add(StoreWhitelist(store_id=self.STORE_ID, war_zone='上海战区', province='上海', city='上海'))
+            session.commit()
+        finally:
+            session.close()
+    
+    def teardown_method(self):
+        """清理测试数据"""
+        session = get_session()
+        try:
+            session.query(StoreWhitelist).filter_by(store_id=self.STORE_ID).delete()
+            session.commit()
+        finally:
+            session.close()
+    
+    def _update_war_zone(self, war_zone, bump):
+        session = get_session()
+        try:
+            session.query(StoreWhitelist).filter_by(store_id=self.STORE_ID).update({'war_zone': war_zone})
+            if bump:
+                bump_data_version(session, StoreWhitelist.__tablename__)
+            session.commit()
+        finally:
+            session.close()
+    
+    def test_cache_reloads_only_when_version_changes(self):
+        """测试版本号不变时沿用缓存，版本号递增后重新加载"""
+        exporter = CSVExporter()
+        assert exporter._get_store_location(self.STORE_ID)['war_zone'] == '上海战区'
+        
+        # 未递增版本号：沿用缓存
+        self._update_war_zone('华东战区', bump=False)
+        exporter._load_whitelist_cache()
+        assert exporter._get_store_location(self.STORE_ID)['war_zone'] == '上海战区'
+        
+        # 递增版本号：重新加载
+        self._update_war_zone('华东战区', bump=True)
+        exporter._load_whitelist_cache()
+        assert exporter._get_store_location(self.STORE_ID)['war_zone'] == '华东战区'
+    
+    def test_version_lookup_failure_keeps_caller_changes(self):
+        """测试版本表不可用时返回None，且不回滚调用方未提交的修改"""
+        memory_engine = create_engine('sqlite:///:memory:', echo=False)
+        StoreWhitelist.__table__.create(memory_engine)
+        session = sessionmaker(bind=memory_engine)()
+        try:
+            session.add(StoreWhitelist(store_id=self.STORE_ID, war_zone='上海战区'))
+            session.flush()
+            
+            assert get_data_version(session, StoreWhitelist.__tablename__) is None
+            assert get_data_stamp(session, StoreWhitelist.__tablename__) is None
+            session.commit()
+            assert session.query(StoreWhitelist).filter_by(store_id=self.STORE_ID).count() == 1
+        finally:
+            session.close()
+            memory_engine.dispose()
@@ -0,0 +1,61 @@
+"""
+周期数据快照测试
+Cycle Store Tests
+"""
+import os
+import pytest
+from cycle_store import CycleStore
+
+
+ITEMS = [{'id': '7_门店厨房', '门店编号': '7', '负责运营': '张三'}]
+
+
+def test_no_snapshot(tmp_path):
+    """测试尚未发布快照"""
+    store = CycleStore(str(tmp_path))
+    assert store.current_generation() is None
+    assert store.load('missing') is None
+
+
+def test_publish_visible_to_other_worker(tmp_path):
+    """测试一个worker发布的快照，另一个worker检测到新代并加载"""
+    publisher = CycleStore(str(tmp_path))
+    worker = CycleStore(str(tmp_path))
+
+    generation = publisher.publish({'items': ITEMS, 'operators': ['张三']})
+
+    assert worker.current_generation() == generation
+    assert worker.load(generation) == {'items': ITEMS, 'operators': ['张三']}
+
+
+def test_generation_changes_on_republish(tmp_path):
+    """测试再次发布后代号变化，旧快照只保留最近几份"""
+    publisher = CycleStore(str(tmp_path))
+    worker = CycleStore(str(tmp_path))
+
+    first = publisher.publish({'items': ITEMS, 'operators': []})
+    assert worker.current_generation() == first
+
+    generations = [publisher.publish({'items': [], 'operators': []}) for _ in range(3)]
+    assert worker.current_generation() == generations[-1]
+    assert worker.load(generations[-1]) == {'items': [], 'operators': []}
+
+    snapshots = [name for name in os.listdir(tmp_path) if name.endswith('.pkl')]
+    assert len(snapshots) == CycleStore.KEEP_SNAPSHOTS
+
+
+def test_refuses_snapshot_writable_by_others(tmp_path):
+    """测试目录以0o700创建，快照文件被改为其他用户可写后拒绝加载"""
+    directory = tmp_path / 'cycle'
+    store = CycleStore(str(directory))
+    generation = store.publish({'items': ITEMS, 'operators': []})
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    os.chmod(directory / f'cycle-{generation}.pkl', 0o666)
+    with pytest.raises(PermissionError):
+        store.load(generation)
+
+    os.chmod(directory / f'cycle-{generation}.pkl', 0o600)
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        store.load(generation)
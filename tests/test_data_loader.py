@@ -111,3 +111,51 @@ def test_get_data():
     data = loader.get_data()
     assert len(data) > 0
     assert data == loader.data
+
+
+def _make_mixed_result_df():
+    """构造包含各种"现场结果"格式的数据"""
+    return pd.DataFrame([
+        {'检查项名称': '门店餐桌区', '门店名称': '门店A', '门店编号': 7, '所属区域': '上海',
+         '检查项分类': '周清', '现场结果': '["https://example.com/a.jpg"]'},
+        {'检查项名称': '门店厨房', '门店名称': '门店A', '门店编号': 7, '所属区域': '上海',
+         '检查项分类': None, '现场结果': '["https://example.com/b.jpg"],https://example.com/c.jpg'},
+        {'检查项名称': '门店卫生间', '门店名称': '门店B', '门店编号': 8.0, '所属区域': None,
+         '检查项分类': '周清', '现场结果': '["<img src=\\"https://example.com/d.jpg\\" />"]'},
+        {'检查项名称': '门头', '门店名称': None, '门店编号': 9, '所属区域': '北京',
+         '检查项分类': '周清', '现场结果': '<img src="https://example.com/e.jpg">'},
+        {'检查项名称': '吧台', '门店名称': '门店C', '门店编号': 10, '所属区域': '北京',
+         '检查项分类': '周清', '现场结果': 'https://example.com/f.jpg'},
+        {'检查项名称': '仓库', '门店名称': '门店C', '门店编号': 10, '所属区域': '北京',
+         '检查项分类': '周清', '现场结果': '[]'},
+        {'检查项名称': '冷库', '门店名称': '门店C', '门店编号': None, '所属区域': '北京',
+         '检查项分类': '周清', '现场结果': None},
+        {'检查项名称': None, '门店名称': '门店D', '门店编号': 11, '所属区域': '北京',
+         '检查项分类': '周清', '现场结果': '[123]'},
+    ])
+
+
+def test_vectorized_transform_matches_row_transform():
+    """测试按列转换与逐行转换结果一致"""
+    loader = DataLoader('test.xlsx')
+    loader.df = _make_mixed_result_df()
+
+    assert loader.transform_data(vectorized=True) == loader.transform_data(vectorized=False)
+
+
+def test_vectorized_transform_invalid_json_falls_back():
+    """测试批量JSON解码失败时逐个单元格解析"""
+    loader = DataLoader('test.xlsx')
+    loader.df = pd.DataFrame([
+        {'检查项名称': '门店餐桌区', '门店名称': '门店A', '门店编号': 7, '所属区域': '上海',
+         '现场结果': '["https://example.com/a.jpg"]'},
+        {'检查项名称': '门店厨房', '门店名称': '门店A', '门店编号': 7, '所属区域': '上海',
+         '现场结果': '[https://example.com/broken.jpg'},
+    ])
+
+    data = loader.transform_data()
+
+    assert data == loader.transform_data(vectorized=False)
+    assert data[0]['标准图'] == 'https://example.com/a.jpg'
+    assert data[1]['标准图'] == '[https://example.com/broken.jpg'
+    assert '检查项分类' not in data[0]
@@ -0,0 +1,205 @@
+"""
+设备异常监控接口测试
+Equipment Monitoring API Tests
+"""
+from datetime import date, datetime, timedelta
+from io import BytesIO
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+from shared.database_models import (
+    Base, EquipmentStatus, EquipmentStatusSnapshot, EquipmentProcessing, EquipmentDashboardState, DataVersion,
+    bump_data_version
+)
+from equipment_dashboard import DASHBOARD_STATE_MARKER, build_dashboard_state, ensure_dashboard_state
+import viewer.app_viewer as app_module
+
+
+def _make_session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    return engine, scoped_session(sessionmaker(bind=engine))
+
+
+def _add_equipment(session, store_count, repeat_store_ids):
+    """写入离线POS门店并生成看板状态（同导入流程），repeat_store_ids为当日反复（上午、下午都异常且上午已恢复）的门店"""
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    for i in range(store_count):
+        session.add(EquipmentStatus(
+            store_id=f'E{i:02d}', store_name=f'门店{i}', war_zone='华东',
+            equipment_type='POS', equipment_id=f'P{i}', status='离线', is_open_at_data_time=1
+        ))
+    for store_id in repeat_store_ids:
+        for period, hour in (('AM', 10), ('PM', 17)):
+            session.add(EquipmentStatusSnapshot(
+                snapshot_date=today_start + timedelta(hours=hour), snapshot_period=period,
+                store_id=store_id, equipment_type='POS', has_abnormal=1
+            ))
+        session.add(EquipmentProcessing(
+            store_id=store_id, equipment_type='POS', action='已恢复',
+            processed_at=today_start + timedelta(hours=11)
+        ))
+    bump_data_version(session, EquipmentStatus.__tablename__)
+    build_dashboard_state(session)
+    session.commit()
+
+
+def test_search_chronic_total_cached_and_page_scoped():
+    """测试搜索读取看板状态，页面查询数与每页门店数无关，处理后更新该门店状态"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    try:
+        _add_equipment(session, 30, ['E00', 'E01', 'E02'])
+        client = app_module.app.test_client()
+
+        data = client.get('/api/equipment/search?per_page=5').get_json()['data']
+        assert data['total_stores'] == 30
+        assert data['total_chronic'] == 3
+        assert data['total_processed'] == 3
+
+        counts = []
+        for per_page in (5, 20):
+            statements.clear()
+            data = client.get(f'/api/equipment/search?per_page={per_page}').get_json()['data']
+            counts.append(len(statements))
+            assert len(data['stores']) == per_page
+        assert counts[0] == counts[1]
+
+        data = client.get('/api/equipment/search?status_filter=chronic').get_json()['data']
+        assert data['filtered_total'] == 3
+        assert all(store['is_chronic'] for store in data['stores'])
+        assert data['stores'][0]['chronic_reason'] == '当日反复'
+
+        # 改为"未恢复"后不再是当日反复
+        response = client.post('/api/equipment/process', json={
+            'store_id': 'E00', 'equipment_type': 'POS', 'action': '未恢复'
+        })
+        assert response.status_code == 200
+        data = client.get('/api/equipment/search?status_filter=chronic').get_json()['data']
+        assert data['total_chronic'] == 2
+        assert sorted(store['store_id'] for store in data['stores']) == ['E01', 'E02']
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_dashboard_state_rebuilt_per_import_and_overlay():
+    """测试看板状态按导入版本生成（搜索请求不重新生成），暂时不提示由处理接口即时更新"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        # 没有异常门店时生成0行，由生成标记判断为最新，不会每次请求都重新生成
+        assert ensure_dashboard_state(session) is True
+        assert ensure_dashboard_state(session) is False
+
+        _add_equipment(session, 3, [])
+        assert ensure_dashboard_state(session) is False
+        assert session.query(EquipmentDashboardState).count() == 3
+
+        # 跨天后重新生成
+        session.query(DataVersion).filter_by(name=DASHBOARD_STATE_MARKER)\
+            .update({DataVersion.updated_at: datetime.now() - timedelta(days=1)})
+        session.commit()
+        assert ensure_dashboard_state(session) is True
+        assert ensure_dashboard_state(session) is False
+
+        client = app_module.app.test_client()
+        expected = (date.today() + timedelta(days=2)).strftime('%Y-%m-%d')
+        response = client.post('/api/equipment/process', json={
+            'store_id': 'E01', 'equipment_type': 'POS', 'action': '未恢复', 'expected_recovery_date': expected
+        })
+        assert response.status_code == 200
+
+        data = client.get('/api/equipment/search').get_json()['data']
+        assert [store['store_id'] for store in data['stores']] == ['E00', 'E02']
+        assert data['total_not_recovered'] == 0
+
+        # 版本号变化但看板状态未重新生成时，搜索返回现有状态，不在请求中重新生成
+        session.add(EquipmentStatus(store_id='E09', equipment_type='POS', is_open_at_data_time=1))
+        bump_data_version(session, EquipmentStatus.__tablename__)
+        session.commit()
+        assert client.get('/api/equipment/search?store_search=E09').get_json()['data']['stores'] == []
+
+        # 定时任务发现版本号变化后重新生成
+        assert ensure_dashboard_state(session) is True
+        data = client.get('/api/equipment/search?store_search=E09').get_json()['data']
+        assert [store['store_id'] for store in data['stores']] == ['E09']
+        assert data['total_pending'] == 1
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_export_history_columns_match_per_store_helpers(monkeypatch):
+    """测试导出的多日统计列与逐个门店计算一致，SQL语句数量与门店数无关"""
+    import equipment_config
+    import equipment_utils
+    monkeypatch.setattr(equipment_config, 'ENABLE_MULTI_DAY_CHRONIC', True)
+    monkeypatch.setattr(equipment_utils, 'ENABLE_MULTI_DAY_CHRONIC', True)
+
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    def export(store_count):
+        _add_equipment(session, store_count, ['E00'])
+        today_start = datetime.combine(date.today(), datetime.min.time())
+        for i in range(store_count):
+            for days_ago in range(1, 1 + i % 5):
+                session.add(EquipmentStatusSnapshot(
+                    snapshot_date=today_start - timedelta(days=days_ago * 2) + timedelta(hours=17),
+                    snapshot_period='PM', store_id=f'E{i:02d}', equipment_type='POS', has_abnormal=1
+                ))
+        session.commit()
+
+        statements.clear()
+        response = app_module.app.test_client().get('/api/equipment/export')
+        assert response.status_code == 200
+        rows = list(load_workbook(BytesIO(response.get_data())).active.iter_rows(values_only=True))
+        return len(statements), [dict(zip(rows[0], row)) for row in rows[1:]]
+
+    try:
+        small_count, _ = export(2)
+        session.query(EquipmentStatus).delete()
+        session.query(EquipmentStatusSnapshot).delete()
+        session.query(EquipmentProcessing).delete()
+        session.commit()
+        large_count, rows = export(12)
+        assert small_count == large_count
+
+        for row in rows:
+            store_id = row['门店ID']
+            is_chronic, reason, _ = equipment_utils.is_chronic_store(session, store_id, 'POS')
+            assert row['是否经常出问题'] == ('是' if is_chronic else '否')
+            assert (row['触发原因'] or None) == reason
+            for days in (5, 10):
+                assert row[f'最近{days}天异常次数'] == equipment_utils.get_abnormal_count(
+                    session, store_id, 'POS', days, exclude_today=False
+                )
+        e04 = next(row for row in rows if row['门店ID'] == 'E04')
+        assert e04['异常时间点'] == '、'.join(
+            (date.today() - timedelta(days=days)).strftime('%m-%d') + '下午' for days in (2, 4, 6, 8)
+        )
+        assert e04['触发原因'] == '多次出问题（10天4次）'
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
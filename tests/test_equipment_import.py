@@ -0,0 +1,196 @@
+"""
+设备异常导入流程测试
+Equipment Import Pipeline Tests
+"""
+import os
+import time
+from datetime import date
+from io import BytesIO
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from shared.database_models import (
+    Base, EquipmentStatus, EquipmentStatusSnapshot, EquipmentProcessing, EquipmentImportLog, StoreWhitelist,
+    get_data_version
+)
+import equipment_import
+from equipment_import import EquipmentImportPipeline, IMPORT_LOCK_NAME
+import viewer.app_viewer as app_module
+
+
+HOURS = ','.join(f'[{day}:10:00-22:00]' for day in ('周一', '周二', '周三', '周四', '周五', '周六', '周日'))
+TODAY = date.today().strftime('%Y%m%d')
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        StoreWhitelist(store_id=f'S{i}', store_name=f'门店{i}', war_zone='华东', regional_manager='经理')
+        for i in range(6)
+    ])
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _write_files(directory, pos_offline, stb_offline, stb_columns=None):
+    """生成在营门店（S0-S5营业中，10:00-22:00）、收银设备、机顶盒文件"""
+    operating_file = directory / '在营门店.xlsx'
+    rows = [['', '', f'S{i}', '', '', '', '', '', '营业中', HOURS, '', '', '', '', '', '', '营业中'] for i in range(6)]
+    with pd.ExcelWriter(operating_file) as writer:
+        pd.DataFrame(rows).to_excel(writer, sheet_name='营业门店', index=False)
+
+    pos_file = directory / f'牛约堡集团_点餐设备表_{TODAY}_1100.xlsx'
+    df_pos = pd.DataFrame({
+        '组织机构代码': pos_offline, '设备编号': [f'P{s}' for s in pos_offline],
+        '设备名称': ['收银机'] * len(pos_offline), '状态': ['离线'] * len(pos_offline)
+    })
+    with pd.ExcelWriter(pos_file) as writer:
+        df_pos.to_excel(writer, index=False, startrow=1)
+
+    stb_file = directory / f'{TODAY}_1100.xlsx'
+    df_stb = pd.DataFrame({'设备编码': stb_offline, '名称': ['盒子'] * len(stb_offline), '状态': ['离线'] * len(stb_offline)})
+    df_stb[stb_columns or df_stb.columns].to_excel(stb_file, index=False)
+    return operating_file, pos_file, stb_file
+
+
+def test_pipeline_imports_all_stages_in_one_commit(session, tmp_path):
+    """测试各阶段导入结果：异常记录、快照、导入日志、数据版本号"""
+    operating_file, pos_file, stb_file = _write_files(tmp_path, ['S0', 'S1', 'S9'], ['S2'])
+
+    result = EquipmentImportPipeline(session, operating_file, pos_file=pos_file, stb_file=stb_file).run()
+
+    assert result.success and result.failed_steps == []
+    assert (result.pos.abnormal_count, result.pos.skip_not_operating) == (2, 1)
+    assert result.stb.abnormal_count == 1
+    assert [name for name, _ in result.step_timings] == [
+        '在营门店', 'whitelist', '收银设备', '机顶盒', '导入日志', '快照', '处理记录', '看板状态'
+    ]
+    assert sorted((e.equipment_type, e.store_id) for e in session.query(EquipmentStatus)) == [
+        ('POS', 'S0'), ('POS', 'S1'), ('机顶盒', 'S2')
+    ]
+    snapshots = {(s.store_id, s.has_abnormal) for s in session.query(EquipmentStatusSnapshot)}
+    assert snapshots == {('S0', 1), ('S1', 1), ('S2', 0), ('S3', 0), ('S4', 0), ('S5', 0)}
+    assert session.query(EquipmentImportLog).one().import_type == '全部'
+    assert get_data_version(session, EquipmentStatus.__tablename__) > 0
+
+
+def test_run_takes_import_lock_before_reading(session, tmp_path, monkeypatch):
+    """测试导入在读取数据前获取导入锁（与其他导入依次执行）"""
+    calls = []
+    monkeypatch.setattr(equipment_import, 'advisory_xact_lock', lambda s, name: calls.append(name) or False)
+    operating_file, pos_file, _ = _write_files(tmp_path, ['S0'], [])
+    pipeline = EquipmentImportPipeline(session, operating_file, pos_file=pos_file)
+    load_operating_stores = pipeline.load_operating_stores
+
+    def load_after_lock():
+        assert calls == [IMPORT_LOCK_NAME]
+        return load_operating_stores()
+
+    pipeline.load_operating_stores = load_after_lock
+    assert pipeline.run().success
+    assert calls[0] == IMPORT_LOCK_NAME
+
+
+def test_failed_stage_rolls_back_whole_import(session, tmp_path):
+    """测试机顶盒阶段失败时，已执行的收银设备阶段一起回滚"""
+    session.add(EquipmentStatus(store_id='S5', equipment_type='POS', is_open_at_data_time=1))
+    session.commit()
+    operating_file, pos_file, stb_file = _write_files(tmp_path, ['S0'], ['S2'], stb_columns=['设备编码', '名称'])
+
+    result = EquipmentImportPipeline(session, operating_file, pos_file=pos_file, stb_file=stb_file).run()
+
+    assert not result.success
+    assert '状态' in result.error_message
+    assert [e.store_id for e in session.query(EquipmentStatus)] == ['S5']
+    assert session.query(EquipmentStatusSnapshot).count() == 0
+    assert session.query(EquipmentImportLog).count() == 0
+
+
+def test_optional_stage_failure_rolls_back_only_that_stage(session, tmp_path):
+    """测试可选阶段在保存点中执行，失败只回滚该阶段"""
+    operating_file, pos_file, _ = _write_files(tmp_path, ['S0'], [])
+    pipeline = EquipmentImportPipeline(session, operating_file, pos_file=pos_file)
+
+    def failing_auto_recover(snapshot):
+        session.add(EquipmentProcessing(store_id='S0', equipment_type='POS', action='已恢复'))
+        session.flush()
+        raise RuntimeError('boom')
+
+    pipeline.auto_recover = failing_auto_recover
+    result = pipeline.run()
+
+    assert result.success
+    assert result.failed_steps == ['处理记录']
+    assert session.query(EquipmentProcessing).count() == 0
+    assert [e.store_id for e in session.query(EquipmentStatus)] == ['S0']
+    assert session.query(EquipmentStatusSnapshot).filter_by(has_abnormal=1).count() == 1
+
+
+def test_commit_failure_rolls_back_and_reports_failure(session, tmp_path, monkeypatch):
+    """测试最后提交失败时回滚，返回失败结果而不是抛出异常"""
+    operating_file, pos_file, _ = _write_files(tmp_path, ['S0'], [])
+
+    def failing_commit():
+        raise RuntimeError('connection lost')
+
+    monkeypatch.setattr(session, 'commit', failing_commit)
+    result = EquipmentImportPipeline(session, operating_file, pos_file=pos_file).run()
+    monkeypatch.undo()
+
+    assert not result.success
+    assert result.error_message == 'connection lost'
+    assert session.query(EquipmentStatus).count() == 0
+    assert session.query(EquipmentImportLog).count() == 0
+
+
+def test_upload_equipment_requires_token_and_imports_in_background(tmp_path, monkeypatch):
+    """测试上传接口需要令牌，导入交给独立进程中的导入脚本执行，通过状态接口查询结果"""
+    database_url = f'sqlite:///{tmp_path / "equipment.db"}'
+    engine = create_engine(database_url, echo=False)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(StoreWhitelist(store_id='S0', store_name='门店0'))
+    session.commit()
+    session.close()
+    engine.dispose()
+
+    # 导入进程继承环境变量，连接同一个测试库
+    monkeypatch.setenv('DATABASE_URL', database_url)
+    monkeypatch.setitem(app_module.app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    operating_file, pos_file, _ = _write_files(tmp_path, ['S0'], [])
+    client = app_module.app.test_client()
+
+    def upload(headers, **files):
+        data = {name: (BytesIO(path.read_bytes()), path.name) for name, path in files.items()}
+        return client.post('/api/upload/equipment', data=data, headers=headers, content_type='multipart/form-data')
+
+    # 服务器未配置令牌时接口不可用
+    monkeypatch.delenv('EQUIPMENT_UPLOAD_TOKEN', raising=False)
+    assert upload({'X-Upload-Token': ''}, operating_file=operating_file, pos_file=pos_file).status_code == 403
+    monkeypatch.setenv('EQUIPMENT_UPLOAD_TOKEN', 'secret')
+    assert upload({'X-Upload-Token': 'wrong'}, operating_file=operating_file, pos_file=pos_file).status_code == 403
+
+    headers = {'X-Upload-Token': 'secret'}
+    assert upload(headers, pos_file=pos_file).status_code == 400
+    response = upload(headers, operating_file=operating_file, pos_file=pos_file)
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+
+    status = {'status': 'running'}
+    deadline = time.monotonic() + 60
+    while status['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.2)
+        status = client.get(f'/api/upload/equipment/{job_id}', headers=headers).get_json()['data']
+    assert status['status'] == 'success', (tmp_path / job_id / 'import.log').read_text(encoding='utf-8')
+    assert status['pos_count'] == 1 and status['stb_count'] is None
+    # 上传的文件导入后删除，只保留状态和日志
+    assert sorted(os.listdir(tmp_path / job_id)) == ['import.log', 'status.json']
+
+    assert client.get(f'/api/upload/equipment/{job_id}').status_code == 403
+    assert client.get('/api/upload/equipment/..', headers=headers).status_code == 404
@@ -0,0 +1,158 @@
+"""
+设备异常监控工具函数测试
+Equipment Monitoring Utility Tests
+"""
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from shared.database_models import Base, EquipmentStatusSnapshot, EquipmentProcessing, bulk_insert, _copy_text_value
+import equipment_utils
+
+
+@pytest.fixture
+def session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _snapshot(store_id, days_ago, period, hour=None):
+    """生成days_ago天前的异常快照"""
+    snapshot_date = datetime.combine(date.today() - timedelta(days=days_ago), datetime.min.time())
+    snapshot_date += timedelta(hours=hour if hour is not None else (10 if period == 'AM' else 17))
+    return EquipmentStatusSnapshot(
+        snapshot_date=snapshot_date, snapshot_period=period, store_id=store_id,
+        equipment_type='POS', has_abnormal=1
+    )
+
+
+def _processing(store_id, days_ago, action):
+    processed_at = datetime.combine(date.today() - timedelta(days=days_ago), datetime.min.time()) + timedelta(hours=11)
+    return EquipmentProcessing(store_id=store_id, equipment_type='POS', action=action, processed_at=processed_at)
+
+
+def _add_scenarios(session):
+    """各判定分支的门店"""
+    session.add_all([
+        # 当天反复
+        _snapshot('S1', 0, 'AM'), _snapshot('S1', 0, 'PM'), _processing('S1', 0, '已恢复'),
+        # 今天未处理，历史上有未处理日期
+        _snapshot('S2', 0, 'AM'), _snapshot('S2', 0, 'PM'),
+        _snapshot('S2', 2, 'AM'), _snapshot('S2', 2, 'PM'),
+        _snapshot('S2', 3, 'AM'), _snapshot('S2', 3, 'PM'), _processing('S2', 3, '已恢复'),
+        _snapshot('S2', 12, 'AM'), _snapshot('S2', 12, 'PM'),
+        # 5天内3次
+        _snapshot('S3', 1, 'AM'), _snapshot('S3', 1, 'PM'), _snapshot('S3', 4, 'AM'), _snapshot('S3', 8, 'PM'),
+        # 10天内4次（5天内不足3次）
+        _snapshot('S4', 1, 'AM'), _snapshot('S4', 7, 'PM'), _snapshot('S4', 8, 'AM'), _snapshot('S4', 10, 'PM'),
+        # 今天标记"未恢复"
+        _snapshot('S5', 0, 'AM'), _snapshot('S5', 0, 'PM'), _processing('S5', 0, '未恢复'),
+    ])
+    session.commit()
+    return ['S1', 'S2', 'S3', 'S4', 'S5', 'S6']
+
+
+@pytest.mark.parametrize('multi_day', [False, True])
+@pytest.mark.parametrize('unprocessed_check', [False, True])
+def test_batch_matches_per_store(session, monkeypatch, multi_day, unprocessed_check):
+    """测试批量计算与逐个调用is_chronic_store()结果一致"""
+    monkeypatch.setattr(equipment_utils, 'ENABLE_MULTI_DAY_CHRONIC', multi_day)
+    monkeypatch.setattr(equipment_utils, 'ENABLE_UNPROCESSED_CHECK', unprocessed_check)
+    store_ids = _add_scenarios(session)
+
+    expected = {store_id: equipment_utils.is_chronic_store(session, store_id, 'POS') for store_id in store_ids}
+    assert equipment_utils.evaluate_chronic_stores(session, store_ids) == expected
+
+    assert expected['S1'] == (True, '当日反复', {'today_repeat': 1})
+    if unprocessed_check:
+        assert expected['S2'][2]['unprocessed_dates'] == [
+            (date.today() - timedelta(days=days)).strftime('%m-%d') for days in (0, 2)
+        ]
+    if multi_day:
+        assert expected['S3'][1] == '多次出问题（5天3次）'
+        assert expected['S4'][1] == '多次出问题（10天4次）'
+
+
+def test_calculate_chronic_stats_fixed_queries(session, monkeypatch):
+    """测试批量统计的SQL语句数量与门店数无关"""
+    monkeypatch.setattr(equipment_utils, 'ENABLE_MULTI_DAY_CHRONIC', True)
+    store_ids = _add_scenarios(session)
+
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    stats = equipment_utils.calculate_chronic_stats(session, store_ids)
+
+    assert len(statements) == 2
+    assert stats['S3'] == {
+        'is_chronic': True, 'chronic_reason': '多次出问题（5天3次）',
+        'abnormal_count_5days': 3, 'abnormal_count_10days': 4
+    }
+    assert stats['S6']['is_chronic'] is False
+    assert equipment_utils.calculate_chronic_stats(session, []) == {}
+
+
+def test_active_suppressions_match_should_suppress(session):
+    """测试批量查询暂时不提示与逐个调用should_suppress()结果一致，只取最新一条记录"""
+    today = datetime.combine(date.today(), datetime.min.time())
+
+    def record(store_id, equipment_type, days_ago, suppressed_days, expected=None):
+        return EquipmentProcessing(
+            store_id=store_id, equipment_type=equipment_type, action='未恢复',
+            processed_at=today - timedelta(days=days_ago) + timedelta(hours=9),
+            suppressed_until=today + timedelta(days=suppressed_days) if suppressed_days is not None else None,
+            expected_recovery_date=expected
+        )
+
+    session.add_all([
+        record('T1', 'POS', 1, 3, expected=today + timedelta(days=3)),
+        record('T2', 'POS', 3, 5), record('T2', 'POS', 1, -1),   # 最新一条已过期
+        record('T3', 'POS', 1, -2), record('T3', 'POS', 0, 0),   # 最新一条今天到期，仍不提示
+        record('T4', 'POS', 0, None),
+        record('T1', '机顶盒', 0, 2),
+    ])
+    session.commit()
+    store_ids = ['T1', 'T2', 'T3', 'T4', 'T5']
+
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    suppressed = equipment_utils.get_suppressed_store_ids(session, store_ids, 'POS')
+    assert len(statements) == 1
+
+    assert suppressed == {s for s in store_ids if equipment_utils.should_suppress(session, s, 'POS')}
+    assert suppressed == {'T1', 'T3'}
+
+    suppressions = equipment_utils.get_active_suppressions(session)
+    assert suppressions == {
+        ('T1', 'POS'): today + timedelta(days=3), ('T3', 'POS'): None, ('T1', '机顶盒'): None
+    }
+    assert equipment_utils.get_suppressed_store_ids(session, [], 'POS') == set()
+
+
+def test_bulk_insert_single_statement_with_model_defaults(session):
+    """测试批量写入只执行一条INSERT，缺少的列使用模型默认值，不提交事务"""
+    statements = []
+    event.listen(session.get_bind(), 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    rows = [{'snapshot_date': datetime(2026, 3, 6, 9, 30), 'snapshot_period': 'AM',
+             'store_id': f'S{i}', 'equipment_type': 'POS'} for i in range(50)]
+    assert bulk_insert(session, EquipmentStatusSnapshot, rows) == 50
+    assert bulk_insert(session, EquipmentStatusSnapshot, []) == 0
+    assert sum(statement.startswith('INSERT') for statement in statements) == 1
+
+    snapshots = session.query(EquipmentStatusSnapshot).all()
+    assert len(snapshots) == 50
+    assert all(s.has_abnormal == 0 and s.created_at is not None for s in snapshots)
+    session.rollback()
+    assert session.query(EquipmentStatusSnapshot).count() == 0
+
+
+def test_copy_text_value_escaping():
+    """测试COPY文本格式转义"""
+    assert _copy_text_value(None) == '\\N'
+    assert _copy_text_value(datetime(2026, 3, 6, 9, 30)) == '2026-03-06 09:30:00'
+    assert _copy_text_value('a\tb\nc\\d') == 'a\\tb\\nc\\\\d'
+    assert _copy_text_value(1) == '1'
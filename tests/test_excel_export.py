@@ -0,0 +1,50 @@
+"""
+Excel导出模块测试
+Excel Export Engine Tests
+"""
+import os
+from io import BytesIO
+import pandas as pd
+from flask import Flask
+from openpyxl import load_workbook
+from viewer.excel_export import column_widths, records_frame, xlsx_response
+
+
+def test_column_widths_count_wide_characters():
+    """测试列宽：非ASCII字符按2个字符计算，包含表头，空值按空字符串，超过上限截断"""
+    df = pd.DataFrame({
+        'ID': ['S1', 'S100'],
+        '门店名称': ['牛约堡', None],
+        'note': ['x' * 100, ''],
+    })
+    assert column_widths(df) == [6, 10, 40]
+    assert column_widths(df.iloc[0:0]) == [4, 10, 6]
+
+
+def test_xlsx_response_round_trip():
+    """测试导出文件内容与列宽，响应结束后删除临时文件"""
+    app = Flask(__name__)
+    records = [
+        {'门店ID': 'S1', '门店名称': '门店1', '评级': 'A', '次数': 3},
+        {'门店ID': 'S2', '门店名称': None, '评级': 'B', '次数': 0},
+    ]
+    df = records_frame(records, ['门店ID', '门店名称', '次数'])
+
+    with app.test_request_context():
+        response = xlsx_response(df, '测试', '测试导出', widths=[10, 20, 8])
+        response.direct_passthrough = False
+        path = response.response.file.name
+        data = response.get_data()
+        response.close()
+
+    assert not os.path.exists(path)
+    assert response.headers['Content-Disposition'].startswith('attachment')
+
+    ws = load_workbook(BytesIO(data))['测试']
+    assert list(ws.iter_rows(values_only=True)) == [
+        ('门店ID', '门店名称', '次数'),
+        ('S1', '门店1', 3),
+        ('S2', None, 0),
+    ]
+    assert ws['A1'].font.bold
+    assert ws.column_dimensions['B'].width == 20
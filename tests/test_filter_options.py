@@ -0,0 +1,100 @@
+"""
+筛选选项快照测试
+Filter Options Snapshot Tests
+"""
+import os
+import tempfile
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+from viewer.data_importer import DataImporter
+from viewer.filter_options import FilterOptionsCache
+from shared.database_models import Base, StoreWhitelist, FilterOptionsSnapshot, bump_data_version
+import viewer.app_viewer as app_module
+
+
+def _import_whitelist(session, rows):
+    """写入临时Excel并导入白名单"""
+    with tempfile.NamedTemporaryFile(mode='wb', suffix='.xlsx', delete=False) as tmp:
+        path = tmp.name
+    try:
+        pd.DataFrame(rows).to_excel(path, index=False)
+        result = DataImporter(session).import_whitelist(path)
+        assert result.success is True
+    finally:
+        os.unlink(path)
+
+
+def _store(store_id, war_zone, province, city, operator, temp_operator=None):
+    return {
+        '门店ID': store_id, '门店名称': f'门店{store_id}', '战区': war_zone, '省份': province,
+        '城市': city, '门店标签': 'A类', '省市运营': operator, '临时运营': temp_operator
+    }
+
+
+def _make_session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    return engine, scoped_session(sessionmaker(bind=engine))
+
+
+def test_filters_api_served_from_snapshot():
+    """测试导入白名单生成快照，/api/filters及级联接口读取同一份数据"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        _import_whitelist(session, [
+            _store(1001, '华东', '浙江', '杭州', '张三', temp_operator='王五'),
+            _store(1002, '华东', '上海', '上海', '张三'),
+            _store(1003, '华南', '广东', '深圳', '李四'),
+        ])
+        assert session.query(FilterOptionsSnapshot).count() == 1
+
+        client = app_module.app.test_client()
+        data = client.get('/api/filters').get_json()['data']
+        assert data['war_zones'] == sorted(['华东', '华南'])
+        assert data['operators'] == sorted(['王五', '张三', '李四'])
+        assert data['review_results'] == ['合格', '不合格']
+
+        provinces = client.get('/api/filters/provinces?war_zone=华东').get_json()['data']['provinces']
+        assert provinces == sorted(['浙江', '上海'])
+        cities = client.get('/api/filters/cities?province=广东').get_json()['data']['cities']
+        assert cities == ['深圳']
+        assert client.get('/api/filters/cities').status_code == 400
+
+        # 重新导入后版本号变化，接口返回新数据
+        _import_whitelist(session, [_store(1004, '华北', '北京', '北京', '赵六')])
+        data = client.get('/api/filters').get_json()['data']
+        assert data['war_zones'] == ['华北']
+        assert data['operators'] == ['赵六']
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_cache_rebuilds_stale_snapshot():
+    """测试白名单被其他途径修改（只递增版本号、未生成快照）时在内存中重新计算，不写快照"""
+    engine, SessionFactory = _make_session()
+    session = SessionFactory()
+
+    try:
+        _import_whitelist(session, [_store(1001, '华东', '浙江', '杭州', '张三')])
+        cache = FilterOptionsCache()
+        assert cache.get(session)['cities'] == ['杭州']
+
+        session.add(StoreWhitelist(store_id='1002', war_zone='华东', province='浙江', city='宁波'))
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+
+        options = cache.get(session)
+        assert options['cities_by_province']['浙江'] == sorted(['杭州', '宁波'])
+        assert session.query(FilterOptionsSnapshot).one().version == 1
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
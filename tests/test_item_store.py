@@ -0,0 +1,136 @@
+"""
+检查项内存索引测试
+Item Store Tests
+"""
+import pandas as pd
+import pytest
+from item_store import ItemStore
+from data_loader import DataLoader
+
+
+def _make_items():
+    """构造测试用检查项"""
+    return [
+        {'id': '7_门店餐桌区', '门店编号': '7', '检查项名称': '门店餐桌区', '负责运营': '张三'},
+        {'id': '7_门店厨房', '门店编号': '7', '检查项名称': '门店厨房', '负责运营': '张三'},
+        {'id': '8_门店厨房', '门店编号': '8', '检查项名称': '门店厨房', '负责运营': '李四'},
+        {'id': '9_门店卫生间', '门店编号': '9', '检查项名称': '门店卫生间', '负责运营': '未分配'},
+    ]
+
+
+def test_empty_store():
+    """测试空存储"""
+    store = ItemStore()
+    assert len(store) == 0
+    assert not store
+    assert store.get('7_门店餐桌区') is None
+    assert store.get_by_operator('张三') == []
+    assert store.get_store_groups() == {}
+
+
+def test_get_by_id():
+    """测试按检查项ID查找"""
+    store = ItemStore(_make_items())
+    assert len(store) == 4
+    assert store.get('8_门店厨房')['门店编号'] == '8'
+    assert store.get('nonexistent') is None
+
+
+def test_get_by_store():
+    """测试按门店编号查找"""
+    store = ItemStore(_make_items())
+    assert [item['id'] for item in store.get_by_store('7')] == ['7_门店餐桌区', '7_门店厨房']
+    assert store.get_by_store('100') == []
+
+
+def test_get_by_operator():
+    """测试按运营人员筛选"""
+    items = _make_items()
+    store = ItemStore(items)
+    assert [item['id'] for item in store.get_by_operator('张三')] == ['7_门店餐桌区', '7_门店厨房']
+    assert store.get_by_operator('全部') is items
+    assert store.get_by_operator('') is items
+    assert store.get_by_operator('王五') == []
+
+
+def test_get_store_groups():
+    """测试按门店分组"""
+    store = ItemStore(_make_items())
+    groups = store.get_store_groups()
+    assert list(groups.keys()) == ['7', '8', '9']
+    assert len(groups['7']) == 2
+
+    groups = store.get_store_groups('李四')
+    assert list(groups.keys()) == ['8']
+
+
+def test_data_loader_builds_item_store():
+    """测试DataLoader转换数据时建立索引"""
+    loader = DataLoader('test.xlsx')
+    loader.df = pd.DataFrame([
+        {'检查项名称': '门店餐桌区', '门店名称': '测试门店', '门店编号': 7, '所属区域': '上海'},
+        {'检查项名称': '门店厨房', '门店名称': '测试门店', '门店编号': 7, '所属区域': '上海'},
+    ])
+    data = loader.transform_data()
+
+    assert loader.item_store.items is data
+    assert loader.item_store.get('7_门店厨房')['门店名称'] == '测试门店'
+    assert len(loader.filter_by_operator('未分配')) == 2
+
+
+def _make_paged_store():
+    """五个门店（编号乱序），每店两项"""
+    items = []
+    for store_id in ['12', '3', '7', '100', '5']:
+        for name, category in (('门店厨房', '周清'), ('门店餐桌区', '日清')):
+            items.append({
+                'id': f'{store_id}_{name}', '门店编号': store_id, '检查项名称': name,
+                '检查项分类': category, '负责运营': '张三' if store_id != '7' else '李四'
+            })
+    return ItemStore(items)
+
+
+def test_get_sorted():
+    """测试排序结果在建立索引时生成，与按门店编号排序一致"""
+    store = _make_paged_store()
+    expected = sorted(store.items, key=lambda x: int(x['门店编号']))
+    assert store.get_sorted() == expected
+    assert store.get_sorted('张三') == [item for item in expected if item['负责运营'] == '张三']
+
+
+def test_get_store_page_cursor():
+    """测试按门店分页，游标翻页覆盖全部门店"""
+    store = _make_paged_store()
+
+    items, cursor = store.get_store_page(limit=2)
+    assert [item['门店编号'] for item in items] == ['3', '3', '5', '5']
+    assert cursor == '5'
+
+    items, cursor = store.get_store_page(after_store=cursor, limit=2)
+    assert [item['门店编号'] for item in items] == ['7', '7', '12', '12']
+
+    items, cursor = store.get_store_page(after_store=cursor, limit=2)
+    assert [item['门店编号'] for item in items] == ['100', '100']
+    assert cursor is None
+
+
+def test_get_store_page_filters():
+    """测试按运营、分类、审核状态筛选，没有匹配项的门店不占页"""
+    store = _make_paged_store()
+    reviewed_ids = {'3_门店厨房', '3_门店餐桌区', '5_门店厨房'}
+
+    items, cursor = store.get_store_page(
+        operator='张三', limit=2, category='周清', reviewed=False, reviewed_ids=reviewed_ids
+    )
+    assert [item['id'] for item in items] == ['12_门店厨房', '100_门店厨房']
+    assert cursor is None
+
+    items, _ = store.get_store_page(reviewed=True, reviewed_ids=reviewed_ids)
+    assert [item['id'] for item in items] == ['3_门店厨房', '3_门店餐桌区', '5_门店厨房']
+
+
+def test_get_store_page_invalid_cursor():
+    """测试无效游标"""
+    store = _make_paged_store()
+    with pytest.raises(ValueError):
+        store.get_store_page(operator='李四', after_store='3')
@@ -0,0 +1,58 @@
+"""
+JSON响应缓存测试
+JSON Response Cache Tests
+"""
+import gzip
+import json
+from flask import Flask
+from json_cache import CachedJson, JsonResponseCache
+
+
+app = Flask(__name__)
+DATA = [{'id': '7_门店厨房', '门店编号': '7'}]
+
+
+def test_gzip_response_with_etag():
+    """测试支持gzip的客户端收到压缩内容和强ETag"""
+    cached = CachedJson(DATA)
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate'}):
+        response = cached.to_response()
+
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == f'"{cached.gzip_etag}"'
+    assert json.loads(gzip.decompress(response.get_data())) == DATA
+
+
+def test_identity_response():
+    """测试不支持gzip的客户端收到未压缩内容"""
+    cached = CachedJson(DATA)
+    with app.test_request_context():
+        response = cached.to_response()
+
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == f'"{cached.etag}"'
+    assert json.loads(response.get_data()) == DATA
+
+
+def test_if_none_match_returns_304():
+    """测试ETag匹配时返回304且无响应体"""
+    cached = CachedJson(DATA)
+    headers = {'Accept-Encoding': 'gzip', 'If-None-Match': f'"{cached.gzip_etag}"'}
+    with app.test_request_context(headers=headers):
+        response = cached.to_response()
+
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert 'no-store' not in response.headers['Cache-Control']
+
+
+def test_cache_keys_and_stable_etag():
+    """测试相同内容ETag一致，内容变化ETag变化"""
+    cache = JsonResponseCache()
+    first = cache.put('张三', DATA)
+
+    assert cache.get('张三') is first
+    assert cache.get('李四') is None
+    assert CachedJson(DATA).etag == first.etag
+    assert CachedJson(DATA + DATA).etag != first.etag
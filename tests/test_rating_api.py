@@ -0,0 +1,160 @@
+"""
+门店评级接口测试
+Store Rating API Tests
+"""
+from datetime import datetime, timedelta
+from io import BytesIO
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, scoped_session
+from shared.database_models import (
+    Base, StoreWhitelist, StoreRating, StoreCurrentRating, StoreOperationData, rebuild_current_ratings
+)
+import viewer.app_viewer as app_module
+
+
+def _make_session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    return engine, scoped_session(sessionmaker(bind=engine))
+
+
+def _export_rows(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    return list(load_workbook(BytesIO(response.get_data())).active.iter_rows(values_only=True))
+
+
+def test_rating_stores_fixed_query_count():
+    """测试门店列表返回最新评级和经营数据，SQL语句数量与每页门店数无关"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    try:
+        now = datetime.now()
+        for i in range(12):
+            store_id = f'R{i:02d}'
+            session.add(StoreWhitelist(store_id=store_id, store_name=f'门店{i}', war_zone='华东'))
+            if i % 2 == 0:
+                session.add(StoreOperationData(store_id=store_id, dine_in_revenue=str(i * 100)))
+            if i % 3 == 0:
+                session.add(StoreRating(store_id=store_id, rating='C', rated_at=now - timedelta(days=1)))
+                session.add(StoreRating(store_id=store_id, rating='A', rated_at=now))
+        session.commit()
+        assert rebuild_current_ratings(session) == 4
+        session.commit()
+        client = app_module.app.test_client()
+
+        counts = []
+        for per_page in (2, 10):
+            statements.clear()
+            data = client.get(f'/api/rating/stores?war_zone=华东&per_page={per_page}').get_json()['data']
+            counts.append(len(statements))
+            assert len(data['stores']) == per_page
+            assert data['total'] == 12
+
+        assert counts[0] == counts[1]
+
+        stores = {s['store_id']: s for s in data['stores']}
+        assert stores['R00']['current_rating'] == 'A'
+        assert stores['R00']['dine_in_revenue'] == '0'
+        assert stores['R01']['current_rating'] is None
+        assert stores['R01']['dine_in_revenue'] is None
+        assert stores['R03']['current_rating'] == 'A'
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_submit_rating_updates_current_rating():
+    """测试提交评级同时更新当前评级，导出默认为当前评级、history=1为全部历史"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        session.add_all([
+            StoreWhitelist(store_id='R01', store_name='门店1', war_zone='华东'),
+            StoreWhitelist(store_id='R02', store_name='门店2', war_zone='华南'),
+        ])
+        session.commit()
+        client = app_module.app.test_client()
+
+        statements = []
+        event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        for store_id, rating in (('R01', 'C'), ('R01', 'B'), ('R02', 'A')):
+            assert client.post('/api/rating/submit', json={'store_id': store_id, 'rating': rating}).status_code == 200
+        # 当前评级用一条INSERT ... ON CONFLICT写入（并发的首次评级不会主键冲突）
+        upserts = [sql for sql in statements if 'store_current_rating' in sql]
+        assert len(upserts) == 3 and all('ON CONFLICT' in sql for sql in upserts)
+
+        current = {r.store_id: r.rating for r in session.query(StoreCurrentRating).all()}
+        assert current == {'R01': 'B', 'R02': 'A'}
+
+        stats = client.get('/api/rating/completion-stats?war_zone=华东').get_json()['data']['stats']
+        assert stats == [{'war_zone': '华东', 'total_stores': 1, 'rated_stores': 1, 'completion_rate': 100.0}]
+
+        rows = _export_rows(client, '/api/rating/export')
+        assert len(rows) == 3 and rows[1][0] == 'R01' and rows[1][5] == 'B'
+        rows = _export_rows(client, '/api/rating/export?history=1')
+        assert len(rows) == 4 and rows[0][-1] == '评级人'
+
+        # 回填结果与提交时维护的一致
+        assert rebuild_current_ratings(session) == 2
+        session.commit()
+        assert {r.store_id: r.rating for r in session.query(StoreCurrentRating).all()} == current
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_completion_stats_grouped_and_cached():
+    """测试完成率统计一条查询按战区分组，结果缓存，提交评级后失效"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    try:
+        session.add_all([
+            StoreWhitelist(store_id='R01', war_zone='华东'),
+            StoreWhitelist(store_id='R02', war_zone='华东'),
+            StoreWhitelist(store_id='R03', war_zone=''),
+            StoreWhitelist(store_id='R04', war_zone=None),
+        ])
+        session.commit()
+        client = app_module.app.test_client()
+
+        statements.clear()
+        stats = client.get('/api/rating/completion-stats').get_json()['data']['stats']
+        assert len(statements) == 1
+        assert stats == [
+            {'war_zone': '华东', 'total_stores': 2, 'rated_stores': 0, 'completion_rate': 0},
+            {'war_zone': '未知战区', 'total_stores': 2, 'rated_stores': 0, 'completion_rate': 0},
+        ]
+
+        statements.clear()
+        client.get('/api/rating/completion-stats')
+        assert statements == []
+
+        client.post('/api/rating/submit', json={'store_id': 'R01', 'rating': 'A'})
+        stats = client.get('/api/rating/completion-stats').get_json()['data']['stats']
+        assert stats[0] == {'war_zone': '华东', 'total_stores': 2, 'rated_stores': 1, 'completion_rate': 50.0}
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
@@ -173,3 +173,44 @@ class TestReviewManager:
         # 应该是最新的结果
         review = self.manager.get_review(item_id)
         assert review['审核结果'] == '不合格'
+    
+    def test_save_reviews_bulk_inserts_and_updates(self):
+        """测试批量保存：新记录插入，已有记录按item_id覆盖"""
+        self.manager.save_review('8_门店厨房', self.sample_review_data)
+        
+        failed_data = self.sample_review_data.copy()
+        failed_data['审核结果'] = '不合格'
+        failed_data['问题描述'] = '地面油污'
+        
+        result = self.manager.save_reviews_bulk({
+            '8_门店厨房': failed_data,
+            '8_门店卫生间': self.sample_review_data,
+        })
+        
+        assert result is True
+        kitchen = self.manager.get_review('8_门店厨房')
+        assert kitchen['审核结果'] == '不合格'
+        assert kitchen['问题描述'] == '地面油污'
+        assert self.manager.get_review('8_门店卫生间')['审核结果'] == '合格'
+    
+    def test_save_reviews_bulk_empty(self):
+        """测试批量保存空数据"""
+        assert self.manager.save_reviews_bulk({}) is True
+    
+    def test_save_reviews_bulk_keeps_existing_without_overwrite(self):
+        """测试overwrite=False时不覆盖已有审核结果"""
+        self.manager.save_review('10_门店厨房', self.sample_review_data)
+        
+        auto_data = self.sample_review_data.copy()
+        auto_data['审核结果'] = '不合格'
+        auto_data['问题描述'] = '无现场结果'
+        
+        result = self.manager.save_reviews_bulk(
+            {'10_门店厨房': auto_data, '10_门店卫生间': auto_data},
+            overwrite=False
+        )
+        
+        assert result is True
+        assert self.manager.get_review('10_门店厨房')['审核结果'] == '合格'
+        assert self.manager.get_review('10_门店卫生间')['问题描述'] == '无现场结果'
+        assert {'10_门店厨房', '10_门店卫生间'} <= self.manager.get_reviewed_item_ids()
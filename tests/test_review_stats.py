@@ -0,0 +1,77 @@
+"""
+审核完成度统计测试
+Review Stats Tests
+"""
+from item_store import ItemStore
+from review_stats import ReviewStats
+
+
+class FakeReviewManager:
+    """记录查询次数的审核管理器"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.calls = 0
+
+    def get_review_statuses(self):
+        self.calls += 1
+        return dict(self.statuses)
+
+
+def _make_store():
+    """两个运营、三个门店"""
+    return ItemStore([
+        {'id': '7_餐桌区', '门店编号': '7', '负责运营': '张三'},
+        {'id': '7_厨房', '门店编号': '7', '负责运营': '张三'},
+        {'id': '8_厨房', '门店编号': '8', '负责运营': '张三'},
+        {'id': '9_厨房', '门店编号': '9', '负责运营': '李四'},
+    ])
+
+
+def test_store_completion_rules():
+    """测试门店完成判定：全部审核且不合格有问题描述"""
+    manager = FakeReviewManager({
+        '7_餐桌区': {'审核结果': '合格', '问题描述': ''},
+        '7_厨房': {'审核结果': '不合格', '问题描述': '地面油污'},
+        '8_厨房': {'审核结果': '不合格', '问题描述': '  '},
+        '9_厨房': {'审核结果': '合格', '问题描述': ''},
+    })
+    stats = ReviewStats(manager)
+
+    assert stats.get_stats(_make_store()) == {'total': 3, 'reviewed': 2, 'percentage': 66.7}
+
+
+def test_unreviewed_store_not_completed():
+    """测试未审核完的门店不计入完成"""
+    manager = FakeReviewManager({'7_餐桌区': {'审核结果': '合格', '问题描述': ''}})
+    stats = ReviewStats(manager)
+
+    assert stats.get_stats(_make_store(), '张三') == {'total': 2, 'reviewed': 0, 'percentage': 0}
+
+
+def test_single_query_shared_across_operators():
+    """测试多个运营人员的统计共用一次查询，失效后重新查询"""
+    manager = FakeReviewManager({'9_厨房': {'审核结果': '合格', '问题描述': ''}})
+    stats = ReviewStats(manager)
+    store = _make_store()
+
+    assert stats.get_stats(store, '李四')['reviewed'] == 1
+    assert stats.get_stats(store, '张三')['reviewed'] == 0
+    assert stats.get_stats(store)['total'] == 3
+    assert manager.calls == 1
+
+    manager.statuses['8_厨房'] = {'审核结果': '合格', '问题描述': ''}
+    assert stats.get_stats(store, '张三')['reviewed'] == 0
+    stats.invalidate()
+    assert stats.get_stats(store, '张三')['reviewed'] == 1
+    assert manager.calls == 2
+
+
+def test_new_cycle_resets_cache():
+    """测试切换周期（新的检查项索引）后重新计算"""
+    manager = FakeReviewManager({})
+    stats = ReviewStats(manager)
+
+    assert stats.get_stats(_make_store())['total'] == 3
+    assert stats.get_stats(ItemStore())['total'] == 0
+    assert manager.calls == 2
@@ -0,0 +1,71 @@
+"""
+审核结果搜索接口测试
+Review Search API Tests
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+from shared.database_models import Base, ViewerReviewResult, bump_data_version
+import viewer.app_viewer as app_module
+
+
+def _add_reviews(session, store_ids, result='不合格'):
+    """每个门店写入两条审核结果"""
+    for store_id in store_ids:
+        for item_name in ('门头', '后厨'):
+            session.add(ViewerReviewResult(
+                store_id=store_id, store_name=f'门店{store_id}', war_zone='华东',
+                province='浙江', city='杭州', item_name=item_name, review_result=result
+            ))
+    bump_data_version(session, ViewerReviewResult.__tablename__)
+    session.commit()
+
+
+def _make_session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    return engine, scoped_session(sessionmaker(bind=engine))
+
+
+def test_search_cursor_pagination():
+    """测试游标分页与偏移分页结果一致，总数缓存随版本号失效"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        _add_reviews(session, [f'S{i:02d}' for i in range(5)])
+        _add_reviews(session, ['S99'], result='合格')
+        client = app_module.app.test_client()
+
+        pages, cursor = [], ''
+        while cursor is not None:
+            data = client.get(f'/api/search?per_page=2&cursor={cursor}').get_json()['data']
+            assert data['total_stores'] == 5
+            assert data['total_pages'] == 3
+            pages.append(data['stores'])
+            cursor = data['next_cursor']
+            assert data['has_more'] is (cursor is not None)
+
+        assert [[s['store_id'] for s in page] for page in pages] == [['S00', 'S01'], ['S02', 'S03'], ['S04']]
+        assert all(len(s['items']) == 2 for page in pages for s in page)
+
+        offset_page = client.get('/api/search?per_page=2&page=2').get_json()['data']
+        assert offset_page['stores'] == pages[1]
+
+        data = client.get('/api/search?cursor=&store_search=S03').get_json()['data']
+        assert [s['store_id'] for s in data['stores']] == ['S03']
+        assert data['total_stores'] == 1 and data['next_cursor'] is None
+
+        # 未递增版本号时总数来自缓存，递增后重新统计
+        session.add(ViewerReviewResult(store_id='S50', store_name='门店S50', item_name='门头', review_result='不合格'))
+        session.commit()
+        assert client.get('/api/search?cursor=').get_json()['data']['total_stores'] == 5
+        bump_data_version(session, ViewerReviewResult.__tablename__)
+        session.commit()
+        assert client.get('/api/search?cursor=').get_json()['data']['total_stores'] == 6
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
@@ -0,0 +1,151 @@
+"""
+门店搜索服务测试
+Store Search Service Tests
+"""
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker, scoped_session
+from shared.database_models import Base, StoreWhitelist, PromoParticipation, ViewerReviewResult, bump_data_version
+from viewer.store_search import NgramIndex, StoreSearchService, TRGM_MIN_TERM_LENGTH
+import viewer.app_viewer as app_module
+
+
+def _make_session():
+    engine = create_engine('sqlite:///:memory:', echo=False)
+    Base.metadata.create_all(engine)
+    return engine, scoped_session(sessionmaker(bind=engine))
+
+
+def test_ngram_index_search():
+    """测试n-gram索引：单字、多字关键词均确认为子串"""
+    index = NgramIndex([('1001', '杭州西湖店'), ('1002', '杭州滨江店'), ('1003', '湖州店'), ('1004', None)])
+
+    assert sorted(index.search('杭州')) == ['1001', '1002']
+    assert sorted(index.search('湖')) == ['1001', '1003']
+    assert index.search('西湖店') == ['1001']
+    # 所有bigram都出现过但不是连续子串
+    assert index.search('州店') == ['1003']
+    assert index.search('上海') == []
+
+
+def test_search_ranking_and_rebuild():
+    """测试排序（门店ID完全匹配优先）及白名单版本变化后重建索引"""
+    engine, SessionFactory = _make_session()
+    session = SessionFactory()
+
+    try:
+        session.add_all([
+            StoreWhitelist(store_id='2001', store_name='店2001旗舰'),
+            StoreWhitelist(store_id='1999', store_name='2001广场店'),
+            StoreWhitelist(store_id='1500', store_name='新2001店'),
+        ])
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+
+        service = StoreSearchService()
+        assert service.search_store_ids(session, '2001') == ['2001', '1999', '1500']
+        assert service.search_store_ids(session, '2001', limit=1) == ['2001']
+        assert service.search_store_ids(session, ' ') == []
+
+        session.add(StoreWhitelist(store_id='3001', store_name='2001新店'))
+        session.commit()
+        assert '3001' not in service.search_store_ids(session, '2001')
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+        assert service.search_store_ids(session, '2001') == ['2001', '1999', '3001', '1500']
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+
+
+def test_short_terms_use_ngram_index_on_postgresql(monkeypatch):
+    """测试PostgreSQL上短于三元组长度的关键词走内存索引，较长关键词走pg_trgm"""
+    engine, SessionFactory = _make_session()
+    session = SessionFactory()
+    monkeypatch.setattr(engine.dialect, 'name', 'postgresql')
+
+    try:
+        service = StoreSearchService()
+        assert not service._use_trgm(session, '西湖')
+        assert service._use_trgm(session, 'x' * TRGM_MIN_TERM_LENGTH)
+
+        session.add(StoreWhitelist(store_id='1001', store_name='杭州西湖店'))
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+        assert service.search_store_ids(session, '西湖') == ['1001']
+
+        # 筛选条件用白名单子查询，不把匹配到的门店ID展开为参数列表
+        condition = service.store_filter(
+            session, ViewerReviewResult.store_id, '西湖', matched_ids=[f'{i}' for i in range(1500)]
+        )
+        compiled = condition.compile(dialect=postgresql.dialect())
+        assert 'SELECT' in str(compiled)
+        assert len(compiled.params) < 5
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+
+
+def test_promo_search_uses_whitelist_names():
+    """测试活动参与度搜索按白名单门店名称匹配，也支持门店ID精确匹配"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        session.add_all([
+            StoreWhitelist(store_id='1001', store_name='杭州西湖店'),
+            StoreWhitelist(store_id='1002', store_name='宁波鄞州店'),
+            PromoParticipation(store_id='1001', store_name='杭州西湖店', participation_rate=0.1),
+            PromoParticipation(store_id='1002', store_name='宁波鄞州店', participation_rate=0.2),
+            PromoParticipation(store_id='9009', store_name='未入白名单', participation_rate=0.3),
+        ])
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+
+        client = app_module.app.test_client()
+        stores = client.get('/api/promo/search?store_search=西湖').get_json()['data']['stores']
+        assert [s['store_id'] for s in stores] == ['1001']
+        stores = client.get('/api/promo/search?store_search=9009').get_json()['data']['stores']
+        assert [s['store_id'] for s in stores] == ['9009']
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
+
+
+def test_review_search_finds_unmatched_store_by_own_name():
+    """测试不在白名单中的门店（未匹配门店）按审核结果中的门店名称搜索"""
+    engine, SessionFactory = _make_session()
+    original_session_factory = app_module.SessionFactory
+    app_module.SessionFactory = SessionFactory
+    session = SessionFactory()
+
+    try:
+        session.add_all([
+            StoreWhitelist(store_id='1001', store_name='杭州西湖店', city_operator='张三'),
+            ViewerReviewResult(store_id='1001', store_name='旧名称西湖', item_name='门头', review_result='不合格'),
+            ViewerReviewResult(store_id='9009', store_name='温州西湖店', item_name='门头', review_result='不合格',
+                               war_zone='[未匹配]', province='[未匹配]', city='[未匹配]'),
+        ])
+        bump_data_version(session, StoreWhitelist.__tablename__)
+        session.commit()
+
+        client = app_module.app.test_client()
+        stores = client.get('/api/search?cursor=&store_search=西湖').get_json()['data']['stores']
+        assert [s['store_id'] for s in stores] == ['1001', '9009']
+        # 白名单中的门店按白名单名称匹配，不按审核结果中的旧名称
+        stores = client.get('/api/search?cursor=&store_search=旧名称').get_json()['data']['stores']
+        assert stores == []
+        # 调用方查询已关联白名单表（按运营筛选）时子查询仍然正确
+        stores = client.get('/api/search?cursor=&store_search=西湖&operator=张三').get_json()['data']['stores']
+        assert [s['store_id'] for s in stores] == ['1001']
+    finally:
+        session.close()
+        SessionFactory.remove()
+        engine.dispose()
+        app_module.SessionFactory = original_session_factory
@@ -2,13 +2,53 @@
 设备异常监控相关API
 Equipment Monitoring Related APIs
 """
-from flask import request, jsonify, send_file
+from flask import request, jsonify
 from datetime import datetime, timedelta, date
 import pandas as pd
-from io import BytesIO
-from shared.database_models import EquipmentStatus, EquipmentProcessing, EquipmentImportLog, EquipmentStatusSnapshot
-from equipment_utils import calculate_chronic_stats, should_suppress, is_chronic_store, get_abnormal_count
+from sqlalchemy import func, or_, select
+from shared.database_models import (
+    EquipmentStatus, EquipmentProcessing, EquipmentImportLog, EquipmentStatusSnapshot, EquipmentDashboardState
+)
+from equipment_utils import get_active_suppressions, evaluate_chronic_stores, load_chronic_history
+from equipment_dashboard import (
+    STATUS_PENDING, STATUS_RECOVERED, STATUS_NOT_RECOVERED, refresh_store_state
+)
 from equipment_config import EXPECTED_RECOVERY_MAX_DAYS
+from viewer.store_search import store_search_service
+from viewer.excel_export import xlsx_response, records_frame
+
+
+def _summarize_abnormal_snapshots(snapshots: pd.DataFrame) -> tuple:
+    """
+    按门店汇总异常快照（导出用）：最近5天/10天异常次数（含今天）和最近5个异常时间点
+
+    Args:
+        snapshots: load_chronic_history()返回的异常快照
+
+    Returns:
+        tuple: ({store_id: (5天次数, 10天次数)}, {store_id: '03-09下午、03-09上午'})
+    """
+    today = date.today()
+    recent = snapshots[snapshots['snapshot_date'] >= pd.Timestamp(today - timedelta(days=10))]
+    count_10days = recent.groupby('store_id').size()
+    count_5days = recent[recent['snapshot_date'] >= pd.Timestamp(today - timedelta(days=5))].groupby('store_id').size()
+    counts = {store_id: (int(count_5days.get(store_id, 0)), int(total)) for store_id, total in count_10days.items()}
+
+    # 每个门店按时间倒序取前5个不同的（日期, 时段）
+    recent = pd.DataFrame({
+        'store_id': recent['store_id'],
+        'snapshot_date': recent['snapshot_date'],
+        'day': recent['snapshot_date'].dt.normalize(),
+        'period': recent['snapshot_period'].map({'AM': '上午'}).fillna('下午')
+    }).sort_values('snapshot_date', ascending=False, kind='stable')
+    recent = recent.drop_duplicates(['store_id', 'day', 'period']).groupby('store_id', sort=False).head(5)
+
+    day_labels = {day: day.strftime('%m-%d') for day in recent['day'].unique()}
+    time_lists = {}
+    for store_id, label in zip(recent['store_id'], recent['day'].map(day_labels) + recent['period']):
+        time_lists.setdefault(store_id, []).append(label)
+    abnormal_times = {store_id: '、'.join(labels) for store_id, labels in time_lists.items()}
+    return counts, abnormal_times
 
 
 def register_equipment_routes(app, get_db_session):
@@ -113,7 +153,13 @@ def register_equipment_routes(app, get_db_session):
 
     @app.route('/api/equipment/search')
     def search_equipment():
-        """搜索设备异常"""
+        """
+        搜索设备异常
+        
+        门店状态、经常出问题、暂时不提示来自导入时生成的看板状态表，
+        这里只做筛选、分页，并读取当前页门店的设备和处理记录。
+        看板状态只由导入流程和定时任务（rebuild_equipment_dashboard.py）重新生成，读取请求不重新生成。
+        """
         try:
             session = get_db_session()
             
@@ -125,98 +171,74 @@ def register_equipment_routes(app, get_db_session):
             page = int(request.args.get('page', 1))
             per_page = int(request.args.get('per_page', 20))
             
-            from sqlalchemy import func, distinct
-            
-            store_query = session.query(distinct(EquipmentStatus.store_id))
-            
-            # 只查询营业时间内的门店（排除 is_open_at_data_time=0 的门店）
-            store_query = store_query.filter(EquipmentStatus.is_open_at_data_time == 1)
+            # 过滤暂时不提示的门店（暂时不提示截止日期当天仍不提示）
+            today_start = datetime.combine(date.today(), datetime.min.time())
+            state_query = session.query(EquipmentDashboardState).filter(or_(
+                EquipmentDashboardState.suppressed_until.is_(None),
+                EquipmentDashboardState.suppressed_until < today_start
+            ))
             
             if store_search:
-                store_query = store_query.filter(
-                    (EquipmentStatus.store_id == store_search) |
-                    (EquipmentStatus.store_name.like(f'%{store_search}%'))
-                )
-            
+                # 搜索一次用于排序（非PostgreSQL数据库筛选也直接复用，不重复搜索）
+                matched_ids = store_search_service.search_store_ids(session, store_search)
+                state_query = state_query.filter(store_search_service.store_filter(
+                    session, EquipmentDashboardState.store_id, store_search,
+                    name_column=EquipmentDashboardState.store_name, matched_ids=matched_ids
+                ))
             if war_zone:
-                store_query = store_query.filter(EquipmentStatus.war_zone == war_zone)
+                state_query = state_query.filter(EquipmentDashboardState.war_zone == war_zone)
             if regional_manager:
-                store_query = store_query.filter(EquipmentStatus.regional_manager == regional_manager)
-            
-            total_stores = store_query.count()
-            
-            all_store_ids = [sid[0] for sid in store_query.all()]
-            
-            # 过滤暂时不提示的门店
-            suppressed_store_ids = set()
-            for store_id in all_store_ids:
-                if should_suppress(session, store_id, 'POS'):
-                    suppressed_store_ids.add(store_id)
-            
-            all_store_ids = [sid for sid in all_store_ids if sid not in suppressed_store_ids]
-            total_stores = len(all_store_ids)
-            
-            # 获取处理记录 - 查今天所有的处理记录
-            # 每次导入时 import_equipment_data.py 已经清空了当前时段的处理记录
-            # 所以数据库里存在的处理记录就是本轮有效的处理记录
-            today_start = datetime.combine(date.today(), datetime.min.time())
-            
-            all_processing_records = session.query(EquipmentProcessing)\
-                .filter(EquipmentProcessing.store_id.in_(all_store_ids))\
-                .filter(EquipmentProcessing.processed_at >= today_start)\
-                .all()
-            
-            processed_store_ids = set()
-            recovered_store_ids = set()
-            not_recovered_store_ids = set()
-            
-            store_processing = {}
-            for p in all_processing_records:
-                if p.store_id not in store_processing:
-                    store_processing[p.store_id] = []
-                store_processing[p.store_id].append(p)
-            
-            for store_id, records in store_processing.items():
-                processed_store_ids.add(store_id)
-                
-                has_not_recovered = any(r.action == '未恢复' for r in records)
-                
-                if has_not_recovered:
-                    not_recovered_store_ids.add(store_id)
-                else:
-                    recovered_store_ids.add(store_id)
-            
-            total_processed = len(processed_store_ids)
-            total_pending = total_stores - total_processed
-            total_recovered = len(recovered_store_ids)
-            total_not_recovered = len(not_recovered_store_ids)
-            
-            chronic_stats = calculate_chronic_stats(session, all_store_ids)
-            total_chronic = sum(1 for stats in chronic_stats.values() if stats['is_chronic'])
+                state_query = state_query.filter(EquipmentDashboardState.regional_manager == regional_manager)
+            
+            # 各处理状态门店数和经常出问题门店数（一次GROUP BY）
+            status_counts = {}
+            total_chronic = 0
+            for processing_status, store_count, chronic_count in state_query.with_entities(
+                EquipmentDashboardState.processing_status,
+                func.count(EquipmentDashboardState.store_id),
+                func.coalesce(func.sum(EquipmentDashboardState.is_chronic), 0)
+            ).group_by(EquipmentDashboardState.processing_status).all():
+                status_counts[processing_status] = store_count
+                total_chronic += chronic_count
+            
+            total_stores = sum(status_counts.values())
+            total_pending = status_counts.get(STATUS_PENDING, 0)
+            total_processed = total_stores - total_pending
+            total_recovered = status_counts.get(STATUS_RECOVERED, 0)
+            total_not_recovered = status_counts.get(STATUS_NOT_RECOVERED, 0)
             
             # 根据状态筛选
-            filtered_store_ids = all_store_ids
-            if status_filter == 'pending':
-                filtered_store_ids = [sid for sid in all_store_ids if sid not in processed_store_ids]
-            elif status_filter == 'recovered':
-                filtered_store_ids = list(recovered_store_ids)
-            elif status_filter == 'not_recovered':
-                filtered_store_ids = list(not_recovered_store_ids)
+            if status_filter in (STATUS_PENDING, STATUS_RECOVERED, STATUS_NOT_RECOVERED):
+                state_query = state_query.filter(EquipmentDashboardState.processing_status == status_filter)
             elif status_filter == 'chronic':
-                filtered_store_ids = [sid for sid in all_store_ids if chronic_stats.get(sid, {}).get('is_chronic', False)]
+                state_query = state_query.filter(EquipmentDashboardState.is_chronic == 1)
             
-            filtered_total = len(filtered_store_ids)
+            filtered_total = state_query.count()
             filtered_total_pages = (filtered_total + per_page - 1) // per_page if filtered_total > 0 else 1
             
             start_idx = (page - 1) * per_page
-            end_idx = start_idx + per_page
-            store_ids = filtered_store_ids[start_idx:end_idx]
+            if store_search:
+                # 按匹配程度排序，门店ID完全匹配的排在最前（搜索结果较少，在内存中排序）
+                rank = {sid: i for i, sid in enumerate(matched_ids)}
+                states = sorted(state_query.all(), key=lambda st: (st.store_id != store_search, rank.get(st.store_id, len(rank))))
+                states = states[start_idx:start_idx + per_page]
+            else:
+                states = state_query.order_by(EquipmentDashboardState.store_id)\
+                    .limit(per_page).offset(start_idx).all()
+            
+            store_ids = [state.store_id for state in states]
             
             equipment_list = session.query(EquipmentStatus)\
                 .filter(EquipmentStatus.store_id.in_(store_ids))\
                 .order_by(EquipmentStatus.store_id, EquipmentStatus.id)\
                 .all()
+            equipment_by_store = {}
+            for equipment in equipment_list:
+                equipment_by_store.setdefault(equipment.store_id, []).append(equipment.to_dict())
             
+            # 获取处理记录 - 查今天所有的处理记录
+            # 每次导入时 import_equipment_data.py 已经清空了当前时段的处理记录
+            # 所以数据库里存在的处理记录就是本轮有效的处理记录
             processing_records = session.query(EquipmentProcessing)\
                 .filter(EquipmentProcessing.store_id.in_(store_ids))\
                 .filter(EquipmentProcessing.processed_at >= today_start)\
@@ -226,27 +248,21 @@ def register_equipment_routes(app, get_db_session):
                 key = f"{p.store_id}_{p.equipment_type}"
                 processing_dict[key] = p.to_dict()
             
-            stores_data = {}
-            for equipment in equipment_list:
-                if equipment.store_id not in stores_data:
-                    chronic_info = chronic_stats.get(equipment.store_id, {})
-                    
-                    stores_data[equipment.store_id] = {
-                        'store_id': equipment.store_id,
-                        'store_name': equipment.store_name,
-                        'war_zone': equipment.war_zone,
-                        'regional_manager': equipment.regional_manager,
-                        'equipment': [],
-                        'processing_pos': processing_dict.get(f"{equipment.store_id}_POS"),
-                        'processing_stb': processing_dict.get(f"{equipment.store_id}_机顶盒"),
-                        'is_chronic': chronic_info.get('is_chronic', False),
-                        'chronic_reason': chronic_info.get('chronic_reason'),
-                        'abnormal_count_5days': chronic_info.get('abnormal_count_5days', 0),
-                        'abnormal_count_10days': chronic_info.get('abnormal_count_10days', 0)
-                    }
-                stores_data[equipment.store_id]['equipment'].append(equipment.to_dict())
-            
-            stores_list = list(stores_data.values())
+            stores_list = []
+            for state in states:
+                stores_list.append({
+                    'store_id': state.store_id,
+                    'store_name': state.store_name,
+                    'war_zone': state.war_zone,
+                    'regional_manager': state.regional_manager,
+                    'equipment': equipment_by_store.get(state.store_id, []),
+                    'processing_pos': processing_dict.get(f"{state.store_id}_POS"),
+                    'processing_stb': processing_dict.get(f"{state.store_id}_机顶盒"),
+                    'is_chronic': bool(state.is_chronic),
+                    'chronic_reason': state.chronic_reason,
+                    'abnormal_count_5days': state.abnormal_count_5days or 0,
+                    'abnormal_count_10days': state.abnormal_count_10days or 0
+                })
             
             return jsonify({
                 'success': True,
@@ -335,6 +351,9 @@ def register_equipment_routes(app, get_db_session):
                 )
                 session.add(processing)
             
+            # 同一事务更新该门店的看板状态
+            session.flush()
+            refresh_store_state(session, store_id)
             session.commit()
             
             return jsonify({
@@ -359,10 +378,21 @@ def register_equipment_routes(app, get_db_session):
             
             history_days = int(request.args.get('history_days', 10))
             
-            # 只导出营业时间内的门店
-            equipment_list = session.query(EquipmentStatus)\
-                .filter(EquipmentStatus.is_open_at_data_time == 1)\
-                .all()
+            # 只导出营业时间内的门店（按表的列查询，不经过ORM实体加载）
+            equipment_table = EquipmentStatus.__table__
+            equipment_list = session.execute(
+                select(
+                    equipment_table.c.store_id,
+                    equipment_table.c.store_name,
+                    equipment_table.c.war_zone,
+                    equipment_table.c.regional_manager,
+                    equipment_table.c.equipment_type,
+                    equipment_table.c.equipment_id,
+                    equipment_table.c.equipment_name,
+                    equipment_table.c.status,
+                    equipment_table.c.is_open_at_data_time
+                ).where(equipment_table.c.is_open_at_data_time == 1)
+            ).all()
             
             # 获取当前处理记录（只看今天的，跟网页展示一致）
             today_start = datetime.combine(date.today(), datetime.min.time())
@@ -371,55 +401,50 @@ def register_equipment_routes(app, get_db_session):
                 .all()
             current_processing_dict = {}
             for p in current_processing_list:
-                key = f"{p.store_id}_{p.equipment_type}"
-                current_processing_dict[key] = p
+                current_processing_dict[(p.store_id, p.equipment_type)] = p
             
-            # 多日统计相关数据（仅开关打开时查询）
+            # 多日统计相关数据（仅开关打开时查询），按(门店ID, 设备类型)一次分组
             processing_history_dict = {}
-            snapshot_dict = {}
+            abnormal_counts_dict = {}
+            abnormal_times_dict = {}
+            chronic_results = {}
             if ENABLE_MULTI_DAY_CHRONIC:
                 history_cutoff = datetime.now() - timedelta(days=history_days)
-                all_processing_records = session.query(EquipmentProcessing)\
-                    .filter(EquipmentProcessing.processed_at >= history_cutoff)\
-                    .order_by(EquipmentProcessing.processed_at.desc())\
-                    .all()
+                processing_table = EquipmentProcessing.__table__
+                all_processing_records = session.execute(
+                    select(
+                        processing_table.c.store_id,
+                        processing_table.c.equipment_type,
+                        processing_table.c.action,
+                        processing_table.c.reason,
+                        processing_table.c.processed_at
+                    ).where(processing_table.c.processed_at >= history_cutoff)
+                    .order_by(processing_table.c.processed_at.desc())
+                ).all()
                 for p in all_processing_records:
-                    key = f"{p.store_id}_{p.equipment_type}"
-                    if key not in processing_history_dict:
-                        processing_history_dict[key] = []
-                    processing_history_dict[key].append(p)
+                    processing_history_dict.setdefault((p.store_id, p.equipment_type), []).append(p)
                 
-                cutoff_date = date.today() - timedelta(days=10)
-                snapshots = session.query(EquipmentStatusSnapshot)\
-                    .filter(EquipmentStatusSnapshot.snapshot_date >= cutoff_date)\
-                    .filter(EquipmentStatusSnapshot.has_abnormal == 1)\
-                    .order_by(EquipmentStatusSnapshot.snapshot_date.desc())\
-                    .all()
-                for snapshot in snapshots:
-                    key = f"{snapshot.store_id}_{snapshot.equipment_type}"
-                    if key not in snapshot_dict:
-                        snapshot_dict[key] = []
-                    snapshot_dict[key].append(snapshot)
+                # 经常出问题、最近5天/10天异常次数和异常时间点（只对POS）：共用一次POS异常快照查询
+                pos_store_ids = list({e.store_id for e in equipment_list if e.equipment_type == 'POS'})
+                history = load_chronic_history(session, pos_store_ids, 'POS')
+                chronic_results = evaluate_chronic_stores(session, pos_store_ids, 'POS', history)
+                abnormal_counts_dict, abnormal_times_dict = _summarize_abnormal_snapshots(history[0])
+            
+            # 暂时不提示的门店设备（一次查询）
+            suppressions = get_active_suppressions(session)
             
             def check_suppressed_status(store_id, equipment_type):
-                from equipment_utils import should_suppress
-                is_suppressed = should_suppress(session, store_id, equipment_type)
-                if is_suppressed:
-                    # 查有 suppressed_until 的最新记录（跟 should_suppress 逻辑一致）
-                    proc = session.query(EquipmentProcessing)\
-                        .filter(EquipmentProcessing.store_id == store_id)\
-                        .filter(EquipmentProcessing.equipment_type == equipment_type)\
-                        .filter(EquipmentProcessing.suppressed_until.isnot(None))\
-                        .order_by(EquipmentProcessing.processed_at.desc())\
-                        .first()
-                    if proc and proc.expected_recovery_date:
-                        return f"是（预计{proc.expected_recovery_date.strftime('%m-%d')}恢复）"
-                    return "是"
-                return "否"
+                key = (store_id, equipment_type)
+                if key not in suppressions:
+                    return "否"
+                expected_recovery_date = suppressions[key]
+                if expected_recovery_date:
+                    return f"是（预计{expected_recovery_date.strftime('%m-%d')}恢复）"
+                return "是"
             
             export_data = []
             for equipment in equipment_list:
-                key = f"{equipment.store_id}_{equipment.equipment_type}"
+                key = (equipment.store_id, equipment.equipment_type)
                 current_processing = current_processing_dict.get(key)
                 suppressed_status = check_suppressed_status(equipment.store_id, equipment.equipment_type)
                 
@@ -437,40 +462,17 @@ def register_equipment_routes(app, get_db_session):
                 
                 # 多日统计列（跟随功能开关）
                 if ENABLE_MULTI_DAY_CHRONIC:
-                    is_chronic = False
-                    chronic_reason = ''
-                    count_5days = 0
-                    count_10days = 0
-                    abnormal_times = ''
-                    counts = {}
-                    
-                    if equipment.equipment_type == 'POS':
-                        is_chronic, chronic_reason, counts = is_chronic_store(session, equipment.store_id, equipment.equipment_type)
-                        count_5days = get_abnormal_count(session, equipment.store_id, equipment.equipment_type, 5, exclude_today=False)
-                        count_10days = get_abnormal_count(session, equipment.store_id, equipment.equipment_type, 10, exclude_today=False)
-                        
-                        store_snapshots = snapshot_dict.get(key, [])
-                        if store_snapshots:
-                            time_list = []
-                            seen_times = set()
-                            for snap in store_snapshots:
-                                time_str = snap.snapshot_date.strftime('%m-%d')
-                                period = snap.snapshot_period
-                                time_key = f"{time_str}_{period}"
-                                if time_key not in seen_times:
-                                    seen_times.add(time_key)
-                                    period_text = '上午' if period == 'AM' else '下午'
-                                    time_list.append(f"{time_str}{period_text}")
-                                    if len(time_list) >= 5:
-                                        break
-                            abnormal_times = '、'.join(time_list)
+                    is_pos = equipment.equipment_type == 'POS'
+                    is_chronic, chronic_reason, counts = chronic_results.get(equipment.store_id, (False, None, {})) \
+                        if is_pos else (False, None, {})
+                    count_5days, count_10days = abnormal_counts_dict.get(equipment.store_id, (0, 0))
                     
                     row['是否经常出问题'] = '是' if is_chronic else '否'
                     row['触发原因'] = chronic_reason or ''
-                    row['最近5天异常次数'] = count_5days if equipment.equipment_type == 'POS' else ''
-                    row['最近10天异常次数'] = count_10days if equipment.equipment_type == 'POS' else ''
-                    row['异常时间点'] = abnormal_times
-                    row['未处理日期'] = '、'.join(counts.get('unprocessed_dates', [])) if equipment.equipment_type == 'POS' else ''
+                    row['最近5天异常次数'] = count_5days if is_pos else ''
+                    row['最近10天异常次数'] = count_10days if is_pos else ''
+                    row['异常时间点'] = abnormal_times_dict.get(equipment.store_id, '') if is_pos else ''
+                    row['未处理日期'] = '、'.join(counts.get('unprocessed_dates', [])) if is_pos else ''
                     
                     history_records = processing_history_dict.get(key, [])
                     row[f'近{history_days}天处理次数'] = len(history_records)
@@ -493,14 +495,6 @@ def register_equipment_routes(app, get_db_session):
                 
                 export_data.append(row)
             
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment
-            from openpyxl.utils import get_column_letter
-
-            wb = Workbook()
-            ws = wb.active
-            ws.title = '设备异常处理结果'
-
             if export_data:
                 headers = list(export_data[0].keys())
             else:
@@ -508,43 +502,7 @@ def register_equipment_routes(app, get_db_session):
                            '设备编号', '设备名称', '当前状态', '数据时间点是否营业',
                            '处理动作', '未恢复原因', '处理时间', '预计恢复日期', '恢复期内免查']
 
-            # 写表头
-            header_fill = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
-            header_font = Font(color='FFFFFF', bold=True)
-            for col_idx, header in enumerate(headers, 1):
-                cell = ws.cell(row=1, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center')
-
-            # 写数据行
-            for row_idx, row_data in enumerate(export_data, 2):
-                for col_idx, header in enumerate(headers, 1):
-                    ws.cell(row=row_idx, column=col_idx, value=row_data.get(header, ''))
-
-            # 自动列宽（中文按2字符宽度计算）
-            for col_idx, header in enumerate(headers, 1):
-                col_letter = get_column_letter(col_idx)
-                max_len = sum(2 if ord(c) > 127 else 1 for c in str(header))
-                for row_data in export_data:
-                    val = str(row_data.get(header, ''))
-                    char_len = sum(2 if ord(c) > 127 else 1 for c in val)
-                    if char_len > max_len:
-                        max_len = char_len
-                ws.column_dimensions[col_letter].width = min(max_len + 2, 40)
-
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            
-            filename = f'设备异常处理结果_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-            
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=filename
-            )
+            return xlsx_response(records_frame(export_data, headers), '设备异常处理结果', '设备异常处理结果')
             
         except Exception as e:
             import traceback
@@ -572,17 +530,15 @@ def register_equipment_routes(app, get_db_session):
                 .first()
             data_time_str = latest_import.data_time if latest_import and latest_import.data_time else ''
 
+            # 暂时不提示的门店设备（一次查询）
+            suppressions = get_active_suppressions(session)
+
             def get_suppressed_info(store_id, equipment_type):
-                from equipment_utils import should_suppress
-                if not should_suppress(session, store_id, equipment_type):
+                key = (store_id, equipment_type)
+                if key not in suppressions:
                     return '', '否'
-                proc = session.query(EquipmentProcessing)\
-                    .filter(EquipmentProcessing.store_id == store_id)\
-                    .filter(EquipmentProcessing.equipment_type == equipment_type)\
-                    .filter(EquipmentProcessing.suppressed_until.isnot(None))\
-                    .order_by(EquipmentProcessing.processed_at.desc())\
-                    .first()
-                recovery_date = proc.expected_recovery_date.strftime('%Y-%m-%d') if proc and proc.expected_recovery_date else ''
+                expected_recovery_date = suppressions[key]
+                recovery_date = expected_recovery_date.strftime('%Y-%m-%d') if expected_recovery_date else ''
                 return recovery_date, '是'
 
             export_data = []
@@ -600,42 +556,11 @@ def register_equipment_routes(app, get_db_session):
                     '恢复期内免查': suppressed,
                 })
 
-            from openpyxl import Workbook
-            from openpyxl.utils import get_column_letter
-
-            wb2 = Workbook()
-            ws = wb2.active
-            ws.title = '警告单'
-
             headers = ['门店ID', '门店名称', '战区', '区域经理', '设备名称',
                        '当前状态', '数据时间点是否营业', '预计恢复日期', '恢复期内免查']
             col_widths = [10, 20, 12, 12, 20, 10, 16, 14, 12]
 
-            from openpyxl.styles import Font, PatternFill, Alignment
-            header_fill = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
-            header_font = Font(color='FFFFFF', bold=True)
-            for col_idx, (header, width) in enumerate(zip(headers, col_widths), 1):
-                cell = ws.cell(row=1, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center')
-                ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-            for row_idx, row_data in enumerate(export_data, 2):
-                for col_idx, header in enumerate(headers, 1):
-                    ws.cell(row=row_idx, column=col_idx, value=row_data.get(header, ''))
-
-            output = BytesIO()
-            wb2.save(output)
-            output.seek(0)
-
-            filename = f'设备离线警告单_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=filename
-            )
+            return xlsx_response(records_frame(export_data, headers), '警告单', '设备离线警告单', col_widths)
 
         except Exception as e:
             import traceback
@@ -783,13 +708,14 @@ def register_equipment_routes(app, get_db_session):
                 return jsonify({'success': False, 'error': '请输入门店ID或名称'}), 400
 
             from shared.database_models import StoreWhitelist
-            from sqlalchemy import or_, func
-            matched = session.query(StoreWhitelist.store_id, StoreWhitelist.store_name,
-                                    StoreWhitelist.war_zone, StoreWhitelist.regional_manager)\
-                .filter(or_(
-                    StoreWhitelist.store_id == keyword,
-                    StoreWhitelist.store_name.like(f'%{keyword}%')
-                )).all()
+            from sqlalchemy import func
+            matched_ids = store_search_service.search_store_ids(session, keyword)
+            rows = session.query(StoreWhitelist.store_id, StoreWhitelist.store_name,
+                                 StoreWhitelist.war_zone, StoreWhitelist.regional_manager)\
+                .filter(StoreWhitelist.store_id.in_(matched_ids)).all()
+            # 保持搜索排序（门店ID完全匹配的排在最前）
+            rows_by_id = {row[0]: row for row in rows}
+            matched = [rows_by_id[sid] for sid in matched_ids if sid in rows_by_id]
 
             if not matched:
                 return jsonify({'success': True, 'data': {'stores': [], 'total': 0}})
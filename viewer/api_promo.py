@@ -1,12 +1,12 @@
 """
 活动参与度相关API（新版）
 """
-from flask import request, jsonify, send_file
-from datetime import datetime
+from flask import request, jsonify
 from sqlalchemy import func, desc, asc
 import pandas as pd
-from io import BytesIO
 from shared.database_models import PromoParticipation, PromoImportLog
+from viewer.store_search import store_search_service
+from viewer.excel_export import xlsx_response
 
 
 def register_promo_routes(app, get_db_session):
@@ -131,8 +131,9 @@ def register_promo_routes(app, get_db_session):
 
             if store_search:
                 query = query.filter(
-                    (PromoParticipation.store_id == store_search) |
-                    (PromoParticipation.store_name.like(f'%{store_search}%'))
+                    store_search_service.store_filter(
+                        session, PromoParticipation.store_id, store_search, name_column=PromoParticipation.store_name
+                    )
                 )
             if war_zone:
                 query = query.filter(PromoParticipation.war_zone == war_zone)
@@ -201,19 +202,7 @@ def register_promo_routes(app, get_db_session):
                 '数据区间': r.data_date,
             } for r in records]
 
-            df = pd.DataFrame(data)
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='活动参与度')
-            output.seek(0)
-
-            filename = f'活动参与度_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-            return send_file(
-                output,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=filename,
-            )
+            return xlsx_response(pd.DataFrame(data), '活动参与度', '活动参与度')
         except Exception as e:
             import traceback; traceback.print_exc()
             return jsonify({'success': False, 'error': str(e)}), 500
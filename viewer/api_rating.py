@@ -2,18 +2,21 @@
 门店评级相关API
 Store Rating Related APIs
 """
-from flask import request, jsonify, Response
+from flask import request, jsonify
 from datetime import datetime
-import io
-import csv
-from urllib.parse import quote
-from sqlalchemy import func
-from shared.database_models import StoreWhitelist, StoreRating, StoreOperationData
+import pandas as pd
+from sqlalchemy.dialects import postgresql, sqlite
+from shared.database_models import StoreWhitelist, StoreRating, StoreCurrentRating, StoreOperationData
+from viewer.rating_stats import CompletionStatsCache
+from viewer.excel_export import xlsx_response
 
 
 def register_rating_routes(app, get_db_session):
     """注册门店评级相关路由"""
     
+    # 评级完成率统计缓存（各评级页面轮询，提交评级后清空）
+    completion_stats_cache = CompletionStatsCache()
+    
     @app.route('/api/rating/war-zones')
     def get_rating_war_zones():
         """获取战区列表"""
@@ -92,32 +95,32 @@ def register_rating_routes(app, get_db_session):
             
             total = query.count()
             
-            stores = query.order_by(StoreWhitelist.store_id)\
+            # 门店、经营数据、当前评级一次查询
+            rows = query.outerjoin(StoreOperationData, StoreOperationData.store_id == StoreWhitelist.store_id)\
+                .outerjoin(StoreCurrentRating, StoreCurrentRating.store_id == StoreWhitelist.store_id)\
+                .add_columns(
+                    StoreOperationData.dine_in_revenue,
+                    StoreOperationData.comprehensive_score,
+                    StoreOperationData.operation_score,
+                    StoreCurrentRating.rating
+                )\
+                .order_by(StoreWhitelist.store_id)\
                 .limit(per_page)\
                 .offset((page - 1) * per_page)\
                 .all()
             
             stores_data = []
-            for store in stores:
-                operation_data = session.query(StoreOperationData)\
-                    .filter(StoreOperationData.store_id == store.store_id)\
-                    .first()
-                
-                latest_rating = session.query(StoreRating)\
-                    .filter(StoreRating.store_id == store.store_id)\
-                    .order_by(StoreRating.rated_at.desc())\
-                    .first()
-                
+            for store, dine_in_revenue, comprehensive_score, operation_score, current_rating in rows:
                 store_dict = {
                     'store_id': store.store_id,
                     'store_name': store.store_name,
                     'city': store.city,
                     'war_zone': store.war_zone,
                     'regional_manager': store.regional_manager,
-                    'dine_in_revenue': operation_data.dine_in_revenue if operation_data else None,
-                    'comprehensive_score': operation_data.comprehensive_score if operation_data else None,
-                    'operation_score': operation_data.operation_score if operation_data else None,
-                    'current_rating': latest_rating.rating if latest_rating else None
+                    'dine_in_revenue': dine_in_revenue,
+                    'comprehensive_score': comprehensive_score,
+                    'operation_score': operation_score,
+                    'current_rating': current_rating
                 }
                 stores_data.append(store_dict)
             
@@ -179,7 +182,23 @@ def register_rating_routes(app, get_db_session):
                 rated_by=None
             )
             session.add(new_rating)
+            session.flush()
+            
+            # 同一事务更新当前评级（ON CONFLICT DO UPDATE，门店首次评级被并发提交时不会主键冲突）
+            insert = sqlite.insert if session.get_bind().dialect.name == 'sqlite' else postgresql.insert
+            current = {
+                'rating': new_rating.rating,
+                'rated_at': new_rating.rated_at,
+                'rated_by': new_rating.rated_by,
+                'rating_id': new_rating.id
+            }
+            session.execute(
+                insert(StoreCurrentRating)
+                .values(store_id=store_id, **current)
+                .on_conflict_do_update(index_elements=[StoreCurrentRating.store_id], set_=current)
+            )
             session.commit()
+            completion_stats_cache.invalidate()
             
             return jsonify({
                 'success': True,
@@ -202,39 +221,7 @@ def register_rating_routes(app, get_db_session):
             war_zone = request.args.get('war_zone', '').strip()
             regional_manager = request.args.get('regional_manager', '').strip()
             
-            store_query = session.query(StoreWhitelist)
-            
-            if war_zone:
-                store_query = store_query.filter(StoreWhitelist.war_zone == war_zone)
-            
-            if regional_manager:
-                store_query = store_query.filter(StoreWhitelist.regional_manager == regional_manager)
-            
-            stores_by_zone = {}
-            for store in store_query.all():
-                zone = store.war_zone or '未知战区'
-                if zone not in stores_by_zone:
-                    stores_by_zone[zone] = []
-                stores_by_zone[zone].append(store.store_id)
-            
-            stats = []
-            for zone, store_ids in stores_by_zone.items():
-                total_stores = len(store_ids)
-                
-                rated_stores = session.query(func.count(func.distinct(StoreRating.store_id)))\
-                    .filter(StoreRating.store_id.in_(store_ids))\
-                    .scalar()
-                
-                completion_rate = (rated_stores / total_stores * 100) if total_stores > 0 else 0
-                
-                stats.append({
-                    'war_zone': zone,
-                    'total_stores': total_stores,
-                    'rated_stores': rated_stores,
-                    'completion_rate': round(completion_rate, 1)
-                })
-            
-            stats.sort(key=lambda x: x['war_zone'])
+            stats = completion_stats_cache.get(session, war_zone, regional_manager)
             
             return jsonify({
                 'success': True,
@@ -251,64 +238,51 @@ def register_rating_routes(app, get_db_session):
 
     @app.route('/api/rating/export')
     def export_ratings():
-        """导出评级结果"""
+        """
+        导出评级结果
+        
+        默认导出每个门店的当前评级；history=1 时导出全部评级历史（用于审计）
+        """
         try:
             session = get_db_session()
-            
-            subquery = session.query(
-                StoreRating.store_id,
-                func.max(StoreRating.rated_at).label('max_rated_at')
-            ).group_by(StoreRating.store_id).subquery()
-            
-            ratings = session.query(StoreRating)\
-                .join(
-                    subquery,
-                    (StoreRating.store_id == subquery.c.store_id) &
-                    (StoreRating.rated_at == subquery.c.max_rated_at)
-                )\
-                .order_by(StoreRating.store_id)\
-                .all()
-            
-            if not ratings:
+            history = request.args.get('history') == '1'
+            
+            if history:
+                rows = session.query(StoreRating, StoreWhitelist)\
+                    .join(StoreWhitelist, StoreWhitelist.store_id == StoreRating.store_id)\
+                    .order_by(StoreRating.store_id, StoreRating.rated_at, StoreRating.id)\
+                    .all()
+            else:
+                rows = session.query(StoreCurrentRating, StoreWhitelist)\
+                    .join(StoreWhitelist, StoreWhitelist.store_id == StoreCurrentRating.store_id)\
+                    .order_by(StoreCurrentRating.store_id)\
+                    .all()
+            
+            if not rows:
                 return jsonify({
                     'success': False,
                     'error': '暂无评级数据可导出'
                 }), 400
             
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            writer.writerow(['门店ID', '门店名称', '城市', '战区', '区域经理', '评级', '评级时间'])
-            
-            for rating in ratings:
-                store = session.query(StoreWhitelist)\
-                    .filter(StoreWhitelist.store_id == rating.store_id)\
-                    .first()
-                
-                if store:
-                    writer.writerow([
-                        rating.store_id,
-                        store.store_name or '',
-                        store.city or '',
-                        store.war_zone or '',
-                        store.regional_manager or '',
-                        rating.rating,
-                        rating.rated_at.strftime('%Y-%m-%d %H:%M:%S') if rating.rated_at else ''
-                    ])
-            
-            filename = f'门店评级结果_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-            filename_encoded = quote(filename)
-            
-            response = Response(
-                '\ufeff' + output.getvalue(),
-                mimetype='text/csv',
-                headers={
-                    'Content-Disposition': f'attachment; filename*=UTF-8\'\'{filename_encoded}',
-                    'Content-Type': 'text/csv; charset=utf-8'
-                }
-            )
-            
-            return response
+            headers = ['门店ID', '门店名称', '城市', '战区', '区域经理', '评级', '评级时间']
+            if history:
+                headers.append('评级人')
+            
+            records = []
+            for rating, store in rows:
+                row = [
+                    rating.store_id,
+                    store.store_name or '',
+                    store.city or '',
+                    store.war_zone or '',
+                    store.regional_manager or '',
+                    rating.rating,
+                    rating.rated_at.strftime('%Y-%m-%d %H:%M:%S') if rating.rated_at else ''
+                ]
+                records.append(row + [rating.rated_by or ''] if history else row)
+            
+            name = '门店评级历史' if history else '门店评级结果'
+            return xlsx_response(pd.DataFrame(records, columns=headers), name, name)
             
         except Exception as e:
             return jsonify({
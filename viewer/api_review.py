@@ -5,76 +5,33 @@ Review Related APIs
 from flask import request, jsonify
 from sqlalchemy import func, distinct
 from shared.database_models import StoreWhitelist, ViewerReviewResult
+from shared.versioned_cache import VersionedCache
+from viewer.store_search import store_search_service
+from viewer.filter_options import FilterOptionsCache
 
 
 def register_review_routes(app, get_db_session):
     """注册周清审核相关路由"""
     
+    # 筛选选项缓存（白名单导入时生成快照，按版本号失效）
+    filter_options_cache = FilterOptionsCache()
+    
     @app.route('/api/filters')
     def get_filters():
         """获取所有筛选选项"""
         try:
             session = get_db_session()
-            
-            # 获取战区列表
-            war_zones = session.query(StoreWhitelist.war_zone)\
-                .filter(StoreWhitelist.war_zone.isnot(None))\
-                .filter(StoreWhitelist.war_zone != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.war_zone)\
-                .all()
-            war_zones = [wz[0] for wz in war_zones]
-            
-            # 获取省份列表
-            provinces = session.query(StoreWhitelist.province)\
-                .filter(StoreWhitelist.province.isnot(None))\
-                .filter(StoreWhitelist.province != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.province)\
-                .all()
-            provinces = [p[0] for p in provinces]
-            
-            # 获取城市列表
-            cities = session.query(StoreWhitelist.city)\
-                .filter(StoreWhitelist.city.isnot(None))\
-                .filter(StoreWhitelist.city != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.city)\
-                .all()
-            cities = [c[0] for c in cities]
-            
-            # 获取区域经理列表
-            regional_managers = session.query(StoreWhitelist.regional_manager)\
-                .filter(StoreWhitelist.regional_manager.isnot(None))\
-                .filter(StoreWhitelist.regional_manager != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.regional_manager)\
-                .all()
-            regional_managers = [rm[0] for rm in regional_managers]
-            
-            # 获取运营列表
-            operators_query = session.query(
-                func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator).label('operator')
-            ).filter(
-                func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator).isnot(None)
-            ).filter(
-                func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator) != ''
-            ).distinct().order_by('operator')
-            
-            operators = [op[0] for op in operators_query.all()]
-            
-            # 审核结果选项
-            review_results = ['合格', '不合格']
+            options = filter_options_cache.get(session)
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'war_zones': war_zones,
-                    'provinces': provinces,
-                    'cities': cities,
-                    'regional_managers': regional_managers,
-                    'operators': operators,
-                    'review_results': review_results
+                    'war_zones': options['war_zones'],
+                    'provinces': options['provinces'],
+                    'cities': options['cities'],
+                    'regional_managers': options['regional_managers'],
+                    'operators': options['operators'],
+                    'review_results': options['review_results']
                 }
             })
             
@@ -97,20 +54,12 @@ def register_review_routes(app, get_db_session):
                 }), 400
             
             session = get_db_session()
-            
-            provinces = session.query(StoreWhitelist.province)\
-                .filter(StoreWhitelist.war_zone == war_zone)\
-                .filter(StoreWhitelist.province.isnot(None))\
-                .filter(StoreWhitelist.province != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.province)\
-                .all()
-            provinces = [p[0] for p in provinces]
+            options = filter_options_cache.get(session)
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'provinces': provinces
+                    'provinces': options['provinces_by_war_zone'].get(war_zone, [])
                 }
             })
             
@@ -133,20 +82,12 @@ def register_review_routes(app, get_db_session):
                 }), 400
             
             session = get_db_session()
-            
-            cities = session.query(StoreWhitelist.city)\
-                .filter(StoreWhitelist.province == province)\
-                .filter(StoreWhitelist.city.isnot(None))\
-                .filter(StoreWhitelist.city != '')\
-                .distinct()\
-                .order_by(StoreWhitelist.city)\
-                .all()
-            cities = [c[0] for c in cities]
+            options = filter_options_cache.get(session)
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'cities': cities
+                    'cities': options['cities_by_province'].get(province, [])
                 }
             })
             
@@ -156,71 +97,53 @@ def register_review_routes(app, get_db_session):
                 'error': f'获取城市列表失败: {str(e)}'
             }), 500
 
+    # 搜索结果门店总数缓存（按筛选条件，审核结果或白名单重新导入后失效）
+    search_total_cache = VersionedCache(ViewerReviewResult.__tablename__, StoreWhitelist.__tablename__)
+    
     @app.route('/api/search')
     def search_reviews():
-        """搜索审核结果"""
+        """
+        搜索审核结果（只返回不合格项，按门店分页）
+        
+        传入cursor参数（第一页为空字符串）时使用游标分页：
+        先按索引取出store_id大于游标的前per_page个门店编号，再取这些门店的不合格项；
+        否则使用page/per_page偏移分页。
+        """
         try:
             session = get_db_session()
             
             # 获取筛选参数
-            war_zone = request.args.get('war_zone', '').strip()
-            province = request.args.get('province', '').strip()
-            city = request.args.get('city', '').strip()
-            regional_manager = request.args.get('regional_manager', '').strip()
-            operator = request.args.get('operator', '').strip()
-            review_result = request.args.get('review_result', '').strip()
-            store_search = request.args.get('store_search', '').strip()
+            filters = {
+                key: request.args.get(key, '').strip()
+                for key in ('war_zone', 'province', 'city', 'regional_manager', 'operator', 'store_search')
+            }
             
             # 获取分页参数
             page = int(request.args.get('page', 1))
             per_page = int(request.args.get('per_page', 20))
+            cursor = request.args.get('cursor')
+            
+            # 获取总门店数（缓存）
+            total_stores = search_total_cache.get_or_compute(
+                session,
+                tuple(sorted(filters.items())),
+                lambda: _filter_failed_reviews(
+                    session.query(distinct(ViewerReviewResult.store_id)), filters
+                ).count()
+            )
+            total_pages = (total_stores + per_page - 1) // per_page
             
-            # 构建查询
-            store_query = session.query(distinct(ViewerReviewResult.store_id))
-            
-            # 门店搜索
-            if store_search:
-                store_query = store_query.filter(
-                    (ViewerReviewResult.store_id == store_search) |
-                    (ViewerReviewResult.store_name.like(f'%{store_search}%'))
-                )
-            
-            # 应用筛选条件
-            if war_zone:
-                store_query = store_query.filter(ViewerReviewResult.war_zone == war_zone)
-            if province:
-                store_query = store_query.filter(ViewerReviewResult.province == province)
-            if city:
-                store_query = store_query.filter(ViewerReviewResult.city == city)
-            
-            # 只显示不合格的
-            store_query = store_query.filter(ViewerReviewResult.review_result == '不合格')
-            
-            # 如果有区域经理或运营筛选
-            if regional_manager or operator:
-                store_query = store_query.join(
-                    StoreWhitelist,
-                    ViewerReviewResult.store_id == StoreWhitelist.store_id
-                )
-                if regional_manager:
-                    store_query = store_query.filter(StoreWhitelist.regional_manager == regional_manager)
-                if operator:
-                    store_query = store_query.filter(
-                        func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator) == operator
-                    )
-            
-            # 获取总门店数
-            total_stores = store_query.count()
-            
-            # 分页获取门店ID
-            store_ids = [sid[0] for sid in store_query.limit(per_page).offset((page - 1) * per_page).all()]
-            
-            # 获取这些门店的所有不合格项
-            results = session.query(ViewerReviewResult)\
-                .filter(ViewerReviewResult.store_id.in_(store_ids))\
-                .filter(ViewerReviewResult.review_result == '不合格')\
-                .order_by(ViewerReviewResult.store_id, ViewerReviewResult.id)\
-                .all()
+            if cursor is not None:
+                results = _query_store_page_after(session, filters, cursor, per_page + 1)
+            else:
+                # 分页获取门店ID
+                store_query = _filter_failed_reviews(
+                    session.query(distinct(ViewerReviewResult.store_id)), filters
+                ).order_by(ViewerReviewResult.store_id)
+                store_ids = [sid[0] for sid in store_query.limit(per_page).offset((page - 1) * per_page).all()]
+                
+                # 获取这些门店的所有不合格项
+                results = _query_failed_items(session, store_ids)
             
             # 按门店分组
             stores_data = {}
@@ -237,7 +160,15 @@ def register_review_routes(app, get_db_session):
                 stores_data[result.store_id]['items'].append(result.to_dict())
             
             stores_list = list(stores_data.values())
-            total_pages = (total_stores + per_page - 1) // per_page
+            
+            if cursor is not None:
+                # 多取的一个门店只用于判断是否还有下一页
+                has_more = len(stores_list) > per_page
+                stores_list = stores_list[:per_page]
+                next_cursor = stores_list[-1]['store_id'] if has_more else None
+            else:
+                has_more = page < total_pages
+                next_cursor = None
             
             return jsonify({
                 'success': True,
@@ -247,7 +178,8 @@ def register_review_routes(app, get_db_session):
                     'page': page,
                     'per_page': per_page,
                     'total_pages': total_pages,
-                    'has_more': page < total_pages
+                    'has_more': has_more,
+                    'next_cursor': next_cursor
                 }
             })
             
@@ -309,3 +241,94 @@ def register_review_routes(app, get_db_session):
                 'success': False,
                 'error': f'获取未匹配门店失败: {str(e)}'
             }), 500
+
+
+def _filter_failed_reviews(query, filters):
+    """
+    为审核结果查询添加搜索筛选条件（只保留不合格项）
+    
+    Args:
+        query: 基于ViewerReviewResult的查询
+        filters: 筛选条件（war_zone、province、city、regional_manager、operator、store_search）
+        
+    Returns:
+        Query: 添加筛选条件后的查询
+    """
+    store_search = filters.get('store_search')
+    if store_search:
+        query = query.filter(
+            store_search_service.store_filter(
+                query.session, ViewerReviewResult.store_id, store_search, name_column=ViewerReviewResult.store_name
+            )
+        )
+    
+    if filters.get('war_zone'):
+        query = query.filter(ViewerReviewResult.war_zone == filters['war_zone'])
+    if filters.get('province'):
+        query = query.filter(ViewerReviewResult.province == filters['province'])
+    if filters.get('city'):
+        query = query.filter(ViewerReviewResult.city == filters['city'])
+    
+    # 只显示不合格的
+    query = query.filter(ViewerReviewResult.review_result == '不合格')
+    
+    # 如果有区域经理或运营筛选
+    regional_manager = filters.get('regional_manager')
+    operator = filters.get('operator')
+    if regional_manager or operator:
+        query = query.join(
+            StoreWhitelist,
+            ViewerReviewResult.store_id == StoreWhitelist.store_id
+        )
+        if regional_manager:
+            query = query.filter(StoreWhitelist.regional_manager == regional_manager)
+        if operator:
+            query = query.filter(
+                func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator) == operator
+            )
+    
+    return query
+
+
+def _query_store_page_after(session, filters, cursor: str, store_limit: int):
+    """
+    游标分页：取出store_id大于游标的前store_limit个门店的全部不合格项
+    
+    先用WHERE store_id > :cursor ORDER BY store_id LIMIT :n取门店编号（只读取一页门店），
+    再按门店编号取这些门店的不合格项。
+    
+    Args:
+        session: 数据库会话
+        filters: 筛选条件
+        cursor: 上一页最后一个门店编号，空字符串表示第一页
+        store_limit: 门店数
+        
+    Returns:
+        List[ViewerReviewResult]: 按门店编号、ID排序的审核结果
+    """
+    store_query = _filter_failed_reviews(session.query(distinct(ViewerReviewResult.store_id)), filters)
+    if cursor:
+        store_query = store_query.filter(ViewerReviewResult.store_id > cursor)
+    store_ids = [sid[0] for sid in store_query.order_by(ViewerReviewResult.store_id).limit(store_limit).all()]
+    
+    return _query_failed_items(session, store_ids)
+
+
+def _query_failed_items(session, store_ids):
+    """
+    获取指定门店的全部不合格项
+    
+    Args:
+        session: 数据库会话
+        store_ids: 门店编号列表
+        
+    Returns:
+        List[ViewerReviewResult]: 按门店编号、ID排序的审核结果
+    """
+    if not store_ids:
+        return []
+    return session.query(ViewerReviewResult)\
+        .filter(ViewerReviewResult.store_id.in_(store_ids))\
+        .filter(ViewerReviewResult.review_result == '不合格')\
+        .order_by(ViewerReviewResult.store_id, ViewerReviewResult.id)\
+        .all()
@@ -3,9 +3,22 @@
 File Upload Related APIs
 """
 import os
+import hmac
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
 from flask import request, jsonify
 from werkzeug.utils import secure_filename
 from viewer.data_importer import DataImporter
+from equipment_import import write_import_status, read_import_status
+
+
+# 设备异常导入脚本：接口上传后在独立进程中执行，不受请求超时、worker重启影响
+IMPORT_EQUIPMENT_SCRIPT = Path(__file__).resolve().parent.parent / 'import_equipment_data.py'
+EQUIPMENT_JOB_PREFIX = 'equipment_'
+EQUIPMENT_JOB_STATUS_FILE = 'status.json'
 
 
 def allowed_file(filename: str, allowed_exts: set) -> bool:
@@ -13,6 +26,47 @@ def allowed_file(filename: str, allowed_exts: set) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_exts
 
 
+def upload_token_valid() -> bool:
+    """
+    检查设备数据上传令牌（请求头X-Upload-Token与环境变量EQUIPMENT_UPLOAD_TOKEN一致）
+
+    Returns:
+        bool: 令牌是否有效，服务器未配置令牌时一律无效（接口不可用）
+    """
+    expected = os.getenv('EQUIPMENT_UPLOAD_TOKEN', '')
+    provided = request.headers.get('X-Upload-Token', '')
+    return bool(expected) and hmac.compare_digest(expected.encode('utf-8'), provided.encode('utf-8'))
+
+
+def start_equipment_import(job_dir: str, paths: dict) -> subprocess.Popen:
+    """
+    在独立进程中执行导入脚本（导入结束后删除上传的文件，结果写入任务目录的状态文件）
+
+    Args:
+        job_dir: 任务目录
+        paths: 上传文件路径（operating_file、pos_file、stb_file）
+
+    Returns:
+        subprocess.Popen: 导入进程
+    """
+    command = [
+        sys.executable, str(IMPORT_EQUIPMENT_SCRIPT),
+        '--operating-file', paths['operating_file'],
+        '--status-file', os.path.join(job_dir, EQUIPMENT_JOB_STATUS_FILE),
+        '--remove-files'
+    ]
+    if paths.get('pos_file'):
+        command += ['--pos-file', paths['pos_file']]
+    if paths.get('stb_file'):
+        command += ['--stb-file', paths['stb_file']]
+
+    with open(os.path.join(job_dir, 'import.log'), 'wb') as log_file:
+        return subprocess.Popen(
+            command, stdout=log_file, stderr=subprocess.STDOUT,
+            cwd=str(IMPORT_EQUIPMENT_SCRIPT.parent), start_new_session=True
+        )
+
+
 def register_upload_routes(app, get_db_session):
     """注册文件上传相关路由"""
     
@@ -136,3 +190,86 @@ def register_upload_routes(app, get_db_session):
                 'success': False,
                 'error': f'上传失败: {str(e)}'
             }), 500
+
+    @app.route('/api/upload/equipment', methods=['POST'])
+    def upload_equipment():
+        """
+        上传设备异常数据（在营门店文件 + 收银设备/机顶盒文件）
+
+        需要上传令牌（请求头X-Upload-Token）。导入会清空、重建设备数据，
+        交给导入脚本在独立进程中执行，立即返回任务ID，通过状态接口查询结果。
+        """
+        if not upload_token_valid():
+            return jsonify({
+                'success': False,
+                'error': '无权限：需要有效的上传令牌'
+            }), 403
+        
+        files = {name: request.files.get(name) for name in ('operating_file', 'pos_file', 'stb_file')}
+        files = {name: file for name, file in files.items() if file and file.filename}
+        
+        if 'operating_file' not in files:
+            return jsonify({
+                'success': False,
+                'error': '缺少在营门店文件'
+            }), 400
+        
+        if 'pos_file' not in files and 'stb_file' not in files:
+            return jsonify({
+                'success': False,
+                'error': '请至少上传收银设备或机顶盒文件'
+            }), 400
+        
+        if not all(allowed_file(file.filename, {'xlsx'}) for file in files.values()):
+            return jsonify({
+                'success': False,
+                'error': '只支持.xlsx格式的Excel文件'
+            }), 400
+        
+        # 数据时间从文件名（如 _20260306_1131）中提取，保存时保留原文件名中的ASCII部分
+        job_dir = tempfile.mkdtemp(prefix=EQUIPMENT_JOB_PREFIX, dir=app.config['UPLOAD_FOLDER'])
+        job_id = os.path.basename(job_dir)
+        try:
+            paths = {}
+            for name, file in files.items():
+                paths[name] = os.path.join(job_dir, f'{name}_{secure_filename(file.filename)}')
+                file.save(paths[name])
+            
+            write_import_status(os.path.join(job_dir, EQUIPMENT_JOB_STATUS_FILE), {'status': 'running'})
+            start_equipment_import(job_dir, paths)
+        
+        except Exception as e:
+            shutil.rmtree(job_dir, ignore_errors=True)
+            return jsonify({
+                'success': False,
+                'error': f'上传失败: {str(e)}'
+            }), 500
+        
+        return jsonify({
+            'success': True,
+            'message': '文件已上传，正在后台导入',
+            'job_id': job_id
+        }), 202
+
+    @app.route('/api/upload/equipment/<job_id>')
+    def upload_equipment_status(job_id):
+        """查询设备异常数据导入任务状态（running/success/failed及导入结果）"""
+        if not upload_token_valid():
+            return jsonify({
+                'success': False,
+                'error': '无权限：需要有效的上传令牌'
+            }), 403
+        
+        status = None
+        if job_id.startswith(EQUIPMENT_JOB_PREFIX) and job_id == secure_filename(job_id):
+            status = read_import_status(os.path.join(app.config['UPLOAD_FOLDER'], job_id, EQUIPMENT_JOB_STATUS_FILE))
+        if status is None:
+            return jsonify({
+                'success': False,
+                'error': '导入任务不存在'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': status
+        })
@@ -7,7 +7,8 @@ from typing import Dict, List, Optional
 from datetime import datetime
 from dataclasses import dataclass
 from sqlalchemy.orm import Session
-from shared.database_models import StoreWhitelist, ViewerReviewResult, StoreOperationData
+from shared.database_models import StoreWhitelist, ViewerReviewResult, StoreOperationData, bump_data_version
+from viewer.filter_options import save_filter_options
 
 
 @dataclass
@@ -109,6 +110,12 @@ class DataImporter:
                 self.session.add(store)
                 records_count += 1
             
+            # 白名单版本号+1，各进程的白名单缓存据此重新加载
+            bump_data_version(self.session, StoreWhitelist.__tablename__)
+            
+            # 生成筛选选项快照（/api/filters）
+            save_filter_options(self.session)
+            
             # 提交事务
             self.session.commit()
             
@@ -235,6 +242,9 @@ class DataImporter:
                 self.session.add(result)
                 records_count += 1
             
+            # 审核结果版本号+1，搜索总数等缓存据此失效
+            bump_data_version(self.session, ViewerReviewResult.__tablename__)
+            
             # 提交事务
             self.session.commit()
             
@@ -0,0 +1,130 @@
+"""
+Excel导出模块
+Excel Export Engine (openpyxl write-only mode, streamed from a temp file)
+"""
+import os
+import tempfile
+from contextlib import suppress
+from datetime import datetime
+from typing import Dict, List, Optional
+import pandas as pd
+from flask import send_file
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 自动列宽上限（字符数）
+MAX_COLUMN_WIDTH = 40
+
+HEADER_FILL = PatternFill(start_color='667EEA', end_color='667EEA', fill_type='solid')
+HEADER_FONT = Font(color='FFFFFF', bold=True)
+
+
+def column_widths(df: pd.DataFrame, max_width: int = MAX_COLUMN_WIDTH) -> List[int]:
+    """
+    按列计算自动列宽（中文等非ASCII字符按2个字符宽度计算）
+
+    每列对去重后的值做一次向量化的字符串长度计算，不逐个单元格遍历。
+
+    Args:
+        df: 导出数据
+        max_width: 列宽上限
+
+    Returns:
+        List[int]: 与df.columns顺序一致的列宽
+    """
+    widths = []
+    for column in df.columns:
+        values = pd.Series([str(column), *df[column].fillna('').astype(str).unique()])
+        display_len = values.str.len() + values.str.count(r'[^\x00-\x7f]')
+        widths.append(min(int(display_len.max()) + 2, max_width))
+    return widths
+
+
+def _remove_file(path: str):
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def write_xlsx(df: pd.DataFrame, path: str, sheet_name: str, widths: Optional[List[int]] = None):
+    """
+    以只写模式写入Excel文件（逐行写入，不在内存中保留单元格对象）
+
+    Args:
+        df: 导出数据，列名为表头
+        path: 输出文件路径
+        sheet_name: 工作表名称
+        widths: 列宽，为None时按内容自动计算
+    """
+    if widths is None:
+        widths = column_widths(df)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    # 只写模式下列宽必须在写入数据行之前设置
+    for col_idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(ws, value=str(column))
+        cell.fill = HEADER_FILL
+        cell.font = HEADER_FONT
+        cell.alignment = Alignment(horizontal='center')
+        header.append(cell)
+    ws.append(header)
+
+    values = df.astype(object).where(df.notna(), '')
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
+
+    wb.save(path)
+
+
+def xlsx_response(df: pd.DataFrame, sheet_name: str, filename_prefix: str, widths: Optional[List[int]] = None):
+    """
+    生成Excel下载响应（先写入临时文件，再从文件流式返回，响应结束后删除临时文件）
+
+    Args:
+        df: 导出数据，列名为表头
+        sheet_name: 工作表名称
+        filename_prefix: 下载文件名前缀（会加上时间戳）
+        widths: 列宽，为None时按内容自动计算
+
+    Returns:
+        Response: Flask文件响应
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        write_xlsx(df, path, sheet_name, widths)
+        response = send_file(
+            path,
+            mimetype=XLSX_MIMETYPE,
+            as_attachment=True,
+            download_name=f'{filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        )
+    except Exception:
+        _remove_file(path)
+        raise
+
+    response.call_on_close(lambda: _remove_file(path))
+    return response
+
+
+def records_frame(records: List[Dict], columns: List[str]) -> pd.DataFrame:
+    """
+    按指定列顺序把导出记录转换为DataFrame（没有记录时只有表头）
+
+    Args:
+        records: 导出记录
+        columns: 列名
+
+    Returns:
+        pd.DataFrame: 导出数据
+    """
+    return pd.DataFrame.from_records(records, columns=columns)
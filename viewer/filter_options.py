@@ -0,0 +1,151 @@
+"""
+筛选选项快照模块
+Filter Options Snapshot Module
+"""
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+from shared.database_models import (
+    StoreWhitelist,
+    FilterOptionsSnapshot,
+    get_data_version,
+    get_data_stamp
+)
+
+
+# 快照名称（与白名单版本号对应）
+SNAPSHOT_NAME = StoreWhitelist.__tablename__
+
+# 审核结果选项
+REVIEW_RESULTS = ['合格', '不合格']
+
+
+def build_filter_options(session) -> Dict:
+    """
+    一次查询白名单，计算所有筛选选项和省份/城市级联关系
+
+    Args:
+        session: 数据库会话
+
+    Returns:
+        Dict: 筛选选项，包含war_zones、provinces、cities、regional_managers、operators、
+              review_results，以及provinces_by_war_zone、cities_by_province
+    """
+    rows = session.query(
+        StoreWhitelist.war_zone,
+        StoreWhitelist.province,
+        StoreWhitelist.city,
+        StoreWhitelist.regional_manager,
+        func.coalesce(StoreWhitelist.temp_operator, StoreWhitelist.city_operator)
+    ).all()
+
+    war_zones, provinces, cities, regional_managers, operators = set(), set(), set(), set(), set()
+    provinces_by_war_zone: Dict[str, set] = {}
+    cities_by_province: Dict[str, set] = {}
+
+    for war_zone, province, city, regional_manager, operator in rows:
+        if war_zone:
+            war_zones.add(war_zone)
+        if province:
+            provinces.add(province)
+            if war_zone:
+                provinces_by_war_zone.setdefault(war_zone, set()).add(province)
+        if city:
+            cities.add(city)
+            if province:
+                cities_by_province.setdefault(province, set()).add(city)
+        if regional_manager:
+            regional_managers.add(regional_manager)
+        if operator:
+            operators.add(operator)
+
+    return {
+        'war_zones': sorted(war_zones),
+        'provinces': sorted(provinces),
+        'cities': sorted(cities),
+        'regional_managers': sorted(regional_managers),
+        'operators': sorted(operators),
+        'review_results': REVIEW_RESULTS,
+        'provinces_by_war_zone': {k: sorted(v) for k, v in provinces_by_war_zone.items()},
+        'cities_by_province': {k: sorted(v) for k, v in cities_by_province.items()}
+    }
+
+
+def save_filter_options(session, version: Optional[int] = None) -> Dict:
+    """
+    生成并保存筛选选项快照（不提交，随调用方事务提交）
+
+    Args:
+        session: 数据库会话
+        version: 对应的白名单版本号，为None时读取当前版本号
+
+    Returns:
+        Dict: 筛选选项
+    """
+    if version is None:
+        version = get_data_version(session, SNAPSHOT_NAME) or 0
+
+    options = build_filter_options(session)
+    session.merge(FilterOptionsSnapshot(
+        name=SNAPSHOT_NAME,
+        version=version,
+        options=json.dumps(options, ensure_ascii=False),
+        created_at=datetime.now()
+    ))
+    return options
+
+
+class FilterOptionsCache:
+    """
+    筛选选项的进程内缓存
+
+    每次读取只查询一次白名单版本戳，版本未变化时直接返回缓存；
+    版本变化后读取快照（由DataImporter.import_whitelist生成），快照过期（例如白名单由其他脚本导入）时
+    在内存中重新计算，读取请求不写数据库。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._options: Optional[Dict] = None
+
+    def get(self, session) -> Dict:
+        """
+        获取筛选选项
+
+        Args:
+            session: 数据库会话
+
+        Returns:
+            Dict: 筛选选项（同build_filter_options）
+        """
+        stamp = get_data_stamp(session, SNAPSHOT_NAME)
+        options = self._options
+        if options is not None and stamp is not None and stamp == self._stamp:
+            return options
+
+        with self._lock:
+            if self._options is not None and stamp is not None and stamp == self._stamp:
+                return self._options
+
+            version = stamp[0] if stamp else 0
+            snapshot = self._load_snapshot(session)
+            if snapshot is not None and snapshot.version == version:
+                options = json.loads(snapshot.options)
+            else:
+                options = build_filter_options(session)
+
+            self._options = options
+            self._stamp = stamp
+            return options
+
+    def _load_snapshot(self, session) -> Optional[FilterOptionsSnapshot]:
+        """读取快照，快照表不存在时返回None"""
+        try:
+            return session.query(FilterOptionsSnapshot).filter_by(name=SNAPSHOT_NAME).first()
+        except SQLAlchemyError:
+            session.rollback()
+            return None
@@ -0,0 +1,105 @@
+"""
+门店评级完成率统计模块
+Store Rating Completion Statistics Module
+"""
+import threading
+import time
+from typing import Dict, List, Tuple
+from sqlalchemy import func
+from shared.database_models import StoreWhitelist, StoreCurrentRating
+
+
+# 没有战区（NULL或空字符串）的门店归入此分组
+UNKNOWN_WAR_ZONE = '未知战区'
+
+
+def compute_completion_stats(session, war_zone: str = '', regional_manager: str = '') -> List[Dict]:
+    """
+    按战区统计评级完成率（白名单LEFT JOIN当前评级，一条GROUP BY查询）
+
+    Args:
+        session: 数据库会话
+        war_zone: 战区筛选
+        regional_manager: 区域经理筛选
+
+    Returns:
+        List[Dict]: 按战区排序的统计，每项包含war_zone、total_stores、rated_stores、completion_rate
+    """
+    zone = func.coalesce(func.nullif(StoreWhitelist.war_zone, ''), UNKNOWN_WAR_ZONE)
+
+    query = session.query(
+        zone,
+        func.count(StoreWhitelist.store_id),
+        func.count(StoreCurrentRating.store_id)
+    ).outerjoin(StoreCurrentRating, StoreCurrentRating.store_id == StoreWhitelist.store_id)
+
+    if war_zone:
+        query = query.filter(StoreWhitelist.war_zone == war_zone)
+    if regional_manager:
+        query = query.filter(StoreWhitelist.regional_manager == regional_manager)
+
+    stats = []
+    for zone_name, total_stores, rated_stores in query.group_by(zone).all():
+        completion_rate = (rated_stores / total_stores * 100) if total_stores > 0 else 0
+        stats.append({
+            'war_zone': zone_name,
+            'total_stores': total_stores,
+            'rated_stores': rated_stores,
+            'completion_rate': round(completion_rate, 1)
+        })
+
+    stats.sort(key=lambda x: x['war_zone'])
+    return stats
+
+
+class CompletionStatsCache:
+    """
+    评级完成率统计缓存
+
+    按筛选条件缓存统计结果，提交评级后调用invalidate()。
+    多worker部署时其他进程的提交不会通知到本进程，缓存最多保留ttl_seconds秒。
+    """
+
+    def __init__(self, ttl_seconds: float = 10):
+        """
+        初始化缓存
+
+        Args:
+            ttl_seconds: 缓存有效期（秒）
+        """
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[float, List[Dict]]] = {}
+        self._generation = 0
+
+    def invalidate(self):
+        """清空缓存（提交评级后调用）"""
+        with self._lock:
+            self._entries = {}
+            self._generation += 1
+
+    def get(self, session, war_zone: str = '', regional_manager: str = '') -> List[Dict]:
+        """
+        获取评级完成率统计
+
+        Args:
+            session: 数据库会话
+            war_zone: 战区筛选
+            regional_manager: 区域经理筛选
+
+        Returns:
+            List[Dict]: 同compute_completion_stats
+        """
+        key = (war_zone, regional_manager)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+            return entry[1]
+
+        generation = self._generation
+        loaded_at = time.monotonic()
+        stats = compute_completion_stats(session, war_zone, regional_manager)
+        with self._lock:
+            # 计算期间有新的评级提交时不缓存（结果可能已过期）
+            if generation == self._generation:
+                self._entries[key] = (loaded_at, stats)
+        return stats
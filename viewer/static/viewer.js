@@ -27,6 +27,7 @@ let currentFilters = {
 let searchResults = [];
 let currentPage = 1;
 let totalPages = 1;
+let nextCursor = '';  // 游标分页：上一页最后一个门店编号
 let isLoading = false;
 let processedStores = new Set();  // 记录已处理的门店ID
 let currentView = 'pending';  // 当前视图：pending 或 completed
@@ -358,13 +359,15 @@ async function loadSearchResults() {
         if (currentFilters.store_search) params.append('store_search', currentFilters.store_search);
         params.append('page', currentPage);
         params.append('per_page', 20);  // 每页20个门店
+        params.append('cursor', currentPage === 1 ? '' : nextCursor);
         
         const response = await fetch(`${API_BASE_PATH}/api/search?${params.toString()}`);
         const data = await response.json();
         
         if (data.success) {
             const stores = data.data.stores;
-            totalPages = data.data.total_pages;
+            totalPages = data.data.has_more ? data.data.total_pages : currentPage;
+            nextCursor = data.data.next_cursor || '';
             
             if (currentPage === 1) {
                 searchResults = stores;
@@ -0,0 +1,212 @@
+"""
+门店搜索服务
+Store Search Service (pg_trgm index / in-memory n-gram index)
+"""
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import and_, case, or_, select
+from sqlalchemy.orm import aliased
+from shared.database_models import StoreWhitelist, get_data_stamp
+
+
+# 内存索引的n-gram长度（门店名称较短，中文关键词常为两个字）
+NGRAM_SIZE = 2
+
+# pg_trgm GIN索引可用的最短关键词长度（更短的关键词无法提取三元组，LIKE会顺序扫描）
+TRGM_MIN_TERM_LENGTH = 3
+
+
+def _escape_like(term: str) -> str:
+    """转义LIKE通配符"""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _match_rank(store_id: str, store_name: str, term: str) -> int:
+    """
+    匹配排序：门店ID完全匹配 > 名称完全匹配 > 名称前缀匹配 > 名称包含
+
+    Returns:
+        int: 排序值，越小越靠前
+    """
+    if store_id == term:
+        return 0
+    if store_name == term:
+        return 1
+    if store_name.startswith(term):
+        return 2
+    return 3
+
+
+class NgramIndex:
+    """白名单门店名称的内存n-gram索引（非PostgreSQL数据库使用）"""
+
+    def __init__(self, rows, n: int = NGRAM_SIZE):
+        """
+        建立索引
+
+        Args:
+            rows: (store_id, store_name) 列表
+            n: n-gram长度，同时索引更短的gram以支持短关键词
+        """
+        self.n = n
+        self.names: Dict[str, str] = {}
+        self.postings: Dict[str, Set[str]] = {}
+
+        for store_id, store_name in rows:
+            name = store_name or ''
+            self.names[store_id] = name
+            for size in range(1, n + 1):
+                for i in range(len(name) - size + 1):
+                    self.postings.setdefault(name[i:i + size], set()).add(store_id)
+
+    def search(self, term: str) -> List[str]:
+        """
+        查找名称包含关键词的门店
+
+        Args:
+            term: 关键词
+
+        Returns:
+            List[str]: 门店ID（未排序）
+        """
+        size = min(len(term), self.n)
+        grams = {term[i:i + size] for i in range(len(term) - size + 1)}
+        if not grams:
+            return []
+
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = postings[0].intersection(*postings[1:])
+        # n-gram只能缩小候选范围，最后确认整个关键词是子串
+        return [store_id for store_id in candidates if term in self.names[store_id]]
+
+
+class StoreSearchService:
+    """
+    门店搜索（按门店ID或名称关键词）
+
+    PostgreSQL上3个字及以上的关键词使用白名单门店名称上的pg_trgm GIN索引（见create_store_name_trgm_index）；
+    更短的关键词（常见的1-2个中文字）及其他数据库（如SQLite测试库）使用内存n-gram索引，白名单版本号变化时重建。
+    不在白名单中的门店（如未匹配门店）按业务表自己的门店名称匹配。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._index: Optional[NgramIndex] = None
+
+    def search(self, session, term: str, limit: Optional[int] = None) -> List[Tuple[str, str]]:
+        """
+        搜索白名单门店
+
+        Args:
+            session: 数据库会话
+            term: 门店ID或名称关键词
+            limit: 最多返回数量
+
+        Returns:
+            List[Tuple[str, str]]: (门店ID, 门店名称)，门店ID完全匹配的排在最前
+        """
+        term = term.strip()
+        if not term:
+            return []
+
+        if self._use_trgm(session, term):
+            rank = case(
+                (StoreWhitelist.store_id == term, 0),
+                (StoreWhitelist.store_name == term, 1),
+                (StoreWhitelist.store_name.like(f'{_escape_like(term)}%', escape='\\'), 2),
+                else_=3
+            )
+            query = session.query(StoreWhitelist.store_id, StoreWhitelist.store_name)\
+                .filter(self._whitelist_match(term))\
+                .order_by(rank, StoreWhitelist.store_id)
+            if limit:
+                query = query.limit(limit)
+            return [(store_id, store_name) for store_id, store_name in query.all()]
+
+        index = self._get_index(session)
+        store_ids = set(index.search(term))
+        if term in index.names:
+            store_ids.add(term)
+
+        ranked = sorted(store_ids, key=lambda store_id: (_match_rank(store_id, index.names[store_id], term), store_id))
+        if limit:
+            ranked = ranked[:limit]
+        return [(store_id, index.names[store_id]) for store_id in ranked]
+
+    def search_store_ids(self, session, term: str, limit: Optional[int] = None) -> List[str]:
+        """
+        搜索白名单门店ID
+
+        Args:
+            session: 数据库会话
+            term: 门店ID或名称关键词
+            limit: 最多返回数量
+
+        Returns:
+            List[str]: 排序后的门店ID
+        """
+        return [store_id for store_id, _ in self.search(session, term, limit)]
+
+    def store_filter(self, session, column, term: str, name_column=None, matched_ids: Optional[List[str]] = None):
+        """
+        生成门店搜索条件：门店ID等于关键词，或属于名称匹配的白名单门店，
+        或不在白名单中、业务表门店名称包含关键词
+
+        Args:
+            session: 数据库会话
+            column: 业务表的门店ID列
+            term: 门店ID或名称关键词
+            name_column: 业务表的门店名称列，为None时不匹配白名单以外的门店
+            matched_ids: 已搜索到的门店ID（调用方还需要按匹配程度排序时传入，避免重复搜索）；
+                PostgreSQL上不使用，始终用白名单子查询，不把门店ID展开为参数列表
+
+        Returns:
+            过滤条件表达式
+        """
+        term = term.strip()
+        # 使用别名：调用方的查询可能已关联白名单表，子查询不能与之关联
+        whitelist = aliased(StoreWhitelist)
+        if session.get_bind().dialect.name == 'postgresql':
+            matched = select(whitelist.store_id).where(self._whitelist_match(term, whitelist))
+        elif matched_ids is not None:
+            matched = matched_ids
+        else:
+            matched = self.search_store_ids(session, term)
+
+        conditions = [column == term, column.in_(matched)]
+        if name_column is not None:
+            conditions.append(and_(
+                ~select(whitelist.store_id).where(whitelist.store_id == column).exists(),
+                name_column.like(f'%{_escape_like(term)}%', escape='\\')
+            ))
+        return or_(*conditions)
+
+    def _whitelist_match(self, term: str, whitelist=StoreWhitelist):
+        return or_(
+            whitelist.store_id == term,
+            whitelist.store_name.like(f'%{_escape_like(term)}%', escape='\\')
+        )
+
+    def _use_trgm(self, session, term: str) -> bool:
+        return session.get_bind().dialect.name == 'postgresql' and len(term) >= TRGM_MIN_TERM_LENGTH
+
+    def _get_index(self, session) -> NgramIndex:
+        """获取内存索引，白名单版本号变化时重建"""
+        stamp = get_data_stamp(session, StoreWhitelist.__tablename__)
+        index = self._index
+        if index is not None and stamp is not None and stamp == self._stamp:
+            return index
+
+        with self._lock:
+            if self._index is not None and stamp is not None and stamp == self._stamp:
+                return self._index
+
+            rows = session.query(StoreWhitelist.store_id, StoreWhitelist.store_name).all()
+            self._index = NgramIndex(rows)
+            self._stamp = stamp
+            return self._index
+
+
+# 各搜索接口共用的门店搜索服务
+store_search_service = StoreSearchService()